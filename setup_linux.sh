@@ -209,7 +209,7 @@ mkdir -p output/generatedVideo output/generatedVoice logs
 
 # Download required models
 echo "⬇️  Downloading AI models..."
-python3 x.py
+python3 src/model_registry.py
 
 # Create .env file if it doesn't exist
 if [ ! -f ".env" ]; then
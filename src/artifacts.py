@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field, asdict
+
+from model_registry import compute_sha256
+
+# -------------------------------
+# Pipeline artifacts
+# -------------------------------
+# A stage returns a handle to the file it wrote, carrying the facts it already
+# knows (duration, format, content hash, the parameters it was made with).
+# The next stage reads those instead of probing or re-reading the file, and
+# `cache_key` identifies the content for caches. Handles are plain dataclasses
+# so job state (see job_queue) can store them with to_dict()/from_dict().
+
+@dataclass(frozen=True)
+class AudioArtifact:
+    path: str
+    duration: float          # seconds
+    sample_rate: int
+    channels: int
+    content_hash: str        # sha256 of the file
+    params: dict = field(default_factory=dict)  # what produced it (voice, speed, text hash, ...)
+
+    @property
+    def cache_key(self) -> str:
+        """Stable key for caches: the content plus the parameters that made it."""
+        payload = json.dumps({"content": self.content_hash, "params": self.params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AudioArtifact":
+        return cls(**data)
+
+def text_hash(text: str) -> str:
+    """sha256 of a string, for recording the text an artifact was produced from."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def write_audio(path: str, samples, sample_rate: int, **params) -> AudioArtifact:
+    """Writes samples to `path` and returns its handle; duration and format come from the samples."""
+    import soundfile as sf
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    sf.write(path, samples, sample_rate)
+    return AudioArtifact(
+        path=path,
+        duration=len(samples) / sample_rate,
+        sample_rate=sample_rate,
+        channels=1 if samples.ndim == 1 else samples.shape[1],
+        content_hash=compute_sha256(path),
+        params=params,
+    )
+
+def load_audio(path: str, **params) -> AudioArtifact:
+    """Handle for an audio file written elsewhere (reads its header, no ffprobe)."""
+    import soundfile as sf
+    info = sf.info(path)
+    return AudioArtifact(
+        path=path,
+        duration=info.frames / info.samplerate,
+        sample_rate=info.samplerate,
+        channels=info.channels,
+        content_hash=compute_sha256(path),
+        params=params,
+    )
+
+def as_audio(audio) -> AudioArtifact:
+    """Accepts an AudioArtifact or a path (loaded once here)."""
+    return audio if isinstance(audio, AudioArtifact) else load_audio(audio)
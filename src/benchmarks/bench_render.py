@@ -0,0 +1,247 @@
+"""
+Render micro-benchmarks for the create_video stages.
+
+All inputs are synthesized with lavfi (testsrc, sine, anoise), so the suite
+runs offline and needs no TTS model, Playwright or Vosk. Each render path is
+timed at several narration durations and compared with a stored baseline.
+
+Usage (from the project root):
+    python src/benchmarks/bench_render.py                      # compare with baseline
+    python src/benchmarks/bench_render.py --update-baseline    # record a new baseline
+    python src/benchmarks/bench_render.py --durations 10 30 --repeat 5 --threshold 0.15
+
+Exits with status 1 when any stage is slower than baseline * (1 + threshold).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_dir)
+sys.path.insert(0, src_dir)
+
+import ffmpeg
+from ffmpeg_runner import run_ffmpeg
+from captions import write_ass_captions
+from video_generator import (
+    render_intro_card,
+    build_audio_mix,
+    measure_audio_mix,
+    prepare_background_clip,
+    build_video_timeline,
+    build_output_args,
+    encode_final,
+    plan_background_segments,
+    VOICE_SPEED_FACTOR,
+    INTRO_SILENCE_SECONDS,
+)
+
+DEFAULT_BASELINE_PATH = os.path.join(current_dir, "baselines", "render_baseline.json")
+DEFAULT_DURATIONS = [10, 30, 60]
+STAGES = ["intro_card", "clip_prep", "audio_mix", "captions", "final_encode"]
+
+INTRO_DURATION = 4.0
+INTRO_SAMPLE_RATE = 24000
+CLIP_DURATION = 12.0
+QUIET = {"progress_callback": None}
+
+# -------------------------------
+# Synthetic fixtures
+# -------------------------------
+def build_fixtures(fixture_dir: str, duration: float) -> dict:
+    """
+    Writes lavfi-generated stand-ins for every create_video input.
+    """
+    paths = {
+        "voice": os.path.join(fixture_dir, f"voice_{duration}.wav"),
+        "intro_audio": os.path.join(fixture_dir, "intro_audio.wav"),
+        "music": os.path.join(fixture_dir, "music.mp3"),
+        "intro_image": os.path.join(fixture_dir, "intro.png"),
+        "clips": [os.path.join(fixture_dir, f"clip_{i}.mp4") for i in range(2)],
+    }
+
+    if not os.path.exists(paths["voice"]):
+        # Kokoro writes 24 kHz mono; Vosk needs 16-bit PCM
+        voice = ffmpeg.input(f"sine=frequency=220:sample_rate=24000:duration={duration}", f="lavfi")
+        run_ffmpeg(ffmpeg.output(voice, paths["voice"], ac=1, acodec="pcm_s16le"), **QUIET)
+    if not os.path.exists(paths["intro_audio"]):
+        intro = ffmpeg.input(f"sine=frequency=330:sample_rate={INTRO_SAMPLE_RATE}:duration={INTRO_DURATION}", f="lavfi")
+        run_ffmpeg(ffmpeg.output(intro, paths["intro_audio"], ac=1, acodec="pcm_s16le"), **QUIET)
+    if not os.path.exists(paths["music"]):
+        music = ffmpeg.input("anoise=color=pink:sample_rate=44100:duration=45:amplitude=0.3", f="lavfi")
+        run_ffmpeg(ffmpeg.output(music, paths["music"], ac=2), **QUIET)
+    if not os.path.exists(paths["intro_image"]):
+        image = ffmpeg.input("testsrc=size=1280x720:rate=1:duration=1", f="lavfi")
+        run_ffmpeg(ffmpeg.output(image, paths["intro_image"], vframes=1), **QUIET)
+    for i, clip_path in enumerate(paths["clips"]):
+        if not os.path.exists(clip_path):
+            clip = ffmpeg.input(f"testsrc2=size=1920x1080:rate=30:duration={CLIP_DURATION}", f="lavfi")
+            run_ffmpeg(ffmpeg.output(clip, clip_path, vcodec="libx264", preset="veryfast", pix_fmt="yuv420p"), **QUIET)
+    return paths
+
+def synthetic_word_timestamps(duration: float, word_gap: float = 0.4) -> list:
+    """One fake word every `word_gap` seconds, in Vosk's format."""
+    words = []
+    t = 0.0
+    while t + word_gap <= duration:
+        words.append({"word": f"word{len(words)}", "start": t, "end": t + word_gap * 0.8, "conf": 1.0})
+        t += word_gap
+    return words
+
+# -------------------------------
+# Stage runners
+# -------------------------------
+def run_stages(paths: dict, duration: float, work_dir: str) -> dict:
+    """
+    Runs every render path once for one narration duration and returns {stage: seconds}.
+    """
+    timings = {}
+    voice_duration = duration / VOICE_SPEED_FACTOR
+
+    start = time.perf_counter()
+    intro_video = render_intro_card(paths["intro_image"], INTRO_DURATION, os.path.join(work_dir, "intro.mp4"), runner_options=QUIET)
+    timings["intro_card"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mixed_audio = build_audio_mix(
+        paths["voice"], paths["intro_audio"], paths["music"],
+        voice_duration, INTRO_DURATION, INTRO_SAMPLE_RATE,
+        speed_factor=VOICE_SPEED_FACTOR, silence_duration=INTRO_SILENCE_SECONDS,
+        analyze_music=False,  # the fixture track stays out of the music library index
+    )
+    mixed_audio_duration = measure_audio_mix(mixed_audio, os.path.join(work_dir, "mixed.wav"), runner_options=QUIET)
+    timings["audio_mix"] = time.perf_counter() - start
+
+    # The segments create_video cuts: exact in/out points covering the timeline after the intro
+    start = time.perf_counter()
+    segments = plan_background_segments(
+        paths["clips"], mixed_audio_duration - INTRO_DURATION, index_path=os.path.join(work_dir, "stock_index.json"),
+    )
+    clip_paths = []
+    for i, segment in enumerate(segments):
+        clip_paths.append(prepare_background_clip(
+            segment.source_path, os.path.join(work_dir, f"prepared_{i}.mp4"), segment.duration,
+            stage=f"clip_{i}", runner_options=QUIET, start=segment.in_point,
+        ))
+    timings["clip_prep"] = time.perf_counter() - start
+
+    # Captions on their own: ASS generation plus the subtitles burn, discarded to the null muxer
+    ass_path = os.path.join(work_dir, "captions.ass")
+    start = time.perf_counter()
+    write_ass_captions(
+        synthetic_word_timestamps(duration), ass_path, "DejaVu Sans", 64, 5,
+        time_offset=INTRO_DURATION + INTRO_SILENCE_SECONDS, speed_factor=VOICE_SPEED_FACTOR,
+    )
+    canvas = ffmpeg.input(f"color=black:s=1920x1080:r=24:d={mixed_audio_duration}", f="lavfi")
+    run_ffmpeg(ffmpeg.output(canvas.filter("subtitles", filename=ass_path), "-", f="null"), **QUIET)
+    timings["captions"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    video_stream = build_video_timeline(intro_video, clip_paths, mixed_audio_duration)
+    video_stream = video_stream.filter("subtitles", filename=ass_path)
+    encode_final(
+        video_stream, mixed_audio, os.path.join(work_dir, "final.mp4"),
+        build_output_args(), mixed_audio_duration, QUIET,
+    )
+    timings["final_encode"] = time.perf_counter() - start
+    return timings
+
+def run_benchmarks(durations: list, repeat: int, fixture_dir: str) -> dict:
+    """
+    Returns {"<stage>@<duration>s": median seconds} over `repeat` runs.
+    """
+    results = {}
+    for duration in durations:
+        paths = build_fixtures(fixture_dir, duration)
+        samples = {stage: [] for stage in STAGES}
+        for run in range(repeat):
+            with tempfile.TemporaryDirectory(prefix="bench_render_") as work_dir:
+                timings = run_stages(paths, duration, work_dir)
+            for stage, seconds in timings.items():
+                samples[stage].append(seconds)
+            print(f"[{duration}s] run {run + 1}/{repeat}: " + ", ".join(f"{k}={v:.2f}s" for k, v in timings.items()))
+        for stage in STAGES:
+            results[f"{stage}@{duration}s"] = statistics.median(samples[stage])
+    return results
+
+# -------------------------------
+# Baseline handling
+# -------------------------------
+def host_info() -> dict:
+    try:
+        ffmpeg_version = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, timeout=10).stdout.splitlines()[0]
+    except (subprocess.TimeoutExpired, FileNotFoundError, IndexError):
+        ffmpeg_version = "unknown"
+    return {
+        "host": platform.node(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "ffmpeg": ffmpeg_version,
+    }
+
+def compare_with_baseline(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Returns a list of (key, baseline, current) for every result slower than baseline * (1 + threshold).
+    """
+    regressions = []
+    for key, current in results.items():
+        reference = baseline.get("results", {}).get(key)
+        if reference is not None and current > reference * (1 + threshold):
+            regressions.append((key, reference, current))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Time create_video render stages on synthetic inputs.")
+    parser.add_argument("--durations", type=float, nargs="+", default=DEFAULT_DURATIONS, help="Narration durations in seconds.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per duration; the median is reported.")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed slowdown vs baseline (0.20 = 20%%).")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline JSON file.")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--fixture-dir", default=os.path.join(tempfile.gettempdir(), "zakotu_bench_fixtures"))
+    args = parser.parse_args()
+
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg not found on PATH; cannot run render benchmarks.")
+        sys.exit(2)
+
+    os.makedirs(args.fixture_dir, exist_ok=True)
+    results = run_benchmarks(args.durations, args.repeat, args.fixture_dir)
+
+    print("\n--- Render benchmark (median seconds) ---")
+    for key, seconds in results.items():
+        print(f"{key:<24} {seconds:8.3f}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"host_info": host_info(), "results": results}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first.")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("host_info", {}).get("host") != platform.node():
+        print(f"Warning: baseline was recorded on {baseline.get('host_info', {}).get('host')}, not this host.")
+
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed beyond {args.threshold:.0%}:")
+        for key, reference, current in regressions:
+            print(f"  {key}: {reference:.3f}s -> {current:.3f}s (+{(current / reference - 1):.0%})")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Kokoro TTS benchmark harness for sizing TTS hosts.
+
+Runs the pipeline's own TTS path: voice_generator.get_kokoro (model files
+resolved and verified by model_registry) and either generate_voice (pysbd
+segmentation, one kokoro.create per sentence) or generate_voice_from_stream
+(the story arriving in LLM-sized chunks). For every combination of voice, ONNX
+Runtime provider, intra-op thread count, sentence length distribution and mode
+it reports:
+  - real-time factor (synthesis seconds / audio seconds, lower is better)
+  - sentences per second
+  - first-audio latency (time until the first chunk of samples exists)
+  - peak resident memory of the worker process
+  - model load time
+
+Each combination runs in a fresh process so peak memory and session setup are
+measured in isolation. Results go to a JSON report.
+
+Usage (from the project root):
+    python src/benchmarks/bench_tts.py                                   # full matrix
+    python src/benchmarks/bench_tts.py --voices am_adam --threads 1 4 --modes generate
+    python src/benchmarks/bench_tts.py --report output/benchmarks/tts_report.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_dir)
+project_root = os.path.dirname(src_dir)
+sys.path.insert(0, src_dir)
+
+DEFAULT_REPORT_PATH = os.path.join(project_root, "output", "benchmarks", "tts_report.json")
+
+# Words per sentence (min, max) for each distribution; "mixed" samples from all of them
+SENTENCE_DISTRIBUTIONS = {
+    "short": (3, 7),
+    "medium": (10, 18),
+    "long": (25, 40),
+}
+SENTENCE_DISTRIBUTION_NAMES = list(SENTENCE_DISTRIBUTIONS) + ["mixed"]
+
+# generate: voice_generator.generate_voice; stream: generate_voice_from_stream fed STREAM_CHUNK_WORDS at a time
+MODES = ("generate", "stream")
+STREAM_CHUNK_WORDS = 8
+
+VOCABULARY = (
+    "the old house stood at the end of a quiet street where nobody walked after dark "
+    "she opened the door and heard a whisper from the attic every night at three "
+    "my grandmother kept a diary that described things which had not happened yet "
+    "rain fell against the window while the phone rang again with no one on the line"
+).split()
+
+# -------------------------------
+# Corpus
+# -------------------------------
+def build_sentences(distribution: str, count: int, seed: int = 0) -> list:
+    """
+    Returns `count` deterministic English-looking sentences for a length distribution.
+    """
+    rng = random.Random(f"{distribution}-{seed}")
+    sentences = []
+    for _ in range(count):
+        name = rng.choice(list(SENTENCE_DISTRIBUTIONS)) if distribution == "mixed" else distribution
+        low, high = SENTENCE_DISTRIBUTIONS[name]
+        words = [rng.choice(VOCABULARY) for _ in range(rng.randint(low, high))]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return sentences
+
+def stream_chunks(text: str, words_per_chunk: int = STREAM_CHUNK_WORDS) -> list:
+    """Splits text into pieces the size of streamed LLM chunks (sentence boundaries fall inside them)."""
+    words = text.split(" ")
+    return [
+        " ".join(words[i:i + words_per_chunk]) + (" " if i + words_per_chunk < len(words) else "")
+        for i in range(0, len(words), words_per_chunk)
+    ]
+
+# -------------------------------
+# Worker
+# -------------------------------
+def run_case(case: dict) -> dict:
+    """
+    Runs one benchmark case through voice_generator. Executed in a fresh process,
+    so the provider and thread settings apply to a newly loaded model.
+    """
+    os.environ["KOKORO_PROVIDER"] = case["provider"]
+    os.environ["KOKORO_THREADS"] = str(case["threads"])
+    import voice_generator
+
+    start = time.perf_counter()
+    kokoro = voice_generator.get_kokoro()
+    load_seconds = time.perf_counter() - start
+
+    # Warm-up so session initialisation doesn't count towards latency
+    kokoro.create(text="Warm up.", voice=case["voice"], speed=1.0, lang="en-us")
+
+    # First-audio latency: when the first kokoro.create call made by voice_generator returns
+    create, first_audio = kokoro.create, []
+    def timed_create(*args, **kwargs):
+        result = create(*args, **kwargs)
+        first_audio.append(time.perf_counter())
+        return result
+    kokoro.create = timed_create
+
+    sentences = build_sentences(case["distribution"], case["sentences"], case["seed"])
+    text = " ".join(sentences)
+    with tempfile.TemporaryDirectory(prefix="bench_tts_") as work_dir:
+        output_path = os.path.join(work_dir, "voice.wav")
+        start = time.perf_counter()
+        if case["mode"] == "stream":
+            _, audio = voice_generator.generate_voice_from_stream(stream_chunks(text), output_path, voice=case["voice"])
+        else:
+            audio = voice_generator.generate_voice(text, output_path, voice=case["voice"])
+        synthesis_seconds = time.perf_counter() - start
+    kokoro.create = create
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+    return case_result(
+        case, load_seconds, synthesis_seconds, audio.duration, len(sentences),
+        first_audio[0] - start if first_audio else None, peak_rss_mb,
+    )
+
+def case_result(case: dict, load_seconds: float, synthesis_seconds: float, audio_seconds: float,
+                sentence_count: int, first_audio_latency: float, peak_rss_mb: float) -> dict:
+    """One report row: the case's settings plus its measurements."""
+    return {
+        **case,
+        "model_load_seconds": round(load_seconds, 4),
+        "synthesis_seconds": round(synthesis_seconds, 4),
+        "audio_seconds": round(audio_seconds, 4),
+        "real_time_factor": round(synthesis_seconds / audio_seconds, 4) if audio_seconds else None,
+        "sentences_per_second": round(sentence_count / synthesis_seconds, 4) if synthesis_seconds else None,
+        "first_audio_latency_seconds": round(first_audio_latency, 4) if first_audio_latency is not None else None,
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+# -------------------------------
+# Matrix
+# -------------------------------
+def available_voice_names() -> list:
+    import numpy as np
+    from model_registry import ensure_asset
+    return sorted(np.load(ensure_asset("kokoro_voices")).keys())
+
+def available_providers() -> list:
+    import onnxruntime as ort
+    # TensorRT needs engine builds per shape; it isn't a fair comparison here
+    return [p for p in ort.get_available_providers() if p != "TensorrtExecutionProvider"]
+
+def build_matrix(args) -> list:
+    voices = available_voice_names() if args.voices == ["all"] else args.voices
+    providers = available_providers() if args.providers == ["all"] else args.providers
+    cases = []
+    for voice in voices:
+        for provider in providers:
+            for threads in args.threads:
+                for distribution in args.distributions:
+                    for mode in args.modes:
+                        cases.append({
+                            "voice": voice,
+                            "provider": provider,
+                            "threads": threads,
+                            "distribution": distribution,
+                            "mode": mode,
+                            "sentences": args.sentences,
+                            "seed": args.seed,
+                        })
+    return cases
+
+def build_report(results: list, model_paths: dict) -> dict:
+    """The JSON report: when and where it ran, which model files, one row per case."""
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "host": {
+            "node": platform.node(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count() or 1,
+            "python": platform.python_version(),
+        },
+        "model": model_paths,
+        "results": results,
+    }
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    default_threads = sorted({1, 2, 4, cpu_count} & set(range(1, cpu_count + 1)))
+
+    parser = argparse.ArgumentParser(description="Benchmark Kokoro TTS throughput and latency.")
+    parser.add_argument("--voices", nargs="+", default=["all"], help="Voice names, or 'all'.")
+    parser.add_argument("--providers", nargs="+", default=["all"], help="ONNX Runtime providers, or 'all'.")
+    parser.add_argument("--threads", type=int, nargs="+", default=default_threads, help="intra-op thread counts.")
+    parser.add_argument("--distributions", nargs="+", default=SENTENCE_DISTRIBUTION_NAMES, choices=SENTENCE_DISTRIBUTION_NAMES)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES, help="voice_generator path to run.")
+    parser.add_argument("--sentences", type=int, default=20, help="Sentences synthesized per case.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", default=DEFAULT_REPORT_PATH, help="Path of the JSON report.")
+    args = parser.parse_args()
+
+    from model_registry import ensure_asset
+    try:
+        model_paths = {"kokoro": ensure_asset("kokoro"), "voices": ensure_asset("kokoro_voices")}
+    except Exception as e:
+        print(f"Kokoro model files are not available: {e}")
+        sys.exit(2)
+
+    cases = build_matrix(args)
+    print(f"Running {len(cases)} TTS benchmark case(s)...")
+
+    results = []
+    # One fresh process per case so peak RSS and session setup are isolated
+    context = multiprocessing.get_context("spawn")
+    for i, case in enumerate(cases):
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            try:
+                result = pool.apply(run_case, (case,))
+            except Exception as e:
+                result = {**case, "error": str(e)}
+        results.append(result)
+        if "error" in result:
+            print(f"[{i + 1}/{len(cases)}] {case['voice']} {case['provider']} t={case['threads']} failed: {result['error']}")
+        else:
+            print(
+                f"[{i + 1}/{len(cases)}] {case['voice']} {case['provider']} t={case['threads']} "
+                f"{case['distribution']} {case['mode']}: RTF {result['real_time_factor']}, "
+                f"{result['sentences_per_second']} sent/s, first audio {result['first_audio_latency_seconds']}s, "
+                f"peak {result['peak_rss_mb']} MB"
+            )
+
+    report = build_report(results, model_paths)
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"TTS benchmark report written to {args.report}")
+
+if __name__ == "__main__":
+    main()
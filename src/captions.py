@@ -0,0 +1,64 @@
+# -------------------------------
+# ASS caption track helpers
+# -------------------------------
+def format_ass_time(seconds: float) -> str:
+    """Formats seconds for ASS: H:MM:SS.cc (centiseconds)."""
+    return f"{int(seconds // 3600)}:{int((seconds % 3600) // 60):02}:{int(seconds % 60):02}.{int((seconds * 100) % 100):02}"
+
+def build_ass_header(
+    font: str,
+    fontsize: int,
+    stroke_width: int,
+    play_res: tuple = (1920, 1080),
+    alignment: int = 5,
+    margin_v: int = 0,
+) -> str:
+    """
+    Returns the ASS header with a single "Default" style.
+    Alignment=5 is middle-center (numpad layout).
+    """
+    play_res_x, play_res_y = play_res
+    return f"""[Script Info]
+; Script generated by FFmpeg
+PlayResX: {play_res_x}
+PlayResY: {play_res_y}
+Timer: 100.0000
+ScriptType: v4.00+
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+YCbCr Matrix: TV.601
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,{font},{fontsize},&H00FFFFFF,&H0000FFFF,&H00000000,&H000000FF,-1,0,0,0,100,100,0,0,1,{stroke_width},0,{alignment},0,0,{margin_v},1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+def write_ass_captions(
+    word_timestamps: list,
+    ass_path: str,
+    font: str,
+    fontsize: int,
+    stroke_width: int,
+    time_offset: float = 0.0,
+    speed_factor: float = 1.0,
+    play_res: tuple = (1920, 1080),
+    alignment: int = 5,
+    margin_v: int = 0,
+) -> int:
+    """
+    Writes one Dialogue event per word (Vosk-style {"word", "start", "end"} dicts).
+    Word times are divided by `speed_factor` (atempo applied to the voice) and
+    shifted by `time_offset` (e.g. intro + pause). Returns the number of events.
+    """
+    ass_content = build_ass_header(font, fontsize, stroke_width, play_res, alignment, margin_v)
+    for word_info in word_timestamps:
+        start_time = (word_info["start"] / speed_factor) + time_offset
+        end_time = (word_info["end"] / speed_factor) + time_offset
+        ass_content += f"Dialogue: 0,{format_ass_time(start_time)},{format_ass_time(end_time)},Default,,0,0,0,,{word_info['word']}\n"
+
+    with open(ass_path, "w", encoding="utf-8") as f:
+        f.write(ass_content)
+    return len(word_timestamps)
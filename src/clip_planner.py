@@ -0,0 +1,170 @@
+import json
+import os
+import random
+import threading
+from dataclasses import dataclass, asdict
+
+import ffmpeg
+
+from utils.file_store import locked, write_json_atomic
+
+# -------------------------------
+# Stock clip index and timeline planner
+# -------------------------------
+# Clips in assets/stock/videos are probed once and kept in an index, so picking
+# background footage needs no per-run ffprobe calls. plan_segments() then cuts
+# the chosen clips into segments with exact in/out points whose durations add
+# up to the narration: every rendered frame ends up in the video.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+VIDEO_DIR = os.path.join(project_root, "assets", "stock", "videos")
+INDEX_PATH = os.path.join(project_root, "data", "stock_library", "index.json")
+
+# Shorter segments would be mostly fade (create_video fades each one in and out)
+MIN_SEGMENT_SECONDS = 3.0
+
+_index_lock = threading.Lock()
+
+@dataclass
+class ClipSegment:
+    source_path: str
+    in_point: float   # seconds into the source clip
+    out_point: float
+    start: float      # where the segment lands on the clip timeline
+
+    @property
+    def duration(self) -> float:
+        return self.out_point - self.in_point
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "duration": round(self.duration, 3)}
+
+def _load_index(index_path: str) -> dict:
+    if not os.path.exists(index_path):
+        return {"clips": {}}
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_index(index: dict, index_path: str):
+    write_json_atomic(index_path, index, indent=2)
+
+def _is_fresh(entry: dict, source_path: str) -> bool:
+    stat = os.stat(source_path)
+    return entry.get("source_size") == stat.st_size and entry.get("source_mtime") == stat.st_mtime
+
+def probe_clip(source_path: str) -> dict:
+    """Probes a clip's video stream. Returns the index entry (duration 0.0 if it has none)."""
+    stat = os.stat(source_path)
+    entry = {
+        "source_path": os.path.abspath(source_path),
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime,
+        "duration": 0.0,
+    }
+    try:
+        probe = ffmpeg.probe(source_path)
+    except ffmpeg.Error as e:
+        print(f"Error probing file {source_path}: {e.stderr.decode('utf8')}")
+        return entry
+    video = next((s for s in probe["streams"] if s["codec_type"] == "video"), None)
+    if video is not None:
+        duration = video.get("duration") or probe.get("format", {}).get("duration") or 0.0
+        entry.update(duration=float(duration), width=video.get("width"), height=video.get("height"))
+    return entry
+
+def get_clip(source_path: str, index_path: str = INDEX_PATH) -> dict:
+    """Index entry for one clip, probing it first if it is missing or changed."""
+    key = os.path.abspath(source_path)
+    with _index_lock, locked(index_path):
+        index = _load_index(index_path)
+        entry = index["clips"].get(key)
+        if entry and _is_fresh(entry, source_path):
+            return entry
+        entry = probe_clip(source_path)
+        index["clips"][key] = entry
+        _save_index(index, index_path)
+        return entry
+
+def load_stock_index(video_dir: str = VIDEO_DIR, index_path: str = INDEX_PATH) -> list:
+    """
+    Index entries for every usable clip in `video_dir`. New or changed files
+    are probed; entries for removed files are dropped.
+    """
+    sources = sorted(
+        os.path.abspath(os.path.join(video_dir, f))
+        for f in os.listdir(video_dir)
+        if os.path.isfile(os.path.join(video_dir, f))
+    )
+    with _index_lock, locked(index_path):
+        index = _load_index(index_path)
+        changed = False
+        for source_path in sources:
+            entry = index["clips"].get(source_path)
+            if not entry or not _is_fresh(entry, source_path):
+                index["clips"][source_path] = probe_clip(source_path)
+                changed = True
+        for key in list(index["clips"]):
+            if os.path.dirname(key) == os.path.abspath(video_dir) and key not in sources:
+                del index["clips"][key]
+                changed = True
+        if changed:
+            _save_index(index, index_path)
+    return [index["clips"][source_path] for source_path in sources if index["clips"][source_path]["duration"] > 0]
+
+def choose_clips(entries: list, duration: float, max_segment: float = None, rng: random.Random = None) -> list:
+    """
+    Picks clips in random order until their usable length covers `duration`.
+    Returns fewer (all of them) if the whole library is shorter; plan_segments
+    then reuses clips.
+    """
+    rng = rng or random.Random()
+    shuffled = list(entries)
+    rng.shuffle(shuffled)
+    chosen, covered = [], 0.0
+    for entry in shuffled:
+        if covered >= duration:
+            break
+        chosen.append(entry)
+        covered += min(entry["duration"], max_segment or entry["duration"])
+    return chosen
+
+def plan_segments(
+    entries: list,
+    duration: float,
+    random_seek: bool = False,
+    max_segment: float = None,
+    min_segment: float = MIN_SEGMENT_SECONDS,
+    rng: random.Random = None,
+) -> list:
+    """
+    Cuts `entries` (in order, cycling if needed) into ClipSegments that cover
+    exactly `duration` seconds. Each segment is at most the clip's length (and
+    `max_segment`); with `random_seek` it starts at a random point of the clip,
+    otherwise at its beginning. The last segment is never shorter than
+    `min_segment` when that can be avoided.
+    """
+    if duration <= 0:
+        return []
+    if not entries:
+        raise ValueError("No clips to plan a timeline from")
+    rng = rng or random.Random()
+
+    segments, position, index = [], 0.0, 0
+    while duration - position > 1e-6:
+        entry = entries[index % len(entries)]
+        index += 1
+        remaining = duration - position
+        available = min(entry["duration"], max_segment or entry["duration"])
+        length = min(available, remaining)
+        # Leave enough for a full-length last segment rather than a flash of footage
+        if 0 < remaining - length < min_segment and length - (min_segment - (remaining - length)) >= min_segment:
+            length -= min_segment - (remaining - length)
+        in_point = rng.uniform(0.0, entry["duration"] - length) if random_seek else 0.0
+        segments.append(ClipSegment(entry["source_path"], round(in_point, 3), round(in_point + length, 3), round(position, 3)))
+        position += length
+    # Rounding must not leave the timeline a few milliseconds short or long
+    last = segments[-1]
+    last.out_point = round(last.in_point + (duration - last.start), 3)
+    return segments
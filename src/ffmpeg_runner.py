@@ -0,0 +1,199 @@
+import collections
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import ffmpeg
+from utils.logger_config import logger
+
+# -------------------------------
+# Shared ffmpeg runner
+# -------------------------------
+# Every render in the pipeline goes through run_ffmpeg() instead of
+# ffmpeg.run(capture_stdout=True, capture_stderr=True). ffmpeg writes
+# machine-readable progress (-progress pipe:1) to stdout, which we parse
+# line by line, and only the last few hundred stderr lines are kept for
+# error reports, so memory stays flat no matter how long the encode is.
+# stderr lines also go to the log as verbose records, sampled per stage.
+
+DEFAULT_STDERR_TAIL_LINES = 200
+
+
+@dataclass
+class FFmpegProgress:
+    """A single progress report parsed from ffmpeg's -progress output."""
+    stage: str
+    out_time: float = 0.0  # seconds of output encoded so far
+    frame: int = 0
+    fps: float = 0.0
+    speed: float = 0.0  # multiple of real time, e.g. 2.5 for "2.5x"
+    total_size: int = 0
+    expected_duration: Optional[float] = None
+    finished: bool = False
+
+    @property
+    def percent(self) -> Optional[float]:
+        if not self.expected_duration:
+            return None
+        return min(100.0, 100.0 * self.out_time / self.expected_duration)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds left, derived from the current encode speed."""
+        if not self.expected_duration or self.speed <= 0:
+            return None
+        return max(0.0, (self.expected_duration - self.out_time) / self.speed)
+
+
+ProgressCallback = Callable[[FFmpegProgress], None]
+
+
+class FFmpegCancelled(ffmpeg.Error):
+    """Raised when a run is stopped through its cancel event."""
+
+
+class FFmpegTimeout(ffmpeg.Error):
+    """Raised when a run exceeds its timeout."""
+
+
+def _parse_time(value: str) -> float:
+    # out_time_us/out_time_ms are both microseconds (ffmpeg quirk); "N/A" early on
+    try:
+        return int(value) / 1_000_000
+    except ValueError:
+        return 0.0
+
+
+def _parse_float(value: str) -> float:
+    try:
+        return float(value.rstrip("x"))
+    except ValueError:
+        return 0.0
+
+
+def _apply_progress_line(progress: FFmpegProgress, key: str, value: str) -> bool:
+    """
+    Updates progress with one key=value line. Returns True when the line
+    closes a progress block (progress=continue|end).
+    """
+    if key in ("out_time_us", "out_time_ms"):
+        progress.out_time = _parse_time(value)
+    elif key == "frame":
+        progress.frame = int(_parse_float(value))
+    elif key == "fps":
+        progress.fps = _parse_float(value)
+    elif key == "speed":
+        progress.speed = _parse_float(value)
+    elif key == "total_size":
+        progress.total_size = int(_parse_float(value))
+    elif key == "progress":
+        progress.finished = value == "end"
+        return True
+    return False
+
+
+def log_progress(interval: float = 5.0) -> ProgressCallback:
+    """
+    Returns a progress callback that prints at most one line every `interval` seconds.
+    """
+    last_report = {}
+
+    def callback(progress: FFmpegProgress):
+        now = time.monotonic()
+        if not progress.finished and now - last_report.get(progress.stage, 0.0) < interval:
+            return
+        last_report[progress.stage] = now
+        percent = f" ({progress.percent:.0f}%)" if progress.percent is not None else ""
+        eta = f", eta {progress.eta:.0f}s" if progress.eta is not None and not progress.finished else ""
+        print(
+            f"[ffmpeg:{progress.stage}] {progress.out_time:.1f}s encoded{percent}, "
+            f"{progress.fps:.1f} fps, {progress.speed:.2f}x{eta}"
+        )
+
+    return callback
+
+
+def run_ffmpeg(
+    stream_spec,
+    stage: str = "ffmpeg",
+    progress_callback: Optional[ProgressCallback] = None,
+    expected_duration: Optional[float] = None,
+    timeout: Optional[float] = None,
+    cancel_event: Optional[threading.Event] = None,
+    stderr_tail_lines: int = DEFAULT_STDERR_TAIL_LINES,
+    overwrite_output: bool = True,
+) -> bytes:
+    """
+    Runs an ffmpeg-python stream spec with live progress reporting.
+
+    Progress is read from `-progress pipe:1` and handed to `progress_callback`
+    once per ffmpeg progress block. Only the last `stderr_tail_lines` lines of
+    stderr are kept; they are returned on success and attached to the raised
+    ffmpeg.Error on failure, so existing `except ffmpeg.Error` handlers keep working.
+    """
+    args = ffmpeg.compile(stream_spec, overwrite_output=overwrite_output)
+    cmd = [args[0], "-hide_banner", "-nostats", "-progress", "pipe:1"] + args[1:]
+
+    stderr_tail = collections.deque(maxlen=stderr_tail_lines)
+    progress = FFmpegProgress(stage=stage, expected_duration=expected_duration)
+
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    def read_progress():
+        for raw_line in process.stdout:
+            key, sep, value = raw_line.decode("utf8", errors="replace").strip().partition("=")
+            if not sep:
+                continue
+            if _apply_progress_line(progress, key, value.strip()) and progress_callback:
+                try:
+                    progress_callback(progress)
+                except Exception as e:
+                    print(f"Warning: ffmpeg progress callback failed: {e}")
+
+    def read_stderr():
+        for raw_line in process.stderr:
+            stderr_tail.append(raw_line)
+            logger.info(raw_line.decode("utf8", errors="replace").rstrip(), extra={"stage": stage, "verbose": True})
+
+    readers = [
+        threading.Thread(target=read_progress, daemon=True),
+        threading.Thread(target=read_stderr, daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    error_class = None
+    started = time.monotonic()
+    while process.poll() is None:
+        if cancel_event is not None and cancel_event.is_set():
+            error_class = FFmpegCancelled
+        elif timeout is not None and time.monotonic() - started > timeout:
+            error_class = FFmpegTimeout
+        if error_class is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            break
+        time.sleep(0.1)
+
+    for reader in readers:
+        reader.join(timeout=5)
+
+    stderr_bytes = b"".join(stderr_tail)
+    if error_class is FFmpegCancelled:
+        raise FFmpegCancelled(f"{stage} (cancelled)", b"", stderr_bytes)
+    if error_class is FFmpegTimeout:
+        raise FFmpegTimeout(f"{stage} (timed out after {timeout}s)", b"", stderr_bytes)
+    if process.returncode != 0:
+        raise ffmpeg.Error(stage, b"", stderr_bytes)
+    return stderr_bytes
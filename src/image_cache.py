@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+# -------------------------------
+# Generated image cache
+# -------------------------------
+# Downloaded images are stored once per (prompt, model, width, height) key,
+# byte for byte as the server sent them, so repeated prompts skip the request
+# and nothing is decoded or re-encoded. The directory is capped in size and
+# the least recently used images are evicted first.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+DEFAULT_CACHE_DIR = os.path.join(project_root, "data", "image_cache")
+DEFAULT_MAX_MB = 1024
+
+# Leading bytes of the formats Pollinations can return -> file extension
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+HEADER_BYTES = 12
+
+def image_cache_key(prompt: str, model: str, width: int, height: int) -> str:
+    payload = json.dumps({"prompt": prompt, "model": model, "width": width, "height": height}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def sniff_image_type(header: bytes):
+    """Returns the file extension for an image header, or None if it isn't a known image format."""
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    return None
+
+class ImageFileWriter:
+    """
+    Writes a streamed response to disk chunk by chunk. Only the header is
+    checked: write() returns False as soon as the first bytes show the body
+    isn't an image, so the caller can stop reading.
+    """
+    def __init__(self, path: str, fd: int = None):
+        self.path = path
+        self.extension = None
+        self._header = b""
+        self._file = os.fdopen(fd, "wb") if fd is not None else open(path, "wb")
+
+    def write(self, chunk: bytes) -> bool:
+        if self.extension is None:
+            self._header += chunk[:HEADER_BYTES]
+            if len(self._header) >= HEADER_BYTES:
+                self.extension = sniff_image_type(self._header)
+                if self.extension is None:
+                    return False
+        self._file.write(chunk)
+        return True
+
+    def close(self):
+        self._file.close()
+        if self.extension is None and self._header:
+            # Bodies shorter than the header are sniffed on what arrived
+            self.extension = sniff_image_type(self._header)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class ImageCache:
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = cache_dir or os.environ.get("IMAGE_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("IMAGE_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, key: str):
+        """Returns the cached image path, or None. Hits count as a use for eviction."""
+        for extension in {extension for _, extension in IMAGE_SIGNATURES} | {".webp"}:
+            path = os.path.join(self.cache_dir, f"{key}{extension}")
+            if os.path.exists(path):
+                os.utime(path)
+                return path
+        return None
+
+    def writer(self, key: str) -> ImageFileWriter:
+        """
+        Opens a unique temp file in the cache directory for a download of key.
+        Concurrent downloads of one key (duplicate prompts, other processes)
+        each get their own file; the last commit wins.
+        """
+        fd, path = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{key}.", suffix=".tmp")
+        return ImageFileWriter(path, fd)
+
+    def commit(self, key: str, writer: ImageFileWriter) -> str:
+        """Moves a finished download into the cache and returns its path."""
+        path = os.path.join(self.cache_dir, f"{key}{writer.extension}")
+        os.replace(writer.path, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Deletes least recently used images until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                os.remove(path)
+                total -= size
+
+def materialize(cached_path: str, output_path: str) -> str:
+    """
+    Places a cached image at output_path, keeping the cached file's real
+    extension. Hard-links when possible, otherwise copies. Returns the path.
+    """
+    output_path = os.path.splitext(output_path)[0] + os.path.splitext(cached_path)[1]
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    try:
+        os.link(cached_path, output_path)
+    except OSError:
+        shutil.copyfile(cached_path, output_path)
+    return output_path
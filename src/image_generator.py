@@ -1,51 +1,215 @@
+import hashlib
 import os
-from PIL import Image
-from diffusers import StableDiffusionPipeline
-import torch
+import re
+import shutil
+import uuid
+
+from utils.logger_config import logger
+
+# -------------------------------
+# Backends
+# -------------------------------
+# IMAGE_BACKEND:
+#   auto - CUDA if available, otherwise CPU (default)
+#   cuda - PyTorch on the GPU (float32, xFormers + attention slicing for 6GB cards)
+#   cpu  - PyTorch on the CPU (channels-last UNet, IMAGE_THREADS intra-op threads)
+#   onnx - ONNX Runtime on the CPU via optimum (pip install optimum[onnxruntime]);
+#          a model without .onnx files is exported once into IMAGE_ONNX_DIR
+#
+# IMAGE_SCHEDULER picks the sampler. "lcm" is the few-step option: 4 steps with
+# a latent consistency model or SD1.5 + IMAGE_LCM_LORA, which is what makes CPU
+# generation practical. The ONNX backend can't fuse a LoRA, so there "lcm" needs
+# an LCM model (IMAGE_MODEL_ID); with a plain SD model it falls back to the
+# default scheduler.
+DEFAULT_MODEL_ID = "runwayml/stable-diffusion-v1-5"
+DEFAULT_LCM_LORA = "latent-consistency/lcm-lora-sdv1-5"
+BACKENDS = ("auto", "cuda", "cpu", "onnx")
+
+# Scheduler name -> (diffusers class name, default steps, default guidance scale)
+SCHEDULERS = {
+    "default": (None, 20, 7.5),
+    "lcm": ("LCMScheduler", 4, 1.0),
+    "euler_a": ("EulerAncestralDiscreteScheduler", 15, 7.5),
+    "dpm": ("DPMSolverMultistepScheduler", 12, 7.5),
+}
+
+def resolve_backend(backend: str = None) -> str:
+    backend = (backend or os.environ.get("IMAGE_BACKEND", "auto")).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported IMAGE_BACKEND '{backend}'. Choose one of {BACKENDS}.")
+    if backend == "auto":
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return backend
+
+def _has_onnx_unet(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "unet", "model.onnx"))
 
 class ImageGenerator:
-    def __init__(self, output_dir="output/generatedImage"):
+    def __init__(self, output_dir="output/generatedImage", backend: str = None, model_id: str = None,
+                 scheduler: str = None, lcm_lora: str = None):
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
 
-        print("Loading Stable Diffusion 1.5 pipeline (optimized for 6GB VRAM)...")
-        # Load SD 1.5 with optimizations
-        self.pipe = StableDiffusionPipeline.from_pretrained(
-            "runwayml/stable-diffusion-v1-5",
-            torch_dtype=torch.float32,       # Use float32 for better compatibility with GTX 1660 SUPER
-            safety_checker=None              # optional: disables safety check (faster)
-        )
-        self.pipe = self.pipe.to("cuda")
+        self.backend = resolve_backend(backend)
+        self.model_id = model_id or os.environ.get("IMAGE_MODEL_ID", DEFAULT_MODEL_ID)
+        self.model_path = self._resolve_model_path()
+        self.scheduler_name = (scheduler or os.environ.get("IMAGE_SCHEDULER", "default")).lower()
+        if self.scheduler_name not in SCHEDULERS:
+            raise ValueError(f"Unsupported IMAGE_SCHEDULER '{self.scheduler_name}'. Choose one of {tuple(SCHEDULERS)}.")
+        if self.scheduler_name == "lcm" and self.backend == "onnx" and not self._is_lcm_model():
+            # LCMScheduler without the LCM-LoRA gives noise at 4 steps
+            logger.warning(f"IMAGE_SCHEDULER=lcm needs an LCM model on the onnx backend ('{self.model_id}' is not one); "
+                           "using the default scheduler")
+            self.scheduler_name = "default"
+        _, self.default_steps, self.default_guidance_scale = SCHEDULERS[self.scheduler_name]
+
+        if self.backend == "onnx":
+            self.pipe = self._load_onnx_pipeline()
+        else:
+            self.pipe = self._load_torch_pipeline()
+        self._apply_scheduler(lcm_lora if lcm_lora is not None else os.environ.get("IMAGE_LCM_LORA"))
+
+    def _is_lcm_model(self) -> bool:
+        return "lcm" in self.model_id.lower()
+
+    def _resolve_model_path(self) -> str:
+        """The registry's verified copy of the configured model; other model IDs load as given."""
+        from model_registry import MODELS, ensure_asset
+        if self.model_id == MODELS["sd"].repo_id:
+            return ensure_asset("sd")
+        return self.model_id
+
+    def _load_torch_pipeline(self):
+        import torch
+        from diffusers import StableDiffusionPipeline
+
+        print(f"Loading Stable Diffusion pipeline '{self.model_id}' on {self.backend}...")
+        if os.path.isfile(self.model_path):
+            # A single .safetensors checkpoint is memory-mapped rather than read into RAM
+            pipe = StableDiffusionPipeline.from_single_file(self.model_path, torch_dtype=torch.float32, load_safety_checker=False)
+        else:
+            pipe = StableDiffusionPipeline.from_pretrained(
+                self.model_path,
+                torch_dtype=torch.float32,       # Use float32 for better compatibility with GTX 1660 SUPER
+                safety_checker=None,             # optional: disables safety check (faster)
+                # .safetensors weights (preferred when present) are memory-mapped, not unpickled
+                low_cpu_mem_usage=True,          # load straight into the model instead of via a random init copy
+            )
+
+        if self.backend == "cuda":
+            pipe = pipe.to("cuda")
+            try:
+                pipe.enable_xformers_memory_efficient_attention()  # memory-efficient attention
+                print("✅ xFormers enabled")
+            except Exception as e:
+                print(f"❌ xFormers not available, falling back to default attention. Error: {e}")
+
+            # Add VRAM optimizations
+            pipe.enable_attention_slicing()
+        else:
+            torch.set_num_threads(int(os.environ.get("IMAGE_THREADS", os.cpu_count() or 4)))
+            pipe.unet.to(memory_format=torch.channels_last)
+        pipe.set_progress_bar_config(disable=True)
+        return pipe
+
+    def _load_onnx_pipeline(self):
+        try:
+            from optimum.onnxruntime import ORTStableDiffusionPipeline
+        except ImportError as e:
+            raise ImportError("IMAGE_BACKEND=onnx needs optimum: pip install optimum[onnxruntime]") from e
+
+        print(f"Loading ONNX Runtime Stable Diffusion pipeline '{self.model_id}'...")
+        if _has_onnx_unet(self.model_path):
+            return ORTStableDiffusionPipeline.from_pretrained(self.model_path, provider="CPUExecutionProvider")
+        export_dir = self._onnx_export_dir()
+        if _has_onnx_unet(export_dir):
+            return ORTStableDiffusionPipeline.from_pretrained(export_dir, provider="CPUExecutionProvider")
+
+        # First use: export (minutes), then keep the export for the next start
+        print(f"Exporting '{self.model_id}' to ONNX (once, into {export_dir})...")
+        pipe = ORTStableDiffusionPipeline.from_pretrained(self.model_path, export=True, provider="CPUExecutionProvider")
+        os.makedirs(os.path.dirname(export_dir), exist_ok=True)
+        temp_dir = f"{export_dir}.{uuid.uuid4().hex[:8]}.part"
         try:
-            self.pipe.enable_xformers_memory_efficient_attention()  # memory-efficient attention
-            print("✅ xFormers enabled")
-        except Exception as e:
-            print(f"❌ xFormers not available, falling back to default attention. Error: {e}")
+            pipe.save_pretrained(temp_dir)
+            os.replace(temp_dir, export_dir)
+        except OSError:
+            pass  # another process saved its export first
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return pipe
+
+    def _onnx_export_dir(self) -> str:
+        """Where the ONNX export of this model is kept: named by model ID, keyed by the weights' path."""
+        from model_registry import MODELS_DIR
+        root = os.environ.get("IMAGE_ONNX_DIR", os.path.join(MODELS_DIR, "onnx"))
+        name = re.sub(r"[^\w.-]+", "_", self.model_id).strip("_")
+        if os.path.exists(self.model_path):
+            # A snapshot path changes with the revision, so does the export
+            name = f"{name}-{hashlib.sha256(os.path.abspath(self.model_path).encode('utf-8')).hexdigest()[:12]}"
+        return os.path.join(root, name)
+
+    def _apply_scheduler(self, lcm_lora: str = None):
+        scheduler_class_name = SCHEDULERS[self.scheduler_name][0]
+        if scheduler_class_name is None:
+            return
+        import diffusers
+
+        scheduler_class = getattr(diffusers, scheduler_class_name)
+        self.pipe.scheduler = scheduler_class.from_config(self.pipe.scheduler.config)
+        print(f"Using {scheduler_class_name} ({self.default_steps} steps by default)")
+
+        if self.scheduler_name == "lcm" and self.backend != "onnx":
+            lora = lcm_lora or (DEFAULT_LCM_LORA if not self._is_lcm_model() else "")
+            if lora:
+                self.pipe.load_lora_weights(lora)
+                self.pipe.fuse_lora()
+                print(f"LCM-LoRA '{lora}' fused")
+
+    def generate_images(self, prompts: list, filenames: list = None, batch_size: int = None,
+                        num_inference_steps: int = None, guidance_scale: float = None,
+                        width: int = 768, height: int = 512, output_paths: list = None) -> list:
+        """
+        Generates one image per prompt, `batch_size` prompts per forward pass,
+        and saves them. Returns the saved paths in prompt order.
+        """
+        batch_size = batch_size or int(os.environ.get("IMAGE_BATCH_SIZE", "4"))
+        num_inference_steps = num_inference_steps or self.default_steps
+        guidance_scale = self.default_guidance_scale if guidance_scale is None else guidance_scale
+        if output_paths is None:
+            filenames = filenames or [f"generated_image_{i}.png" for i in range(len(prompts))]
+            output_paths = [os.path.join(self.output_dir, filename) for filename in filenames]
 
-        # Add VRAM optimizations
-        self.pipe.enable_attention_slicing()
-        # self.pipe.enable_sequential_cpu_offload() # Removed due to instability with float32
+        saved_paths = []
+        for start in range(0, len(prompts), batch_size):
+            batch = prompts[start:start + batch_size]
+            print(f"Generating {len(batch)} image(s) for prompts: {batch} ...")
+            images = self.pipe(
+                prompt=batch,
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                width=width,
+                height=height
+            ).images
+            for image, output_path in zip(images, output_paths[start:start + batch_size]):
+                image.save(output_path)
+                print(f"Image saved to {output_path}")
+                saved_paths.append(output_path)
+        return saved_paths
 
     def generate_image(self, prompt: str, filename: str = "generated_image.png",
-                       num_inference_steps: int = 20, guidance_scale: float = 7.5,
+                       num_inference_steps: int = None, guidance_scale: float = None,
                        width: int = 768, height: int = 512):
         """
-        Generates an image based on a prompt using SD1.5 and saves it.
-        Optimized for speed on 6GB GPU.
+        Generates an image based on a prompt and saves it.
+        Steps and guidance default to the scheduler's settings.
         """
-        print(f"Generating image for prompt: '{prompt}' ...")
-        image = self.pipe(
-            prompt=prompt,
-            num_inference_steps=num_inference_steps,
-            guidance_scale=guidance_scale,
-            width=width,
-            height=height
-        ).images[0]
-
-        output_path = os.path.join(self.output_dir, filename)
-        image.save(output_path)
-        print(f"Image saved to {output_path}")
-        return output_path
+        return self.generate_images(
+            [prompt], [filename], batch_size=1,
+            num_inference_steps=num_inference_steps, guidance_scale=guidance_scale,
+            width=width, height=height,
+        )[0]
 
 if __name__ == "__main__":
     generator = ImageGenerator()
@@ -56,8 +220,6 @@ if __name__ == "__main__":
         generator.generate_image(
             prompt=user_prompt,
             filename=f"generated_{user_prompt.replace(' ', '_')}.png",
-            num_inference_steps=20,   # fast but good quality
-            guidance_scale=7.5,       # standard value for prompt adherence
             width=768,                # fits in 6GB VRAM
             height=512
         )
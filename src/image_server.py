@@ -0,0 +1,166 @@
+"""
+Resident local image generator: loads the Stable Diffusion weights once and
+serves generation requests over HTTP, so gen_short doesn't reload them per run.
+
+Requests arriving close together are merged into shared forward passes
+(up to IMAGE_BATCH_SIZE prompts).
+
+POST /generate  {"prompts": [...], "output_paths": [...], "width": 768, "height": 512}
+             -> {"paths": [...]}
+
+Usage (from the project root):
+    IMAGE_BACKEND=cpu IMAGE_SCHEDULER=lcm python src/image_server.py --port 8766
+    IMAGE_SOURCE=local python src/gen_short.py
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+DEFAULT_URL = "http://127.0.0.1:8766"
+
+class BatchingWorker:
+    """
+    Runs ImageGenerator.generate_images on one thread. Jobs queued within
+    `batch_window` seconds of each other with the same size are generated together.
+    A job of another size ends the batch and starts the next one, so it keeps
+    its place in line.
+    """
+    def __init__(self, generator, batch_size: int, batch_window: float = 0.05):
+        self.generator = generator
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.jobs = queue.Queue()
+        self._held = None  # job that ended the previous batch (worker thread only)
+        threading.Thread(target=self._run, name="image-worker", daemon=True).start()
+
+    def submit(self, prompts: list, output_paths: list, width: int, height: int) -> Future:
+        future = Future()
+        self.jobs.put((prompts, output_paths, (width, height), future))
+        return future
+
+    def _collect(self) -> list:
+        jobs = [self._held or self.jobs.get()]
+        self._held = None
+        queued = len(jobs[0][0])
+        while queued < self.batch_size:
+            try:
+                job = self.jobs.get(timeout=self.batch_window)
+            except queue.Empty:
+                break
+            if job[2] != jobs[0][2]:
+                self._held = job  # different size: seeds the next batch
+                break
+            jobs.append(job)
+            queued += len(job[0])
+        return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._collect()
+            width, height = jobs[0][2]
+            prompts = [prompt for job in jobs for prompt in job[0]]
+            output_paths = [path for job in jobs for path in job[1]]
+            try:
+                self.generator.generate_images(
+                    prompts, output_paths=output_paths, batch_size=self.batch_size, width=width, height=height
+                )
+            except Exception as e:
+                for job in jobs:
+                    job[3].set_exception(e)
+                continue
+            for job in jobs:
+                job[3].set_result(job[1])
+
+def make_handler(worker: BatchingWorker):
+    class ImageHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != "/generate":
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            prompts, output_paths = body.get("prompts", []), body.get("output_paths", [])
+            if not prompts or len(prompts) != len(output_paths):
+                self._send_json(400, {"error": "prompts and output_paths must be non-empty and the same length"})
+                return
+            for path in output_paths:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            try:
+                paths = worker.submit(prompts, output_paths, body.get("width", 768), body.get("height", 512)).result()
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            self._send_json(200, {"paths": paths})
+
+    return ImageHandler
+
+def start_server(generator, host: str = "127.0.0.1", port: int = 8766, batch_size: int = None,
+                 batch_window: float = 0.05) -> ThreadingHTTPServer:
+    """Serves `generator` from a daemon thread and returns the server."""
+    batch_size = batch_size or int(os.environ.get("IMAGE_BATCH_SIZE", "4"))
+    worker = BatchingWorker(generator, batch_size, batch_window)
+    server = ThreadingHTTPServer((host, port), make_handler(worker))
+    threading.Thread(target=server.serve_forever, name="image-server", daemon=True).start()
+    return server
+
+async def generate_local_images(session, prompts: list, output_paths: list, server_url: str = None,
+                                width: int = 768, height: int = 512) -> list:
+    """
+    Client for gen_short: asks the resident server for all images in one request.
+    Returns the saved paths, or [] if the server can't be reached or fails.
+    """
+    server_url = server_url or os.environ.get("IMAGE_SERVER_URL", DEFAULT_URL)
+    payload = {"prompts": prompts, "output_paths": [os.path.abspath(path) for path in output_paths],
+               "width": width, "height": height}
+    try:
+        async with session.post(f"{server_url}/generate", json=payload) as response:
+            body = await response.json()
+            if response.status != 200:
+                print(f"Local image server error: {body.get('error')}")
+                return []
+            return body["paths"]
+    except Exception as e:
+        print(f"Error contacting local image server at {server_url}: {e}")
+        return []
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident Stable Diffusion server for gen_short.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--batch-size", type=int, default=None, help="Prompts per forward pass (IMAGE_BATCH_SIZE).")
+    parser.add_argument("--batch-window", type=float, default=0.05, help="Seconds to wait for more requests to batch.")
+    args = parser.parse_args()
+
+    from image_generator import ImageGenerator
+    generator = ImageGenerator()
+    server = start_server(generator, args.host, args.port, args.batch_size, args.batch_window)
+    host, port = server.server_address[:2]
+    print(f"Image server ({generator.backend}, {generator.scheduler_name} scheduler) listening on http://{host}:{port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Durable job queue on a local SQLite database (no external service).
+
+A job is one video. It moves through STAGES; each stage is a task row that a
+stage worker (stage_worker.py) claims with a lease. A worker that dies
+mid-task stops renewing its lease and the task is handed to another worker
+once the lease expires. Failed tasks are retried with backoff up to
+max_attempts, then the job is marked failed.
+
+Job state is a JSON dict: every stage's result is merged into it and passed to
+the next stage. Files live under JOBS_DIR/<job id>/, so workers on other
+machines need the same storage mounted at the same path.
+
+The database runs in WAL mode (JOB_DB_JOURNAL=wal, the default), which keeps
+its index in shared memory: every worker must then be on the host that has the
+database on local disk. When workers on several hosts open it over NFS, set
+JOB_DB_JOURNAL=delete on all of them (rollback journal, whole-file locks); the
+filesystem must support POSIX locks.
+"""
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+DEFAULT_DB_PATH = os.path.join(project_root, "data", "jobs", "jobs.sqlite3")
+JOURNAL_MODES = ("wal", "delete")
+STAGES = ("story", "tts", "transcribe", "thumbnail", "render")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,            -- queued | running | done | failed
+    state TEXT NOT NULL,             -- JSON, grows as stages complete
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,            -- pending | leased | done | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (stage, status, available_at);
+"""
+
+@dataclass
+class Task:
+    id: int
+    job_id: str
+    stage: str
+    attempts: int
+    max_attempts: int
+    state: dict
+
+def worker_id() -> str:
+    """Identifies a worker process across hosts (host:pid:random)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+class LeaseLost(Exception):
+    """The task's lease expired and it was claimed by another worker."""
+
+class JobQueue:
+    def __init__(self, db_path: str = None, max_attempts: int = None, retry_delay: float = 30.0, journal_mode: str = None):
+        self.db_path = db_path or os.environ.get("JOB_DB_PATH", DEFAULT_DB_PATH)
+        self.journal_mode = (journal_mode or os.environ.get("JOB_DB_JOURNAL", "wal")).lower()
+        if self.journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Unsupported JOB_DB_JOURNAL '{self.journal_mode}'. Choose one of {JOURNAL_MODES}.")
+        self.max_attempts = max_attempts or int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+        self.retry_delay = retry_delay
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> "_Transaction":
+        # One short-lived connection per call keeps the queue usable from any thread
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute(f"PRAGMA journal_mode={self.journal_mode.upper()}")
+        db.execute("PRAGMA busy_timeout=30000")
+        return _Transaction(db)
+
+    # -------------------------------
+    # Producers
+    # -------------------------------
+    def submit(self, state: dict, first_stage: str = STAGES[0]) -> str:
+        """Creates a job with the given initial state and queues its first stage. Returns the job ID."""
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "INSERT INTO jobs (id, status, state, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(state), now, now),
+            )
+            self._add_task(db, job_id, first_stage, now)
+        return job_id
+
+    def _add_task(self, db, job_id: str, stage: str, now: float):
+        db.execute(
+            "INSERT INTO tasks (job_id, stage, status, max_attempts, available_at, created_at, updated_at)"
+            " VALUES (?, ?, 'pending', ?, ?, ?, ?)",
+            (job_id, stage, self.max_attempts, now, now, now),
+        )
+
+    def job(self, job_id: str) -> dict:
+        """Job row with its decoded state and the status of each stage task, or None."""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            tasks = db.execute(
+                "SELECT stage, status, attempts, lease_owner, error FROM tasks WHERE job_id = ? ORDER BY id", (job_id,)
+            ).fetchall()
+        job = dict(row)
+        job["state"] = json.loads(job["state"])
+        job["tasks"] = [dict(task) for task in tasks]
+        return job
+
+    def counts(self) -> dict:
+        """{stage: {status: count}} for monitoring and scaling decisions."""
+        with self._connect() as db:
+            rows = db.execute("SELECT stage, status, COUNT(*) AS n FROM tasks GROUP BY stage, status").fetchall()
+        counts = {}
+        for row in rows:
+            counts.setdefault(row["stage"], {})[row["status"]] = row["n"]
+        return counts
+
+    # -------------------------------
+    # Workers
+    # -------------------------------
+    def claim(self, stage: str, owner: str, lease_seconds: float = 300.0) -> Task:
+        """
+        Leases the oldest runnable task of `stage`: a pending one whose retry
+        delay has passed, or one whose previous lease expired. Returns None if
+        there is nothing to do.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT tasks.*, jobs.state FROM tasks JOIN jobs ON jobs.id = tasks.job_id"
+                " WHERE tasks.stage = ? AND ((tasks.status = 'pending' AND tasks.available_at <= ?)"
+                " OR (tasks.status = 'leased' AND tasks.lease_expires < ?))"
+                " ORDER BY tasks.id LIMIT 1",
+                (stage, now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            if row["status"] == "leased" and row["attempts"] >= row["max_attempts"]:
+                # The last attempt's worker died; don't start another one
+                self._fail_task(db, row["id"], row["job_id"], f"lease expired on attempt {row['attempts']}", now)
+                return None
+            db.execute(
+                "UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?,"
+                " updated_at = ? WHERE id = ?",
+                (owner, now + lease_seconds, now, row["id"]),
+            )
+            db.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (now, row["job_id"]))
+        return Task(row["id"], row["job_id"], row["stage"], row["attempts"] + 1, row["max_attempts"], json.loads(row["state"]))
+
+    def _check_lease(self, db, task: Task, owner: str):
+        row = db.execute("SELECT status, lease_owner FROM tasks WHERE id = ?", (task.id,)).fetchone()
+        if row["status"] != "leased" or row["lease_owner"] != owner:
+            raise LeaseLost(f"Task {task.id} ({task.stage}) is no longer leased by {owner}")
+
+    def heartbeat(self, task: Task, owner: str, lease_seconds: float = 300.0):
+        """Extends the lease of a running task. Raises LeaseLost if another worker took it over."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            self._check_lease(db, task, owner)
+            db.execute("UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE id = ?", (now + lease_seconds, now, task.id))
+
+    def complete(self, task: Task, owner: str, result: dict = None, next_stage: str = None):
+        """
+        Marks the task done, merges `result` into the job state and queues
+        `next_stage` (the job is done when there is none), in one transaction.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            self._check_lease(db, task, owner)
+            state = json.loads(db.execute("SELECT state FROM jobs WHERE id = ?", (task.job_id,)).fetchone()["state"])
+            state.update(result or {})
+            db.execute(
+                "UPDATE tasks SET status = 'done', lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (now, task.id),
+            )
+            db.execute(
+                "UPDATE jobs SET state = ?, status = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(state), "running" if next_stage else "done", now, task.job_id),
+            )
+            if next_stage:
+                self._add_task(db, task.job_id, next_stage, now)
+
+    def fail(self, task: Task, owner: str, error: str):
+        """Schedules a retry with exponential backoff, or fails the job after the last attempt."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            self._check_lease(db, task, owner)
+            if task.attempts >= task.max_attempts:
+                self._fail_task(db, task.id, task.job_id, error, now)
+            else:
+                db.execute(
+                    "UPDATE tasks SET status = 'pending', available_at = ?, lease_owner = NULL, lease_expires = NULL,"
+                    " error = ?, updated_at = ? WHERE id = ?",
+                    (now + self.retry_delay * 2 ** (task.attempts - 1), error, now, task.id),
+                )
+
+    def _fail_task(self, db, task_id: int, job_id: str, error: str, now: float):
+        db.execute(
+            "UPDATE tasks SET status = 'failed', error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?"
+            " WHERE id = ?",
+            (error, now, task_id),
+        )
+        db.execute("UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?", (error, now, job_id))
+
+class _Transaction:
+    """Context manager around a connection: commits on success, rolls back on error, always closes."""
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.db.in_transaction:
+                self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.db.close()
+        return False
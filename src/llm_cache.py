@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# -------------------------------
+# LLM response cache
+# -------------------------------
+# Responses are stored as one JSON file per (model, prompt, generation params)
+# key, so development and test runs can replay identical prompts without
+# spending quota or needing network.
+#
+# LLM_CACHE_MODE:
+#   off     - no caching (default)
+#   record  - always call the API and store every response
+#   replay  - only serve from the cache; a miss raises LLMCacheMiss
+#   auto    - serve hits from the cache, call the API and store on a miss
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+DEFAULT_CACHE_DIR = os.path.join(project_root, "data", "llm_cache")
+CACHE_MODES = ("off", "record", "replay", "auto")
+
+def cache_key(model_name: str, prompt: str, generation_config: dict = None) -> str:
+    """Stable hash of everything that determines the response."""
+    payload = json.dumps(
+        {"model": model_name, "prompt": prompt, "generation_config": generation_config or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    def __init__(self, mode: str = None, cache_dir: str = None):
+        mode = (mode or os.environ.get("LLM_CACHE_MODE", "off")).lower()
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unsupported LLM_CACHE_MODE '{mode}'. Choose one of {CACHE_MODES}.")
+        self.mode = mode
+        self.cache_dir = cache_dir or os.environ.get("LLM_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self._lock = threading.Lock()
+
+    @property
+    def reads(self) -> bool:
+        return self.mode in ("replay", "auto")
+
+    @property
+    def writes(self) -> bool:
+        return self.mode in ("record", "auto")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        """Returns the cached response text, or None."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["text"]
+
+    def put(self, key: str, model_name: str, prompt: str, generation_config: dict, text: str):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {
+            "model": model_name,
+            "prompt": prompt,
+            "generation_config": generation_config or {},
+            "text": text,
+            "recorded_at": time.time(),
+        }
+        path = self._path(key)
+        with self._lock:
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(temp_path, path)
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from utils.background_loop import BackgroundLoop
+from utils.logger_config import logger
+from llm_cache import LLMCache, cache_key
+
+# -------------------------------
+# Shared async Gemini client
+# -------------------------------
+# One configured client for the whole process: genai.configure runs once, the
+# GenerativeModel objects (and the gRPC channel behind them) are created on a
+# dedicated event loop and reused for every request. Requests go through a
+# token bucket sized to our quota, are bounded by a timeout, and are retried
+# with exponential backoff and full jitter on 429/5xx/timeouts.
+#
+# Setting GEMINI_BASE_URL (e.g. http://127.0.0.1:8765 for llm_stub_server.py)
+# sends requests over plain REST to that endpoint instead of the SDK's gRPC
+# channel. Responses can be recorded and replayed through llm_cache
+# (LLM_CACHE_MODE=record|replay|auto).
+
+# Defaults; GEMINI_MODEL, GEMINI_RPM, GEMINI_BURST, GEMINI_TIMEOUT and
+# GEMINI_MAX_RETRIES override them (read when the client is created, after load_dotenv)
+DEFAULT_MODEL = "gemini-1.5-flash"
+REQUESTS_PER_MINUTE = 15  # free tier quota for flash
+BURST = 3
+REQUEST_TIMEOUT = 60.0
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+class LLMError(RuntimeError):
+    """A Gemini request failed."""
+
+class LLMQuotaError(LLMError):
+    """The quota was still exhausted (HTTP 429) after all retries."""
+
+class LLMTimeoutError(LLMError):
+    """A Gemini request timed out on every attempt."""
+
+class LLMCacheMiss(LLMError):
+    """LLM_CACHE_MODE=replay and the prompt was never recorded."""
+
+class TokenBucket:
+    """
+    Token bucket rate limiter. `reserve()` takes a token and returns how long
+    the caller must wait before using it, so waiting callers queue up fairly.
+    """
+    def __init__(self, rate_per_second: float, capacity: int, clock=time.monotonic):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self, tokens: float = 1.0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP, rng=random) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2**attempt))."""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+def _classify_error(e: Exception):
+    """
+    Returns the LLMError subclass for a retryable error, or None if it shouldn't be retried.
+    """
+    from google.api_core import exceptions as google_exceptions
+
+    if isinstance(e, (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)):
+        return LLMQuotaError
+    if isinstance(e, (asyncio.TimeoutError, google_exceptions.DeadlineExceeded)):
+        return LLMTimeoutError
+    if isinstance(e, (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError)):
+        return LLMError
+    return None
+
+def _to_camel_case(name: str) -> str:
+    first, *rest = name.split("_")
+    return first + "".join(part.capitalize() for part in rest)
+
+class _RestResponse:
+    def __init__(self, payload: dict):
+        self.payload = payload
+
+    @property
+    def text(self) -> str:
+        candidates = self.payload.get("candidates") or []
+        if not candidates:
+            raise ValueError(f"Response has no candidates: {self.payload.get('promptFeedback')}")
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+class _RestStreamResponse:
+    """Async iterator over the server-sent events of a ?alt=sse streaming response."""
+    def __init__(self, http_response):
+        self._lines = http_response.iter_lines(decode_unicode=True)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> _RestResponse:
+        while True:
+            line = await asyncio.to_thread(next, self._lines, None)
+            if line is None:
+                raise StopAsyncIteration
+            if line.startswith("data:"):
+                return _RestResponse(json.loads(line[len("data:"):]))
+
+class _RestModel:
+    """
+    Minimal stand-in for genai.GenerativeModel that talks to the Gemini REST API
+    at `base_url`. HTTP errors are mapped to google.api_core exceptions so the
+    retry logic treats both transports the same.
+    """
+    def __init__(self, base_url: str, model_name: str, api_key: str, session):
+        self.base_url = base_url.rstrip("/")
+        self.model_name = model_name
+        self.api_key = api_key
+        self.session = session
+
+    def _request_body(self, prompt: str, generation_config: dict = None) -> dict:
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if generation_config:
+            body["generationConfig"] = {_to_camel_case(k): v for k, v in dict(generation_config).items()}
+        return body
+
+    def _post(self, prompt: str, generation_config: dict, timeout: float) -> _RestResponse:
+        from google.api_core import exceptions as google_exceptions
+
+        url = f"{self.base_url}/v1beta/models/{self.model_name}:generateContent"
+        response = self.session.post(
+            url, params={"key": self.api_key}, json=self._request_body(prompt, generation_config), timeout=timeout
+        )
+        if response.status_code >= 400:
+            raise google_exceptions.from_http_status(response.status_code, response.text[:500])
+        return _RestResponse(response.json())
+
+    def _open_stream(self, prompt: str, generation_config: dict, timeout: float):
+        from google.api_core import exceptions as google_exceptions
+
+        url = f"{self.base_url}/v1beta/models/{self.model_name}:streamGenerateContent"
+        response = self.session.post(
+            url, params={"key": self.api_key, "alt": "sse"}, json=self._request_body(prompt, generation_config),
+            timeout=timeout, stream=True,
+        )
+        if response.status_code >= 400:
+            raise google_exceptions.from_http_status(response.status_code, response.text[:500])
+        return response
+
+    async def generate_content_async(self, prompt, generation_config=None, request_options=None, stream=False):
+        timeout = (request_options or {}).get("timeout", REQUEST_TIMEOUT)
+        if stream:
+            return _RestStreamResponse(await asyncio.to_thread(self._open_stream, prompt, generation_config, timeout))
+        return await asyncio.to_thread(self._post, prompt, generation_config, timeout)
+
+class GeminiClient:
+    def __init__(
+        self,
+        api_key: str = None,
+        default_model: str = None,
+        requests_per_minute: float = None,
+        burst: int = None,
+        timeout: float = None,
+        max_retries: int = None,
+        base_url: str = None,
+        cache: LLMCache = None,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url or os.environ.get("GEMINI_BASE_URL")
+        self.cache = cache or LLMCache()
+        self.default_model = default_model or os.environ.get("GEMINI_MODEL", DEFAULT_MODEL)
+        self.timeout = timeout or float(os.environ.get("GEMINI_TIMEOUT", REQUEST_TIMEOUT))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("GEMINI_MAX_RETRIES", MAX_RETRIES))
+        requests_per_minute = requests_per_minute or float(os.environ.get("GEMINI_RPM", REQUESTS_PER_MINUTE))
+        burst = burst or int(os.environ.get("GEMINI_BURST", BURST))
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0, burst)
+        self._loop = BackgroundLoop("gemini-client")
+        self._models = {}
+        self._configured = False
+
+    def _get_model(self, model_name: str):
+        if model_name in self._models:
+            return self._models[model_name]
+
+        api_key = self.api_key or os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY environment variable not set.")
+        if self.base_url:
+            import requests
+
+            if not self._configured:
+                self._session = requests.Session()  # keep-alive across requests
+                self._configured = True
+            self._models[model_name] = _RestModel(self.base_url, model_name, api_key, self._session)
+        else:
+            import google.generativeai as genai
+
+            if not self._configured:
+                genai.configure(api_key=api_key)
+                self._configured = True
+            self._models[model_name] = genai.GenerativeModel(model_name)
+        return self._models[model_name]
+
+    async def _generate(self, prompt: str, model_name: str = None, generation_config: dict = None) -> str:
+        model_name = model_name or self.default_model
+        key = cache_key(model_name, prompt, generation_config) if self.cache.mode != "off" else None
+        if self.cache.reads:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"LLM cache hit ({key[:12]})")
+                return cached
+            if self.cache.mode == "replay":
+                raise LLMCacheMiss(f"No recorded response for prompt {prompt[:60]!r} (key {key[:12]})")
+
+        text = await self._request(prompt, model_name, generation_config)
+        if self.cache.writes:
+            self.cache.put(key, model_name, prompt, generation_config, text)
+        return text
+
+    async def _request(self, prompt: str, model_name: str, generation_config: dict = None) -> str:
+        model = self._get_model(model_name)
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                response = await asyncio.wait_for(
+                    model.generate_content_async(
+                        prompt,
+                        generation_config=generation_config,
+                        request_options={"timeout": self.timeout},
+                    ),
+                    timeout=self.timeout,
+                )
+                return response.text
+            except Exception as e:
+                error_class = _classify_error(e)
+                if error_class is None:
+                    raise LLMError(f"Gemini request failed: {e}") from e
+                if attempt == self.max_retries:
+                    raise error_class(f"Gemini request failed after {attempt + 1} attempts: {e}") from e
+                delay = backoff_delay(attempt)
+                logger.warning(f"Gemini request failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _stream(self, prompt: str, model_name: str, generation_config: dict, emit) -> str:
+        """
+        Streams a response, calling `emit(text)` for every chunk. Retries only
+        happen before the first chunk; after that a failure would duplicate text.
+        """
+        model_name = model_name or self.default_model
+        key = cache_key(model_name, prompt, generation_config) if self.cache.mode != "off" else None
+        if self.cache.reads:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(f"LLM cache hit ({key[:12]})")
+                emit(cached)
+                return cached
+            if self.cache.mode == "replay":
+                raise LLMCacheMiss(f"No recorded response for prompt {prompt[:60]!r} (key {key[:12]})")
+
+        model = self._get_model(model_name)
+        parts = []
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                response = await asyncio.wait_for(
+                    model.generate_content_async(
+                        prompt,
+                        generation_config=generation_config,
+                        stream=True,
+                        request_options={"timeout": self.timeout},
+                    ),
+                    timeout=self.timeout,
+                )
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.text:
+                        parts.append(chunk.text)
+                        emit(chunk.text)
+                break
+            except Exception as e:
+                error_class = _classify_error(e)
+                if error_class is None:
+                    raise LLMError(f"Gemini stream failed: {e}") from e
+                if parts:
+                    raise error_class(f"Gemini stream interrupted after {len(parts)} chunk(s): {e}") from e
+                if attempt == self.max_retries:
+                    raise error_class(f"Gemini stream failed after {attempt + 1} attempts: {e}") from e
+                delay = backoff_delay(attempt)
+                logger.warning(f"Gemini stream failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        text = "".join(parts)
+        if self.cache.writes:
+            self.cache.put(key, model_name, prompt, generation_config, text)
+        return text
+
+    async def stream(self, prompt: str, model_name: str = None, generation_config: dict = None):
+        """Async generator of response text chunks; usable from any event loop."""
+        caller_loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        done = object()
+        future = self._loop.submit(
+            self._stream(prompt, model_name, generation_config, lambda text: caller_loop.call_soon_threadsafe(chunks.put_nowait, text))
+        )
+        future.add_done_callback(lambda _: caller_loop.call_soon_threadsafe(chunks.put_nowait, done))
+        while True:
+            item = await chunks.get()
+            if item is done:
+                break
+            yield item
+        future.result()  # re-raise errors from the stream
+
+    def stream_sync(self, prompt: str, model_name: str = None, generation_config: dict = None):
+        """Iterator of response text chunks for synchronous code."""
+        chunks = queue.Queue()
+        done = object()
+        future = self._loop.submit(self._stream(prompt, model_name, generation_config, chunks.put))
+        future.add_done_callback(lambda _: chunks.put(done))
+        while True:
+            item = chunks.get()
+            if item is done:
+                break
+            yield item
+        future.result()
+
+    async def generate(self, prompt: str, model_name: str = None, generation_config: dict = None) -> str:
+        """Generates text; awaitable from any event loop."""
+        return await self._loop.wrap(self._generate(prompt, model_name, generation_config))
+
+    def generate_sync(self, prompt: str, model_name: str = None, generation_config: dict = None) -> str:
+        """Generates text from synchronous code."""
+        return self._loop.run(self._generate(prompt, model_name, generation_config))
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> GeminiClient:
+    """Returns the process-wide Gemini client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient()
+        return _client
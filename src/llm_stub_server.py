@@ -0,0 +1,159 @@
+"""
+Local stand-in for the Gemini REST endpoint, for offline runs, pipeline
+benchmarks and load tests.
+
+It answers POST /v1beta/models/<model>:generateContent (and
+:streamGenerateContent with ?alt=sse) in the Gemini wire format:
+  - prompts recorded in the LLM cache (data/llm_cache) get their recorded text
+  - requests with a responseSchema get a schema-shaped JSON document
+  - anything else gets a canned story
+
+Usage (from the project root):
+    python src/llm_stub_server.py --port 8765 --latency 0.3 --error-rate 0.05
+    GEMINI_BASE_URL=http://127.0.0.1:8765 python src/main.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from llm_cache import LLMCache, cache_key
+
+CANNED_STORIES = [
+    "The old teddy bear sat on the shelf, watching children play for decades. One night, it whispered 'I remember you all.' The next morning, all the children's photos were facing the wall.",
+    "Sarah found a diary in her new house that documented her daily routine perfectly. The entries were dated three months into the future. The last entry simply read: 'She found the diary today.'",
+    "The smart doorbell kept recording even when unplugged. Every video showed the same figure approaching the door. The timestamp was always 3:33 AM, but the figure never knocked.",
+]
+ROUTE_PATTERN = re.compile(r"^/v1beta/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$")
+
+def _snake_case(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+def fake_from_schema(schema: dict, seed: str):
+    """Builds a deterministic value shaped like an OpenAPI-style response schema."""
+    schema_type = str(schema.get("type", "string")).lower()
+    if schema_type == "object":
+        return {name: fake_from_schema(sub, f"{seed}.{name}") for name, sub in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [fake_from_schema(schema.get("items", {}), f"{seed}[{i}]") for i in range(3)]
+    if schema_type in ("integer", "number"):
+        return int(hashlib.sha256(seed.encode()).hexdigest()[:4], 16) % 100
+    if schema_type == "boolean":
+        return True
+    return f"{seed.rsplit('.', 1)[-1]}: " + CANNED_STORIES[int(hashlib.sha256(seed.encode()).hexdigest(), 16) % len(CANNED_STORIES)]
+
+def respond_to(model_name: str, body: dict, cache: LLMCache) -> str:
+    """Returns the response text for a generateContent request body."""
+    prompt = "".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+    generation_config = {_snake_case(k): v for k, v in body.get("generationConfig", {}).items()} or None
+
+    recorded = cache.get(cache_key(model_name, prompt, generation_config))
+    if recorded is not None:
+        return recorded
+    if generation_config and generation_config.get("response_schema"):
+        return json.dumps(fake_from_schema(generation_config["response_schema"], "response"))
+    digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    if prompt.startswith("Summarize"):
+        return " ".join(CANNED_STORIES[digest % len(CANNED_STORIES)].split()[:15])
+    return CANNED_STORIES[digest % len(CANNED_STORIES)]
+
+def _candidate_payload(text: str, finish: bool = True) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finish:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate], "usageMetadata": {"candidatesTokenCount": len(text.split())}}
+
+def make_handler(cache: LLMCache, latency: float, error_rate: float, stream_chunk_words: int):
+    class GeminiStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            match = ROUTE_PATTERN.match(urlparse(self.path).path)
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not match:
+                self._send_json(404, {"error": {"code": 404, "message": f"Unknown path {self.path}"}})
+                return
+
+            if latency:
+                time.sleep(latency)
+            if error_rate and random.random() < error_rate:
+                self._send_json(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Stub quota exceeded"}})
+                return
+
+            text = respond_to(match.group("model"), body, cache)
+            if match.group("method") == "generateContent":
+                self._send_json(200, _candidate_payload(text))
+                return
+
+            # Server-sent events, a few words per chunk, like ?alt=sse on the real API
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            words = text.split(" ")
+            for i in range(0, len(words), stream_chunk_words):
+                chunk = " ".join(words[i:i + stream_chunk_words])
+                if i + stream_chunk_words < len(words):
+                    chunk += " "
+                finish = i + stream_chunk_words >= len(words)
+                self.wfile.write(f"data: {json.dumps(_candidate_payload(chunk, finish))}\r\n\r\n".encode("utf-8"))
+                self.wfile.flush()
+            self.close_connection = True
+
+    return GeminiStubHandler
+
+def start_server(host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0, error_rate: float = 0.0,
+                 stream_chunk_words: int = 8, cache_dir: str = None) -> ThreadingHTTPServer:
+    """Starts the stub in a daemon thread and returns the server (server.server_address has the port)."""
+    cache = LLMCache(mode="replay", cache_dir=cache_dir)
+    server = ThreadingHTTPServer((host, port), make_handler(cache, latency, error_rate, stream_chunk_words))
+    threading.Thread(target=server.serve_forever, name="gemini-stub", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini generateContent endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429.")
+    parser.add_argument("--stream-chunk-words", type=int, default=8, help="Words per streamed chunk.")
+    parser.add_argument("--cache-dir", default=None, help="LLM cache directory to serve recorded responses from.")
+    args = parser.parse_args()
+
+    server = start_server(args.host, args.port, args.latency, args.error_rate, args.stream_chunk_words, args.cache_dir)
+    host, port = server.server_address[:2]
+    print(f"Gemini stub listening on http://{host}:{port}")
+    print(f"Point the pipeline at it with: GEMINI_BASE_URL=http://{host}:{port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
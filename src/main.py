@@ -1,29 +1,53 @@
+import json
 import os
 import random
-import ffmpeg
 from dotenv import load_dotenv
-from story_generator import generate_story, generate_intro_text
-from voice_generator import generate_voice
+from story_generator import generate_story, generate_intro_text, stream_story, generate_story_package
+from voice_generator import generate_voice, generate_voice_from_stream
 from video_generator import create_video
-from utils.logger_config import logger
+from model_registry import prefetch
+from utils.logger_config import logger, set_stage
 from utils.telegram_notifier import notify
 
 load_dotenv()
 
-def get_media_duration(file_path: str) -> float:
+def select_background_music(project_root: str) -> str:
     """
-    Gets the duration of an audio or video file using ffprobe.
+    Picks a random track from assets/stock/music. Returns None if there is none.
     """
-    try:
-        probe = ffmpeg.probe(file_path)
-        for stream in probe['streams']:
-            if stream['codec_type'] in ['audio', 'video']:
-                return float(stream['duration'])
-        return 0.0
-    except ffmpeg.Error as e:
-        print(f"Error probing file {file_path}: {e.stderr.decode('utf8')}")
-        logger.error(f"Error probing file {file_path}: {e.stderr.decode('utf8')}")
-        return 0.0
+    background_music_dir = os.path.join(project_root, "assets", "stock", "music")
+    music_files = [f for f in os.listdir(background_music_dir) if os.path.isfile(os.path.join(background_music_dir, f))]
+    if not music_files:
+        print(f"No background music files found in {background_music_dir}. Exiting.")
+        logger.error(f"No background music files found in {background_music_dir}. Exiting.")
+        return None
+    background_music_path = os.path.join(background_music_dir, random.choice(music_files))
+    print(f"\nRandomly selected background music: {background_music_path}")
+    logger.info(f"Randomly selected background music: {background_music_path}")
+    return background_music_path
+
+def select_background_videos(project_root: str, effective_voice_duration: float) -> list:
+    """
+    Picks random clips from assets/stock/videos until they cover the narration.
+    Durations come from the stock index (see clip_planner), so known clips aren't
+    probed again. Returns an empty list if there are none.
+    """
+    from clip_planner import load_stock_index, choose_clips
+    background_videos_dir = os.path.join(project_root, "assets", "stock", "videos")
+    stock_clips = load_stock_index(background_videos_dir)
+    if not stock_clips:
+        print(f"No background video files found in {background_videos_dir}. Exiting.")
+        logger.error(f"No background video files found in {background_videos_dir}. Exiting.")
+        return []
+
+    max_segment = float(os.environ.get("CLIP_MAX_SECONDS", "0")) or None
+    chosen = choose_clips(stock_clips, effective_voice_duration, max_segment=max_segment)
+    background_video_paths = [clip["source_path"] for clip in chosen]
+    current_video_duration = sum(clip["duration"] for clip in chosen)
+
+    print(f"Selected {len(background_video_paths)} background videos with total duration {current_video_duration:.2f}s to cover voice duration {effective_voice_duration:.2f}s.")
+    logger.info(f"Selected {len(background_video_paths)} background videos with total duration {current_video_duration:.2f}s to cover voice duration {effective_voice_duration:.2f}s.")
+    return background_video_paths
 
 def main():
     """
@@ -55,109 +79,128 @@ def main():
         notify("Story Generation", "Failed", "The prompt file is empty.")
         return
 
-    print("\nGenerating story...")
-    logger.info("Generating story...")
-    story = generate_story(user_prompt)
-    print("\nGenerated Story:")
-    print(story)
-    logger.info("Generated Story:\n" + story)
+    # Download, verify and load the TTS and transcription models while Gemini writes the story.
+    # The pipeline's own get_kokoro()/load_vosk_model() calls wait for these instead of loading twice.
+    if os.environ.get("MODEL_PREFETCH", "1") != "0":
+        prefetch()
+
+    set_stage("story")
+    # STORY_MODE=stream feeds Gemini's streamed response to TTS sentence by sentence,
+    # STORY_MODE=structured gets story, intro and thumbnail text from one request
+    story_mode = os.environ.get("STORY_MODE", "classic").lower()
+
+    # Voice output paths
+    audio_output_dir = "output/generatedVoice"
+    os.makedirs(audio_output_dir, exist_ok=True)
+    output_audio_file = os.path.join(audio_output_dir, "generated_story.wav")
+    output_text_file = os.path.join(audio_output_dir, "generated_story.txt")
+
+    if story_mode == "stream":
+        print(f"\nStreaming story into voice generation ({output_audio_file})...")
+        logger.info(f"Streaming story into voice generation ({output_audio_file})...")
+        notify("Audio Generation", "Started", "Streaming story into Kokoro TTS.")
+        # The intro is summarised from the finished story, so the full story is narrated
+        story, voice_audio = generate_voice_from_stream(stream_story(user_prompt), output_audio_file, output_text_path=output_text_file)
+        print("\nGenerated Story:")
+        print(story)
+        logger.info("Generated Story:\n" + story)
+        notify("Audio Generation", "Completed", f"Audio saved to {output_audio_file}")
+    elif story_mode == "structured":
+        print("\nGenerating story, intro and thumbnail text...")
+        logger.info("Generating story, intro and thumbnail text...")
+        story_package = generate_story_package(user_prompt)
+        story = story_package["story"]
+        print("\nGenerated Story:")
+        print(story)
+        logger.info("Generated Story:\n" + story)
+    else:
+        print("\nGenerating story...")
+        logger.info("Generating story...")
+        story = generate_story(user_prompt)
+        print("\nGenerated Story:")
+        print(story)
+        logger.info("Generated Story:\n" + story)
 
-    # Generate intro text based on the story
-    intro_text = generate_intro_text(story)
+    if story_mode == "structured":
+        intro_text = story_package["intro"]
+        thumbnail_text = story_package["thumbnail_text"]
+    else:
+        # Generate intro text based on the story
+        intro_text = generate_intro_text(story)
+        thumbnail_text = intro_text
     print(f"\nGenerated Intro Text: {intro_text}")
     logger.info(f"Generated Intro Text: {intro_text}")
     notify("Content Generation", "Completed", f"The content has been successfully generated. contant ==> {intro_text}")
 
-    # Save intro text to a dedicated file
+    # Save thumbnail text to a dedicated file
     intro_text_path = os.path.join(project_root, "output", "generatedStory", "intro_and_thumb_text.txt")
     with open(intro_text_path, "w", encoding="utf-8") as f:
-        f.write(intro_text)
-    print(f"Intro text saved to {intro_text_path}")
-    logger.info(f"Intro text saved to {intro_text_path}")
+        f.write(thumbnail_text)
+    print(f"Thumbnail text saved to {intro_text_path}")
+    logger.info(f"Thumbnail text saved to {intro_text_path}")
 
-    # Generate Voice
-    audio_output_dir = "output/generatedVoice"
-    os.makedirs(audio_output_dir, exist_ok=True)
-    output_audio_file = os.path.join(audio_output_dir, "generated_story.wav")
-    output_text_file = os.path.join(audio_output_dir, "generated_story.txt")
-    print(f"\nGenerating voice for the story and saving to {output_audio_file}...")
-    logger.info(f"Generating voice for the story and saving to {output_audio_file}...")
-    notify("Audio Generation", "Started", "Generating audio using Kokoro TTS.")
-    # Remove intro_text from the main story before generating voice for the main content
-    # This assumes intro_text is a direct prefix of story.
-    if story.startswith(intro_text):
-        main_story_content = story[len(intro_text):].strip()
-        if not main_story_content: # Ensure main_story_content is not empty
-            print("Warning: Main story content became empty after removing intro. Using full story for voice generation.")
-            logger.warning("Main story content became empty after removing intro. Using full story for voice generation.")
+    set_stage("audio")
+    if story_mode == "structured":
+        # The story body comes without the intro, so no prefix stripping is needed
+        print(f"\nGenerating voice for the story and saving to {output_audio_file}...")
+        logger.info(f"Generating voice for the story and saving to {output_audio_file}...")
+        notify("Audio Generation", "Started", "Generating audio using Kokoro TTS.")
+        voice_audio = generate_voice(story, output_audio_file, output_text_path=output_text_file)
+        print("\nVoice generation completed.")
+        logger.info("Voice generation completed.")
+        notify("Audio Generation", "Completed", f"Audio saved to {output_audio_file}")
+    elif story_mode != "stream":
+        # Generate Voice
+        print(f"\nGenerating voice for the story and saving to {output_audio_file}...")
+        logger.info(f"Generating voice for the story and saving to {output_audio_file}...")
+        notify("Audio Generation", "Started", "Generating audio using Kokoro TTS.")
+        # Remove intro_text from the main story before generating voice for the main content
+        # This assumes intro_text is a direct prefix of story.
+        if story.startswith(intro_text):
+            main_story_content = story[len(intro_text):].strip()
+            if not main_story_content: # Ensure main_story_content is not empty
+                print("Warning: Main story content became empty after removing intro. Using full story for voice generation.")
+                logger.warning("Main story content became empty after removing intro. Using full story for voice generation.")
+                main_story_content = story
+        else:
+            print("Warning: Intro text not found at the beginning of the main story. Proceeding with full story for voice generation.")
+            logger.warning("Intro text not found at the beginning of the main story. Proceeding with full story for voice generation.")
             main_story_content = story
-    else:
-        print("Warning: Intro text not found at the beginning of the main story. Proceeding with full story for voice generation.")
-        logger.warning("Intro text not found at the beginning of the main story. Proceeding with full story for voice generation.")
-        main_story_content = story
-
-    generate_voice(main_story_content, output_audio_file, output_text_path=output_text_file)
-    print("\nVoice generation completed.")
-    logger.info("Voice generation completed.")
-    notify("Audio Generation", "Completed", f"Audio saved to {output_audio_file}")
-
-    # Get actual voice duration (after potential speed-up in video_generator)
-    # We need the original duration to select enough background videos
-    original_voice_duration = get_media_duration(output_audio_file)
+
+        voice_audio = generate_voice(main_story_content, output_audio_file, output_text_path=output_text_file)
+        print("\nVoice generation completed.")
+        logger.info("Voice generation completed.")
+        notify("Audio Generation", "Completed", f"Audio saved to {output_audio_file}")
+
+    # The voice artifact carries its duration (before the slow-down in video_generator);
+    # we need it to select enough background videos
+    original_voice_duration = voice_audio.duration
     if original_voice_duration == 0.0:
         print("Could not determine original voice duration. Exiting.")
         logger.error("Could not determine original voice duration. Exiting.")
         return
     
-    # Assuming speed_factor is 1.6 as previously set in video_generator.py
-    speed_factor = 1.6
-    effective_voice_duration = original_voice_duration / speed_factor
+    # create_video slows the narration by VOICE_SPEED_FACTOR and adds a pause after the intro;
+    # the clips cover both exactly (see clip_planner)
+    from video_generator import VOICE_SPEED_FACTOR, INTRO_SILENCE_SECONDS
+    effective_voice_duration = original_voice_duration / VOICE_SPEED_FACTOR + INTRO_SILENCE_SECONDS
 
     # Generate Video
+    set_stage("video")
     video_output_dir = "output/generatedVideo"
     os.makedirs(video_output_dir, exist_ok=True)
     output_video_file = os.path.join(video_output_dir, "final_story_video.mp4")
     
-    # Random selection for background music
-    background_music_dir = os.path.join(project_root, "assets", "stock", "music")
-    music_files = [f for f in os.listdir(background_music_dir) if os.path.isfile(os.path.join(background_music_dir, f))]
-    if not music_files:
-        print(f"No background music files found in {background_music_dir}. Exiting.")
-        logger.error(f"No background music files found in {background_music_dir}. Exiting.")
-        return
-    background_music_path = os.path.join(background_music_dir, random.choice(music_files))
-    print(f"\nRandomly selected background music: {background_music_path}")
-    logger.info(f"Randomly selected background music: {background_music_path}")
-
-    # Random selection for background videos based on voice duration
-    background_videos_dir = os.path.join(project_root, "assets", "stock", "videos")
-    all_video_files = [f for f in os.listdir(background_videos_dir) if os.path.isfile(os.path.join(background_videos_dir, f))]
-    if not all_video_files:
-        print(f"No background video files found in {background_videos_dir}. Exiting.")
-        logger.error(f"No background video files found in {background_videos_dir}. Exiting.")
+    background_music_path = select_background_music(project_root)
+    if not background_music_path:
         return
-
-    random.shuffle(all_video_files) # Shuffle to get a random order
-    background_video_paths = []
-    current_video_duration = 0.0
-
-    for video_file in all_video_files:
-        video_path = os.path.join(background_videos_dir, video_file)
-        duration = get_media_duration(video_path)
-        if duration > 0:
-            background_video_paths.append(video_path)
-            current_video_duration += duration
-            if current_video_duration >= effective_voice_duration:
-                break
-    
-    if not background_video_paths:
-        print("Could not select enough background videos to match voice duration. Exiting.")
-        logger.error("Could not select enough background videos to match voice duration. Exiting.")
+    # REEL_CACHE=1: a pre-rendered b-roll reel (see reel_cache.py) replaces the stock clips
+    from video_generator import find_background_reel, take_background_reel
+    reel = find_background_reel(effective_voice_duration)
+    background_video_paths = [] if reel else select_background_videos(project_root, effective_voice_duration)
+    if not reel and not background_video_paths:
         return
 
-    print(f"Selected {len(background_video_paths)} background videos with total duration {current_video_duration:.2f}s to cover voice duration {effective_voice_duration:.2f}s.")
-    logger.info(f"Selected {len(background_video_paths)} background videos with total duration {current_video_duration:.2f}s to cover voice duration {effective_voice_duration:.2f}s.")
-
     # Import GPU detection function
     from video_generator import detect_gpu_support
     
@@ -182,17 +225,55 @@ def main():
             print("Using CPU encoding")
             logger.info("Using CPU encoding")
 
+    renditions = [name.strip() for name in os.environ.get("VIDEO_RENDITIONS", "landscape").split(",") if name.strip()]
+
+    # RENDER_PLAN=1 writes the render plan and stops; MAX_ENCODE_SECONDS rejects jobs estimated to take longer
+    plan_only = os.environ.get("RENDER_PLAN") == "1"
+    max_encode_seconds = float(os.environ.get("MAX_ENCODE_SECONDS", "0"))
+    if plan_only or max_encode_seconds:
+        from render_planner import plan_video
+        plan = plan_video(
+            story, intro_text, voice_audio, background_music_path, background_video_paths, output_video_file,
+            use_gpu=use_gpu, gpu_device_id=gpu_device_id, renditions=renditions, reel=reel,
+        )
+        plan_path = os.path.join(video_output_dir, "render_plan.json")
+        with open(plan_path, "w", encoding="utf-8") as f:
+            json.dump(plan, f, indent=2)
+        estimated_seconds = plan["estimate"]["total_seconds"]
+        print(f"Render plan written to {plan_path} (estimated encode time {estimated_seconds:.0f}s)")
+        logger.info(f"Render plan written to {plan_path} (estimated encode time {estimated_seconds:.0f}s)")
+        if plan_only:
+            return
+        if estimated_seconds > max_encode_seconds:
+            print(f"Estimated encode time {estimated_seconds:.0f}s exceeds MAX_ENCODE_SECONDS={max_encode_seconds:.0f}. Skipping render.")
+            logger.error(f"Estimated encode time {estimated_seconds:.0f}s exceeds MAX_ENCODE_SECONDS={max_encode_seconds:.0f}. Skipping render.")
+            notify("Video Generation", "Failed", f"Estimated encode time {estimated_seconds:.0f}s is over the {max_encode_seconds:.0f}s limit.")
+            return
+
+    reel_path = None
+    if reel:
+        reel_path = take_background_reel(effective_voice_duration, output_video_file)
+        if not reel_path:
+            # Another render took the reel meanwhile
+            background_video_paths = select_background_videos(project_root, effective_voice_duration)
+            if not background_video_paths:
+                return
+
     print(f"\nGenerating video and saving to {output_video_file}...")
     logger.info(f"Generating video and saving to {output_video_file}...")
     create_video(
         story_text=story,
         intro_text=intro_text,
-        audio_path=output_audio_file,
+        audio_path=voice_audio,
         background_music_path=background_music_path,
         background_video_paths=background_video_paths,
         output_video_path=output_video_file,
         use_gpu=use_gpu,
         gpu_device_id=gpu_device_id,
+        # e.g. VIDEO_RENDITIONS=landscape,vertical also writes a 9:16 Shorts/Reels cut from the same render
+        renditions=renditions,
+        thumbnail_text=thumbnail_text,
+        reel_path=reel_path,
     )
     print("\nProcess completed successfully!")
     logger.info("Process completed successfully!")
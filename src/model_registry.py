@@ -0,0 +1,353 @@
+"""
+Model asset registry: where each model lives, where it comes from, which
+version it is and what its checksum should be.
+
+Assets are downloaded on demand and verified: a download must be complete
+(Content-Length) and match the asset's pinned sha256 before it replaces
+anything. The sha256 of the files is recorded in data/models/models.lock.json
+and only recomputed when a file changes. Hugging Face snapshots are checked
+file by file against the hashes the hub publishes. Models can be loaded and
+warmed up in background threads with prefetch(), so model load time overlaps
+the Gemini call instead of adding to it.
+
+Usage (from the project root):
+    python src/model_registry.py              # download + verify kokoro, kokoro_voices, vosk
+    python src/model_registry.py sd --warm    # download the SD weights and load them once
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+from zipfile import ZipFile
+
+import requests
+
+from utils.file_store import locked, write_json_atomic
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+MODELS_DIR = os.path.join(project_root, "data", "models")
+LOCK_PATH = os.path.join(MODELS_DIR, "models.lock.json")
+
+class ModelIntegrityError(Exception):
+    """A model file doesn't match its pinned or previously recorded checksum."""
+
+@dataclass(frozen=True)
+class ModelAsset:
+    name: str
+    version: str
+    path: str = None             # file or directory under data/models
+    url: str = None              # download source (a .zip is extracted into data/models)
+    sha256: Optional[str] = None # pinned checksum of the file at url (the archive for a .zip);
+                                 # None trusts and records the first complete download
+    repo_id: str = None          # Hugging Face repo, downloaded into the HF cache instead of data/models
+    allow_patterns: tuple = None # repo files to download (None = the whole repo)
+
+    @property
+    def local_path(self) -> str:
+        return os.path.join(MODELS_DIR, self.path) if self.path else None
+
+    @property
+    def is_archive(self) -> bool:
+        return bool(self.url) and self.url.endswith(".zip")
+
+# Fixed-URL assets take a `sha256` pin from the publisher's release digest.
+# Without one, the first complete download is recorded (with a warning).
+MODELS = {
+    "kokoro": ModelAsset(
+        name="kokoro",
+        version="1.0",
+        path="kokoro-v1.0.onnx",
+        url="https://github.com/thewh1teagle/kokoro-onnx/releases/download/model-files-v1.0/kokoro-v1.0.onnx",
+    ),
+    "kokoro_voices": ModelAsset(
+        name="kokoro_voices",
+        version="1.0",
+        path="voices-v1.0.bin",
+        url="https://github.com/thewh1teagle/kokoro-onnx/releases/download/model-files-v1.0/voices-v1.0.bin",
+    ),
+    "vosk": ModelAsset(
+        name="vosk",
+        version="small-en-us-0.15",
+        path="vosk-model-small-en-us-0.15",
+        url="https://alphacephei.com/vosk/models/vosk-model-small-en-us-0.15.zip",
+    ),
+    "sd": ModelAsset(
+        name="sd",
+        version=os.environ.get("IMAGE_MODEL_REVISION", "main"),
+        repo_id=os.environ.get("IMAGE_MODEL_ID", "runwayml/stable-diffusion-v1-5"),
+        # The diffusers layout in safetensors only; not the .ckpt, fp16, EMA or safety checker copies
+        allow_patterns=(
+            "model_index.json", "*/config.json", "scheduler/*.json", "feature_extractor/*.json", "tokenizer/*",
+            "text_encoder/model.safetensors",
+            "unet/diffusion_pytorch_model.safetensors",
+            "vae/diffusion_pytorch_model.safetensors",
+        ),
+    ),
+}
+DEFAULT_ASSETS = ("kokoro", "kokoro_voices", "vosk")
+
+_lock_file_lock = threading.Lock()
+_asset_locks = {name: threading.Lock() for name in MODELS}
+_verified = set()
+
+# -------------------------------
+# Download and verification
+# -------------------------------
+def _download(url: str, destination: str, sha256: str = None) -> str:
+    """
+    Streams url to destination through a temp file, hashing it on the way. The
+    temp file only replaces destination once it has the advertised length and,
+    if given, the expected sha256. Returns the sha256.
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    temp_path = f"{destination}.part"
+    print(f"Downloading {url}...")
+    digest = hashlib.sha256()
+    received = 0
+    try:
+        with requests.get(url, stream=True, timeout=60) as r:
+            r.raise_for_status()
+            # With a Content-Encoding the length is that of the encoded body
+            expected_size = None if r.headers.get("Content-Encoding") else r.headers.get("Content-Length")
+            with open(temp_path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    received += len(chunk)
+        if expected_size is not None and received != int(expected_size):
+            raise ModelIntegrityError(f"Download of {url} is incomplete: {received} of {expected_size} bytes")
+        if sha256 and digest.hexdigest() != sha256:
+            raise ModelIntegrityError(f"Download of {url} has sha256 {digest.hexdigest()}, expected {sha256}")
+        os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    if not sha256:
+        print(f"Warning: no pinned sha256 for {url}; recording {digest.hexdigest()}")
+    return digest.hexdigest()
+
+def _fetch(asset: ModelAsset):
+    if asset.is_archive:
+        zip_path = os.path.join(MODELS_DIR, os.path.basename(asset.url))
+        _download(asset.url, zip_path, asset.sha256)
+        print(f"Extracting {zip_path}...")
+        with ZipFile(zip_path, "r") as zip_ref:
+            zip_ref.extractall(MODELS_DIR)
+        os.remove(zip_path)
+    else:
+        _download(asset.url, asset.local_path, asset.sha256)
+
+def _files(path: str) -> list:
+    if os.path.isfile(path):
+        return [path]
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+def _fingerprint(path: str) -> dict:
+    """Cheap identity (total size, newest mtime) used to skip re-hashing unchanged files."""
+    stats = [os.stat(file_path) for file_path in _files(path)]
+    return {"size": sum(s.st_size for s in stats), "mtime": max((s.st_mtime for s in stats), default=0)}
+
+def compute_sha256(path: str) -> str:
+    """sha256 of a file, or of every file (relative path + contents) in a directory."""
+    digest = hashlib.sha256()
+    for file_path in _files(path):
+        if os.path.isdir(path):
+            digest.update(os.path.relpath(file_path, path).replace(os.sep, "/").encode("utf-8"))
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def _read_lock() -> dict:
+    if not os.path.exists(LOCK_PATH):
+        return {}
+    with open(LOCK_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_lock_entry(name: str, entry: dict):
+    # Workers on shared storage update the lock file too: flock + unique temp file
+    with _lock_file_lock, locked(LOCK_PATH):
+        lock = _read_lock()
+        lock[name] = entry
+        write_json_atomic(LOCK_PATH, lock, indent=2, sort_keys=True)
+
+def verify_asset(asset: ModelAsset) -> str:
+    """
+    Checks a downloaded asset against its pinned sha256, or the one recorded for
+    the same version (an archive's pin was checked before extracting it).
+    Unchanged files (same size and mtime) aren't hashed again. Returns the sha256.
+    """
+    path = asset.local_path
+    fingerprint = _fingerprint(path)
+    recorded = _read_lock().get(asset.name)
+    if recorded and recorded.get("version") == asset.version and all(recorded.get(k) == v for k, v in fingerprint.items()):
+        return recorded["sha256"]
+
+    started = time.monotonic()
+    sha256 = compute_sha256(path)
+    pinned = None if asset.is_archive else asset.sha256
+    expected = pinned or (recorded.get("sha256") if recorded and recorded.get("version") == asset.version else None)
+    if expected and sha256 != expected:
+        raise ModelIntegrityError(f"{asset.name} at {path} has sha256 {sha256}, expected {expected}. Delete it to re-download.")
+    _write_lock_entry(asset.name, {"version": asset.version, "path": asset.path, "sha256": sha256, **fingerprint})
+    print(f"Verified {asset.name} {asset.version} ({sha256[:12]}…) in {time.monotonic() - started:.1f}s")
+    return sha256
+
+def ensure_asset(name: str) -> str:
+    """
+    Returns the local path of a model, downloading and verifying it on first use.
+    Safe to call from several threads; each asset is fetched and checked once per process.
+    """
+    asset = MODELS[name]
+    with _asset_locks[name]:
+        if asset.repo_id:
+            if os.path.exists(asset.repo_id):
+                return asset.repo_id  # local weights (a .safetensors file or exported directory)
+            return _ensure_snapshot(asset)
+        if name in _verified:
+            return asset.local_path
+        if not os.path.exists(asset.local_path):
+            _fetch(asset)
+        verify_asset(asset)
+        _verified.add(name)
+        return asset.local_path
+
+def _snapshot_file_entry(path: str, file_path: str) -> tuple:
+    stat = os.stat(file_path)
+    relpath = os.path.relpath(file_path, path).replace(os.sep, "/")
+    return relpath, {"sha256": compute_sha256(file_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+def _published_sha256(asset: ModelAsset) -> dict:
+    """{repo file: sha256} for the repo's LFS files (the weights), as published by the hub."""
+    from huggingface_hub import HfApi
+    info = HfApi().model_info(asset.repo_id, revision=asset.version, files_metadata=True)
+    return {sibling.rfilename: sibling.lfs.sha256 for sibling in info.siblings if getattr(sibling, "lfs", None)}
+
+def _verify_snapshot(asset: ModelAsset, recorded: dict):
+    """Re-hashes snapshot files whose size or mtime changed since they were recorded."""
+    files, changed = dict(recorded["files"]), False
+    for relpath, entry in recorded["files"].items():
+        file_path = os.path.join(recorded["path"], relpath)
+        if not os.path.exists(file_path):
+            raise ModelIntegrityError(f"{asset.name}: {file_path} is missing. Delete the snapshot to re-download.")
+        stat = os.stat(file_path)
+        if (stat.st_size, stat.st_mtime) == (entry["size"], entry["mtime"]):
+            continue
+        _, files[relpath] = _snapshot_file_entry(recorded["path"], file_path)
+        if files[relpath]["sha256"] != entry["sha256"]:
+            raise ModelIntegrityError(f"{asset.name}: {file_path} changed since it was verified. Delete it to re-download.")
+        changed = True
+    if changed:
+        _write_lock_entry(asset.name, {**recorded, "files": files})
+
+def _ensure_snapshot(asset: ModelAsset) -> str:
+    """
+    Downloads a Hugging Face repo (its allow_patterns files) once per revision
+    and checks every weight file against the sha256 the hub publishes for it.
+    The snapshot directory and per-file hashes are recorded in the lock file, so
+    later runs use it without contacting the hub (re-hashing changed files only).
+    """
+    recorded = _read_lock().get(asset.name)
+    if (recorded and recorded.get("version") == asset.version and recorded.get("repo_id") == asset.repo_id
+            and os.path.isdir(recorded.get("path", "")) and "files" in recorded):
+        _verify_snapshot(asset, recorded)
+        return recorded["path"]
+
+    from huggingface_hub import snapshot_download
+    path = snapshot_download(
+        asset.repo_id, revision=asset.version, allow_patterns=list(asset.allow_patterns) if asset.allow_patterns else None
+    )
+    started = time.monotonic()
+    files = dict(_snapshot_file_entry(path, file_path) for file_path in _files(path))
+    published = _published_sha256(asset)
+    mismatched = sorted(relpath for relpath, entry in files.items()
+                        if relpath in published and published[relpath] != entry["sha256"])
+    if mismatched:
+        raise ModelIntegrityError(f"{asset.name}: {mismatched} in {path} don't match the hub's sha256. Delete them to re-download.")
+    _write_lock_entry(asset.name, {"version": asset.version, "repo_id": asset.repo_id, "path": path, "files": files})
+    print(f"Downloaded {asset.name} {asset.repo_id}@{asset.version} to {path}, "
+          f"verified {len(files)} files in {time.monotonic() - started:.1f}s")
+    return path
+
+# -------------------------------
+# Background load and warm-up
+# -------------------------------
+def _warm_kokoro():
+    from voice_generator import get_kokoro, available_voices
+    kokoro = get_kokoro()
+    kokoro.create(text="Warm up.", voice=available_voices[0], speed=1.0, lang="en-us")
+    return kokoro
+
+def _warm_vosk():
+    from transcriber import load_vosk_model
+    return load_vosk_model(ensure_asset("vosk"))
+
+def _warm_sd():
+    from image_generator import ImageGenerator
+    return ImageGenerator()
+
+WARMERS = {
+    "kokoro": _warm_kokoro,
+    "vosk": _warm_vosk,
+    "sd": _warm_sd,
+}
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="model-prefetch")
+_prefetched = {}
+
+def prefetch(names=DEFAULT_ASSETS, warm: bool = True) -> dict:
+    """
+    Starts downloading/verifying (and, with warm=True, loading and running once)
+    the given models in background threads. Returns {name: Future}; calling it
+    again for the same model returns the existing future.
+    """
+    futures = {}
+    for name in names:
+        key = (name, warm)
+        if key not in _prefetched:
+            def task(name=name):
+                started = time.monotonic()
+                result = ensure_asset(name)
+                if warm and name in WARMERS:
+                    result = WARMERS[name]()
+                print(f"Model '{name}' ready in {time.monotonic() - started:.1f}s")
+                return result
+            _prefetched[key] = _executor.submit(task)
+        futures[name] = _prefetched[key]
+    return futures
+
+def wait_for(futures: dict, timeout: float = None) -> dict:
+    """Waits for prefetch() futures; failures are reported and returned instead of raised."""
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout)
+        except Exception as e:
+            print(f"Warning: prefetching model '{name}' failed: {e}")
+            results[name] = e
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Download and verify the pipeline's models.")
+    parser.add_argument("names", nargs="*", default=list(DEFAULT_ASSETS), choices=list(MODELS), help="Models to fetch.")
+    parser.add_argument("--warm", action="store_true", help="Also load each model and run it once.")
+    args = parser.parse_args()
+
+    results = wait_for(prefetch(args.names, warm=args.warm))
+    failed = [name for name, result in results.items() if isinstance(result, Exception)]
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
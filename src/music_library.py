@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+
+import ffmpeg
+import numpy as np
+
+from ffmpeg_runner import run_ffmpeg
+from utils.file_store import locked, write_json_atomic
+
+# -------------------------------
+# Pre-analysed background music library
+# -------------------------------
+# Each track in assets/stock/music is decoded once to raw float32 PCM at the
+# mix rate and stored next to an index holding its duration and integrated
+# loudness. create_video then feeds the PCM file to ffmpeg with an input-level
+# loop (-stream_loop -1), so mixing needs no per-run decoding and no aloop
+# buffer sized to the whole narration.
+#
+# A track is analysed outside the index locks (its PCM is named by content, so
+# concurrent analyses of one track write the same file); the locks only cover
+# reading the index and merging the new entry.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+MUSIC_DIR = os.path.join(project_root, "assets", "stock", "music")
+LIBRARY_DIR = os.path.join(project_root, "data", "music_library")
+INDEX_PATH = os.path.join(LIBRARY_DIR, "index.json")
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+PCM_FORMAT = "f32le"
+BYTES_PER_FRAME = 4 * CHANNELS
+
+# MUSIC_NORMALIZE=1 brings every track to this level before music_volume is applied
+REFERENCE_LUFS = -14.0
+
+_index_lock = threading.Lock()
+
+def parse_integrated_loudness(ebur128_log: str):
+    """
+    Returns the integrated loudness (LUFS) from the ebur128 filter summary, or None.
+    """
+    summary = ebur128_log.rsplit("Summary:", 1)[-1]
+    match = re.search(r"I:\s*(-?\d+(?:\.\d+)?)\s*LUFS", summary)
+    return float(match.group(1)) if match else None
+
+def _load_index(index_path: str = INDEX_PATH) -> dict:
+    if not os.path.exists(index_path):
+        return {"tracks": {}}
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_index(index: dict, index_path: str = INDEX_PATH):
+    write_json_atomic(index_path, index, indent=2)
+
+def content_hash(source_path: str) -> str:
+    """sha256 of a track's bytes; names its PCM file, so tracks with the same file name can't collide."""
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _remove_unused_pcm(index: dict, pcm_path: str):
+    """Deletes a PCM file once no index entry (identical tracks share one) refers to it."""
+    if pcm_path and os.path.exists(pcm_path) and not any(t["pcm_path"] == pcm_path for t in index["tracks"].values()):
+        os.remove(pcm_path)
+
+def _is_fresh(entry: dict, source_path: str) -> bool:
+    stat = os.stat(source_path)
+    return (
+        entry.get("source_size") == stat.st_size
+        and entry.get("source_mtime") == stat.st_mtime
+        and os.path.exists(entry.get("pcm_path", ""))
+    )
+
+def analyze_track(source_path: str, library_dir: str = LIBRARY_DIR) -> dict:
+    """
+    Decodes a track to raw PCM at the mix rate and measures its integrated loudness
+    in the same ffmpeg pass. Returns the index entry.
+    """
+    os.makedirs(library_dir, exist_ok=True)
+    stat = os.stat(source_path)
+    sha256 = content_hash(source_path)
+    pcm_path = os.path.join(library_dir, f"{sha256[:16]}.{PCM_FORMAT}")
+    print(f"Analysing background music: {source_path}")
+
+    # Decoded to a private temp file and renamed, so a reader never maps a half-written PCM
+    temp_pcm_path = f"{pcm_path}.{uuid.uuid4().hex[:8]}.part"
+    audio = ffmpeg.input(source_path).audio.filter("aformat", sample_rates=SAMPLE_RATE, channel_layouts="stereo").filter_multi_output("asplit")
+    pcm_output = ffmpeg.output(audio[0], temp_pcm_path, f=PCM_FORMAT, acodec=f"pcm_{PCM_FORMAT}")
+    loudness_output = ffmpeg.output(audio[1].filter("ebur128"), "-", f="null")
+    try:
+        stderr = run_ffmpeg(ffmpeg.merge_outputs(pcm_output, loudness_output), stage="music_analysis")
+        os.replace(temp_pcm_path, pcm_path)
+    finally:
+        if os.path.exists(temp_pcm_path):
+            os.remove(temp_pcm_path)
+
+    return {
+        "source_path": os.path.abspath(source_path),
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime,
+        "content_sha256": sha256,
+        "pcm_path": pcm_path,
+        "sample_rate": SAMPLE_RATE,
+        "channels": CHANNELS,
+        "sample_format": PCM_FORMAT,
+        "duration": os.path.getsize(pcm_path) / (BYTES_PER_FRAME * SAMPLE_RATE),
+        "integrated_lufs": parse_integrated_loudness(stderr.decode("utf8", errors="replace")),
+    }
+
+def get_track(source_path: str, analyze: bool = True, index_path: str = INDEX_PATH) -> dict:
+    """
+    Returns the library entry for a track, analysing it first if it is missing or stale.
+    Returns None when the track isn't indexed and `analyze` is False.
+    """
+    key = os.path.abspath(source_path)
+    with _index_lock, locked(index_path):
+        entry = _load_index(index_path)["tracks"].get(key)
+    if entry and _is_fresh(entry, source_path):
+        return entry
+    if not analyze:
+        return None
+
+    # The decode + loudness pass runs unlocked; only the merge holds the index
+    entry = analyze_track(source_path, os.path.dirname(index_path))
+    with _index_lock, locked(index_path):
+        index = _load_index(index_path)
+        previous = index["tracks"].get(key)
+        index["tracks"][key] = entry
+        if previous:
+            _remove_unused_pcm(index, previous["pcm_path"])
+        _save_index(index, index_path)
+    return entry
+
+def build_library(music_dir: str = MUSIC_DIR, index_path: str = INDEX_PATH) -> dict:
+    """
+    Analyses every track in `music_dir` that isn't already indexed and drops entries for removed files.
+    """
+    sources = [
+        os.path.abspath(os.path.join(music_dir, f))
+        for f in sorted(os.listdir(music_dir))
+        if os.path.isfile(os.path.join(music_dir, f))
+    ]
+    for source_path in sources:
+        get_track(source_path, index_path=index_path)
+
+    with _index_lock, locked(index_path):
+        index = _load_index(index_path)
+        for key in list(index["tracks"]):
+            if os.path.dirname(key) == os.path.abspath(music_dir) and key not in sources:
+                stale = index["tracks"].pop(key)
+                _remove_unused_pcm(index, stale["pcm_path"])
+        _save_index(index, index_path)
+    return index
+
+def load_pcm(entry: dict) -> np.memmap:
+    """Memory-maps a track's decoded samples as a (frames, channels) float32 array."""
+    return np.memmap(entry["pcm_path"], dtype="<f4", mode="r").reshape(-1, entry["channels"])
+
+def loudness_gain(entry: dict, music_volume: float, normalize: bool = None) -> float:
+    """
+    Linear gain for the track: `music_volume`, and with MUSIC_NORMALIZE=1 (or
+    normalize=True) the gain that first brings the track to REFERENCE_LUFS.
+    """
+    if normalize is None:
+        normalize = os.environ.get("MUSIC_NORMALIZE", "0") == "1"
+    if not normalize or not entry or entry.get("integrated_lufs") is None:
+        return music_volume
+    return music_volume * 10 ** ((REFERENCE_LUFS - entry["integrated_lufs"]) / 20)
+
+def looped_music_input(source_path: str, start_offset: float = 0.0, entry: dict = None, analyze: bool = True):
+    """
+    Returns an ffmpeg input that loops the track forever at the input level.
+    Uses the pre-decoded PCM when the track is indexed, the original file otherwise.
+    """
+    if entry is None and analyze:
+        try:
+            entry = get_track(source_path)
+        except (ffmpeg.Error, OSError) as e:
+            print(f"Warning: could not analyse {source_path}, looping the original file: {e}")
+            entry = None
+
+    if entry is None:
+        return ffmpeg.input(source_path, stream_loop=-1)
+
+    offset = start_offset % entry["duration"] if entry["duration"] else 0.0
+    input_args = {"f": entry["sample_format"], "ar": entry["sample_rate"], "ac": entry["channels"], "stream_loop": -1}
+    if offset:
+        input_args["ss"] = offset
+    return ffmpeg.input(entry["pcm_path"], **input_args)
+
+if __name__ == "__main__":
+    library = build_library()
+    for path, track in library["tracks"].items():
+        print(f"{os.path.basename(path)}: {track['duration']:.1f}s, {track['integrated_lufs']} LUFS -> {track['pcm_path']}")
@@ -1,51 +1,97 @@
+import asyncio
 import os
 import re
+import aiohttp
 import requests
 import pysbd
-from PIL import Image
-from io import BytesIO
 import urllib.parse
 import time
+from llm_client import backoff_delay
+from image_cache import ImageCache, image_cache_key, materialize
+
+# Simultaneous image requests for the async batch path (POLLINATIONS_CONCURRENCY)
+DEFAULT_CONCURRENCY = 4
+MODEL = "dall-e-3"
+WIDTH = 1920
+HEIGHT = 1080
+CHUNK_SIZE = 64 * 1024
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'image/png,image/jpeg;q=0.9,*/*;q=0.8'
+}
 
 def clean_filename(text):
     """Sanitizes text to be a valid filename."""
     text = re.sub(r'[\\/*?:"<>|]', "", text)
     return text[:100]
 
-def generate_pollinations_image(prompt, output_path, retries=3, delay=10):
+def build_pollinations_url(prompt):
+    # URL-encode the prompt and add some style modifiers for better results
+    encoded_prompt = urllib.parse.quote(prompt)
+    # Construct the Pollinations URL, request 1920x1080, and remove logo
+    return f"https://pollinations.ai/p/{encoded_prompt}?model={MODEL}&width={WIDTH}&height={HEIGHT}&nologo=true"
+
+_image_cache = None
+
+def get_image_cache() -> ImageCache:
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = ImageCache()
+    return _image_cache
+
+def _cached_image(cache, key, output_path):
+    cached_path = cache.get(key)
+    if cached_path:
+        output_path = materialize(cached_path, output_path)
+        print(f"Image cache hit, saved to {output_path}")
+        return output_path
+    return None
+
+def _finish_download(cache, key, writer, output_path):
+    """
+    Commits a streamed download to the cache and places it at output_path
+    (with the extension of the format actually received).
+    """
+    if writer.extension is None:
+        writer.discard()
+        print("Error: The response was not a valid image file. The server may be overloaded or the prompt was rejected.")
+        return None
+    output_path = materialize(cache.commit(key, writer), output_path)
+    print(f"Image saved to {output_path}")
+    return output_path
+
+def generate_pollinations_image(prompt, output_path, retries=3, delay=10, cache=None):
     """
     Generates an image using Pollinations AI and saves it.
+    The response is streamed to disk as-is (no decode/re-encode) and cached per prompt.
+    Returns the saved path, whose extension matches the image format received.
     """
     print(f"Generating image for prompt: '{prompt}' ...")
-    
-    # URL-encode the prompt and add some style modifiers for better results
-    encoded_prompt = urllib.parse.quote(prompt)
-    # Construct the Pollinations URL, request 1920x1080, and remove logo
-    url = f"https://pollinations.ai/p/{encoded_prompt}?model=dall-e-3&width=1920&height=1080&nologo=true"
-    
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'image/png,image/jpeg;q=0.9,*/*;q=0.8'
-    }
+    cache = cache or get_image_cache()
+    key = image_cache_key(prompt, MODEL, WIDTH, HEIGHT)
+    cached_path = _cached_image(cache, key, output_path)
+    if cached_path:
+        return cached_path
+    url = build_pollinations_url(prompt)
     
     for attempt in range(retries):
         try:
-            response = requests.get(url, headers=headers, timeout=300) # Long timeout for image generation
-            response.raise_for_status()  # Raise an exception for bad status codes
-            
-            if 'image' in response.headers.get('Content-Type', ''):
-                try:
-                    image_data = BytesIO(response.content)
-                    image = Image.open(image_data)
-                    image.save(output_path)
-                    print(f"Image saved to {output_path}")
-                    return output_path
-                except Image.UnidentifiedImageError:
-                    print("Error: The response was not a valid image file. The server may be overloaded or the prompt was rejected.")
+            with requests.get(url, headers=HEADERS, timeout=300, stream=True) as response: # Long timeout for image generation
+                response.raise_for_status()  # Raise an exception for bad status codes
+                if 'image' not in response.headers.get('Content-Type', ''):
+                    print(f"Warning: Response from Pollinations was not an image. Content-Type: {response.headers.get('Content-Type')}")
                     return None
-            else:
-                print(f"Warning: Response from Pollinations was not an image. Content-Type: {response.headers.get('Content-Type')}")
-                return None
+
+                writer = cache.writer(key)
+                try:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        if not writer.write(chunk):
+                            break
+                    writer.close()
+                except BaseException:
+                    writer.discard()
+                    raise
+            return _finish_download(cache, key, writer, output_path)
 
         except requests.exceptions.RequestException as e:
             print(f"Error generating image: {e}. Attempt {attempt + 1} of {retries}.")
@@ -56,6 +102,58 @@ def generate_pollinations_image(prompt, output_path, retries=3, delay=10):
                 print("Failed to generate image after multiple retries.")
                 return None
 
+async def generate_pollinations_image_async(session, prompt, output_path, retries=3, delay=10, cache=None):
+    """
+    Async version of generate_pollinations_image on a shared aiohttp session.
+    Retries wait with jittered exponential backoff instead of blocking the event loop.
+    """
+    print(f"Generating image for prompt: '{prompt}' ...")
+    cache = cache or get_image_cache()
+    key = image_cache_key(prompt, MODEL, WIDTH, HEIGHT)
+    cached_path = _cached_image(cache, key, output_path)
+    if cached_path:
+        return cached_path
+    url = build_pollinations_url(prompt)
+
+    for attempt in range(retries):
+        try:
+            async with session.get(url, headers=HEADERS) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('Content-Type', '')
+                if 'image' not in content_type:
+                    print(f"Warning: Response from Pollinations was not an image. Content-Type: {content_type}")
+                    return None
+
+                writer = cache.writer(key)
+                try:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        if not writer.write(chunk):
+                            break
+                    writer.close()
+                except BaseException:
+                    writer.discard()
+                    raise
+            return _finish_download(cache, key, writer, output_path)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error generating image: {e}. Attempt {attempt + 1} of {retries}.")
+            if attempt < retries - 1:
+                wait = backoff_delay(attempt, base=delay, cap=delay * 4)
+                print(f"Retrying in {wait:.1f} seconds...")
+                await asyncio.sleep(wait)
+            else:
+                print("Failed to generate image after multiple retries.")
+                return None
+
+def create_image_session(concurrency=None, timeout=300):
+    """
+    aiohttp session for Pollinations: the connector pool caps simultaneous
+    requests, and the long timeout covers slow image generation.
+    """
+    concurrency = concurrency or int(os.environ.get("POLLINATIONS_CONCURRENCY", DEFAULT_CONCURRENCY))
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout))
+
 def main():
     output_dir = "output/generatedImage"
     os.makedirs(output_dir, exist_ok=True)
@@ -0,0 +1,292 @@
+import os
+import urllib.parse
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+# -------------------------------
+# Pillow renderer for the social-post thumbnails
+# -------------------------------
+# Draws the X and Facebook cards from thumbnail_generator.py without a browser.
+# Sizes, colors and spacing follow the CSS of those templates (1 CSS px = 1 px,
+# like the Playwright screenshot). Fonts and the static card chrome are
+# rasterized once and reused; each render only lays out the text.
+
+FONT_CANDIDATES = {
+    # Same order as the CSS font-family lists, then metric-compatible fallbacks
+    "x": {
+        "regular": ["segoeui.ttf", "arial.ttf", "LiberationSans-Regular.ttf", "DejaVuSans.ttf"],
+        "bold": ["segoeuib.ttf", "arialbd.ttf", "LiberationSans-Bold.ttf", "DejaVuSans-Bold.ttf"],
+    },
+    "facebook": {
+        "regular": ["Helvetica.ttc", "arial.ttf", "LiberationSans-Regular.ttf", "DejaVuSans.ttf"],
+        "bold": ["Helvetica.ttc", "arialbd.ttf", "LiberationSans-Bold.ttf", "DejaVuSans-Bold.ttf"],
+    },
+}
+
+TEMPLATES = {
+    "x": {
+        "card_color": "#000000",
+        "border_color": "#38444d",
+        "radius": 16,
+        "max_width": 580,
+        "text_color": "#e7e9ea",
+        "muted_color": "#71767b",
+        "line_height": 20,
+        "header_gap": 8,
+        "avatar_color": "#333639",
+    },
+    "facebook": {
+        "card_color": "#242526",
+        "border_color": None,
+        "radius": 8,
+        "max_width": 500,
+        "text_color": "#e4e6eb",
+        "muted_color": "#b0b3b8",
+        "line_height": 20,  # 15px * 1.33
+        "header_gap": 12,
+        "avatar_color": "#3a3b3c",
+        "divider_color": "#3a3b3c",
+    },
+}
+PADDING = 16
+AVATAR_SIZE = 40
+AVATAR_GAP = 10
+CONTENT_GAP = 12
+SUPERSAMPLE = 4  # rounded shapes are drawn larger and downscaled for smooth edges
+
+@lru_cache(maxsize=None)
+def get_font(platform: str, weight: str, size: int) -> ImageFont.FreeTypeFont:
+    """Loads (once) the first available font for a template's CSS font stack."""
+    for name in FONT_CANDIDATES[platform][weight]:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+@lru_cache(maxsize=64)
+def card_background(platform: str, width: int, height: int) -> Image.Image:
+    """Pre-rasterized card shape (fill, rounded corners, border) for a template and size."""
+    template = TEMPLATES[platform]
+    scale = SUPERSAMPLE
+    big = Image.new("RGBA", (width * scale, height * scale), (0, 0, 0, 0))
+    ImageDraw.Draw(big).rounded_rectangle(
+        (0, 0, width * scale - 1, height * scale - 1),
+        radius=template["radius"] * scale,
+        fill=template["card_color"],
+        outline=template["border_color"],
+        width=scale if template["border_color"] else 0,
+    )
+    return big.resize((width, height), Image.LANCZOS)
+
+@lru_cache(maxsize=None)
+def _circle_mask(size: int) -> Image.Image:
+    big = Image.new("L", (size * SUPERSAMPLE, size * SUPERSAMPLE), 0)
+    ImageDraw.Draw(big).ellipse((0, 0, size * SUPERSAMPLE - 1, size * SUPERSAMPLE - 1), fill=255)
+    return big.resize((size, size), Image.LANCZOS)
+
+@lru_cache(maxsize=None)
+def _icon(kind: str, size: int, color: str) -> Image.Image:
+    """Simple raster stand-ins for the templates' inline SVG icons."""
+    scale = SUPERSAMPLE
+    big = Image.new("RGBA", (size * scale, size * scale), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(big)
+    s = size * scale
+    stroke = max(1, s // 12)
+    if kind == "heart":
+        draw.ellipse((s * 0.08, s * 0.18, s * 0.52, s * 0.6), fill=color)
+        draw.ellipse((s * 0.48, s * 0.18, s * 0.92, s * 0.6), fill=color)
+        draw.polygon([(s * 0.1, s * 0.46), (s * 0.9, s * 0.46), (s * 0.5, s * 0.9)], fill=color)
+    elif kind == "reply":
+        draw.rounded_rectangle((s * 0.1, s * 0.15, s * 0.9, s * 0.7), radius=s * 0.2, outline=color, width=stroke)
+        draw.polygon([(s * 0.3, s * 0.65), (s * 0.5, s * 0.65), (s * 0.3, s * 0.88)], fill=color)
+    elif kind == "repost":
+        draw.rectangle((s * 0.15, s * 0.15, s * 0.85, s * 0.85), outline=color, width=stroke)
+        draw.line((s * 0.5, s * 0.3, s * 0.5, s * 0.7), fill=color, width=stroke)
+        draw.line((s * 0.3, s * 0.5, s * 0.7, s * 0.5), fill=color, width=stroke)
+    elif kind == "views":
+        draw.ellipse((s * 0.07, s * 0.07, s * 0.93, s * 0.93), outline=color, width=stroke)
+        draw.line((s * 0.5, s * 0.3, s * 0.5, s * 0.7), fill=color, width=stroke)
+        draw.line((s * 0.3, s * 0.5, s * 0.7, s * 0.5), fill=color, width=stroke)
+    elif kind == "pin":
+        draw.ellipse((s * 0.25, s * 0.08, s * 0.75, s * 0.58), outline=color, width=stroke)
+        draw.polygon([(s * 0.28, s * 0.45), (s * 0.72, s * 0.45), (s * 0.5, s * 0.92)], fill=color)
+    elif kind == "verified":
+        draw.ellipse((0, 0, s - 1, s - 1), fill="#1d9bf0")
+        draw.line([(s * 0.28, s * 0.52), (s * 0.44, s * 0.68), (s * 0.74, s * 0.34)], fill="white", width=stroke * 2)
+    return big.resize((size, size), Image.LANCZOS)
+
+def _load_avatar(profile_pic_path: str, color: str) -> Image.Image:
+    """Circle-cropped avatar from a local file (or file:// URL); a plain circle otherwise."""
+    avatar = None
+    if profile_pic_path:
+        path = profile_pic_path
+        if path.startswith("file://"):
+            path = urllib.parse.unquote(urllib.parse.urlparse(path).path)
+        if os.path.exists(path):
+            with Image.open(path) as source:
+                avatar = source.convert("RGBA")
+            # background-size: cover
+            side = min(avatar.size)
+            left, top = (avatar.width - side) // 2, (avatar.height - side) // 2
+            avatar = avatar.crop((left, top, left + side, top + side)).resize((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+    if avatar is None:
+        avatar = Image.new("RGBA", (AVATAR_SIZE, AVATAR_SIZE), color)
+    circle = Image.new("RGBA", (AVATAR_SIZE, AVATAR_SIZE), (0, 0, 0, 0))
+    circle.paste(avatar, (0, 0), _circle_mask(AVATAR_SIZE))
+    return circle
+
+def wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list:
+    """
+    Wraps like CSS white-space: pre-wrap + word-wrap: break-word:
+    explicit newlines are kept, words wrap at max_width and overlong words are split.
+    """
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if font.getlength(candidate) <= max_width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            line = ""
+            while font.getlength(word) > max_width:
+                cut = len(word)
+                while cut > 1 and font.getlength(word[:cut]) > max_width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        lines.append(line)
+    return lines
+
+def _content_width(template: dict, text: str, font, header_width: float, footer_width: float) -> int:
+    """
+    Shrink-to-fit width of the card's content box: the unwrapped (max-content)
+    width of the widest paragraph, capped by the template's max-width.
+    """
+    max_content = template["max_width"]  # CSS max-width applies to the content box
+    text_width = max(font.getlength(paragraph) for paragraph in text.split("\n"))
+    return int(min(max_content, max(text_width, header_width, footer_width)) + 0.5)
+
+def _draw_lines(draw, lines, x, y, font, color, line_height):
+    for line in lines:
+        # Center each line in its line box, like CSS line-height
+        ascent, descent = font.getmetrics()
+        draw.text((x, y + (line_height - ascent - descent) / 2), line, font=font, fill=color)
+        y += line_height
+    return y
+
+def render_x_card(text_content, username, handle, time_ago, likes, comments, shares, profile_pic_path=None) -> Image.Image:
+    template = TEMPLATES["x"]
+    body_font = get_font("x", "regular", 15)
+    name_font = get_font("x", "bold", 15)
+    footer_font = get_font("x", "regular", 13)
+    max_content = template["max_width"]  # CSS max-width applies to the content box
+
+    lines = wrap_text(text_content, body_font, max_content)
+    footer_items = [("heart", f"{likes} 😔"), ("reply", comments), ("repost", shares), ("views", "5.9K")]
+    header_width = AVATAR_SIZE + AVATAR_GAP + max(
+        name_font.getlength(username), footer_font.getlength(f"{handle} · {time_ago}"), 18
+    )
+    footer_width = sum(18 + 5 + footer_font.getlength(str(label)) for _, label in footer_items)
+    content_width = _content_width(template, text_content, body_font, header_width, footer_width)
+
+    # Header: name, verified badge and handle stacked next to the avatar
+    header_height = max(AVATAR_SIZE, 20 + 18 + 20)
+    footer_height = 18
+    height = PADDING + header_height + template["header_gap"] + len(lines) * template["line_height"] + CONTENT_GAP + footer_height + PADDING
+    width = content_width + 2 * PADDING
+
+    card = card_background("x", width, height).copy()
+    draw = ImageDraw.Draw(card)
+    card.alpha_composite(_load_avatar(profile_pic_path, template["avatar_color"]), (PADDING, PADDING))
+    info_x = PADDING + AVATAR_SIZE + AVATAR_GAP
+    y = _draw_lines(draw, [username], info_x, PADDING, name_font, template["text_color"], 20)
+    card.alpha_composite(_icon("verified", 18, "#1d9bf0"), (info_x + 5, y))
+    _draw_lines(draw, [f"{handle} · {time_ago}"], info_x, y + 18, footer_font, template["muted_color"], 20)
+
+    y = _draw_lines(draw, lines, PADDING, PADDING + header_height + template["header_gap"], body_font, template["text_color"], template["line_height"])
+
+    # Footer: justify-content: space-around
+    y += CONTENT_GAP
+    item_widths = [18 + 5 + footer_font.getlength(str(label)) for _, label in footer_items]
+    gap = (content_width - sum(item_widths)) / len(footer_items)
+    x = PADDING + gap / 2
+    for (icon, label), item_width in zip(footer_items, item_widths):
+        card.alpha_composite(_icon(icon, 18, template["muted_color"]), (int(x), int(y)))
+        _draw_lines(draw, [str(label)], x + 23, y, footer_font, template["muted_color"], footer_height)
+        x += item_width + gap
+    return card
+
+def render_facebook_card(text_content, username, time_ago, likes, comments, shares, profile_pic_path=None) -> Image.Image:
+    template = TEMPLATES["facebook"]
+    body_font = get_font("facebook", "regular", 15)
+    name_font = get_font("facebook", "bold", 15)
+    small_font = get_font("facebook", "regular", 13)
+    action_font = get_font("facebook", "regular", 14)
+    max_content = template["max_width"]  # CSS max-width applies to the content box
+
+    lines = wrap_text(text_content, body_font, max_content)
+    counts_left, counts_right = f"👍 {likes}", f"{comments} Comments · {shares} Shares"
+    actions = ["Like", "Comment", "Share"]
+    header_width = AVATAR_SIZE + AVATAR_GAP + max(name_font.getlength(username), small_font.getlength(f"{time_ago} · 🌍"))
+    counts_width = small_font.getlength(counts_left) + small_font.getlength(counts_right)
+    actions_width = sum(20 + 6 + action_font.getlength(label) for label in actions)
+    content_width = _content_width(template, text_content, body_font, header_width, max(counts_width, actions_width))
+
+    header_height = AVATAR_SIZE
+    counts_height = 18
+    actions_height = 20
+    height = (PADDING + header_height + template["header_gap"] + len(lines) * template["line_height"] + CONTENT_GAP
+              + counts_height + 8 + 8 + 1 + 8 + actions_height + PADDING)
+    width = content_width + 2 * PADDING
+
+    card = card_background("facebook", width, height).copy()
+    draw = ImageDraw.Draw(card)
+    card.alpha_composite(_load_avatar(profile_pic_path, template["avatar_color"]), (PADDING, PADDING))
+    info_x = PADDING + AVATAR_SIZE + AVATAR_GAP
+    y = _draw_lines(draw, [username], info_x, PADDING, name_font, template["text_color"], 20)
+    _draw_lines(draw, [f"{time_ago} · 🌍"], info_x, y, small_font, template["muted_color"], 20)
+
+    y = _draw_lines(draw, lines, PADDING, PADDING + header_height + template["header_gap"], body_font, template["text_color"], template["line_height"])
+
+    # Likes on the left, comments/shares on the right
+    y += CONTENT_GAP
+    _draw_lines(draw, [counts_left], PADDING, y, small_font, template["muted_color"], counts_height)
+    right_x = PADDING + content_width - small_font.getlength(counts_right)
+    _draw_lines(draw, [counts_right], right_x, y, small_font, template["muted_color"], counts_height)
+
+    # Divider, then Like / Comment / Share with justify-content: space-between
+    y += counts_height + 8 + 8
+    draw.line((PADDING, y, PADDING + content_width - 1, y), fill=template["divider_color"], width=1)
+    y += 1 + 8
+    item_widths = [20 + 6 + action_font.getlength(label) for label in actions]
+    gap = (content_width - sum(item_widths)) / (len(actions) - 1)
+    x = PADDING
+    for label, item_width in zip(actions, item_widths):
+        card.alpha_composite(_icon("pin", 20, template["muted_color"]), (int(x), int(y)))
+        _draw_lines(draw, [label], x + 26, y, action_font, template["muted_color"], actions_height)
+        x += item_width + gap
+    return card
+
+def render_post_card(platform: str, text_content: str, output_path: str, profile_pic_path: str = None,
+                     username: str = "User Name", handle: str = "@username", time_ago: str = "1h",
+                     likes: str = "", comments: str = "", shares: str = "") -> str:
+    """Renders a post card and saves it as an opaque PNG. Returns output_path."""
+    if platform == "x":
+        card = render_x_card(text_content, username, handle, time_ago, likes, comments, shares, profile_pic_path)
+        page_color = "#000000"
+    elif platform == "facebook":
+        card = render_facebook_card(text_content, username, time_ago, likes, comments, shares, profile_pic_path)
+        page_color = "#18191a"
+    else:
+        raise ValueError(f"Unsupported platform: {platform}. Choose 'x' or 'facebook'.")
+
+    # The screenshot clip includes the page background behind the rounded corners
+    image = Image.new("RGBA", card.size, page_color)
+    image.alpha_composite(card)
+    image.convert("RGB").save(output_path)
+    return output_path
@@ -0,0 +1,263 @@
+"""
+Pre-rendered b-roll reels.
+
+Background footage doesn't depend on the story, so it can be rendered ahead of
+time. While the host is idle, the filler cuts stock clips into reels of
+standard lengths (REEL_DURATIONS). Each reel is already scaled to 1920x1080,
+normalized to one frame rate and graded. With REEL_CACHE=1 a render takes the
+shortest reel that covers the narration (video_generator.take_background_reel)
+and create_video only has to trim it, burn captions and mux.
+
+A reel is consumed by the video that takes it (it is moved out of the cache
+atomically, so two renders never share one). The filler keeps REEL_STOCK reels
+per length and the cache under REEL_CACHE_MAX_MB by evicting the oldest.
+
+The filler yields to real work: it runs at a lower priority (REEL_NICE) on
+REEL_THREADS encoder threads, and a reel in progress is cancelled as soon as
+the host stops being idle.
+
+Usage (from the project root):
+    python src/reel_cache.py --fill       # render missing reels now, idle or not
+    python src/reel_cache.py --daemon     # keep the stock topped up while the host is idle
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+
+import ffmpeg
+
+from clip_planner import VIDEO_DIR, INDEX_PATH, load_stock_index, choose_clips, plan_segments
+from ffmpeg_runner import run_ffmpeg, FFmpegCancelled
+from video_generator import GRADE, TIMELINE_SIZE
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+REEL_DURATIONS = (30, 60, 120, 300, 600)
+REEL_FPS = 30
+REEL_THREADS = int(os.environ.get("REEL_THREADS", max(1, (os.cpu_count() or 2) // 2)))
+REEL_OUTPUT_ARGS = {"c:v": "libx264", "preset": "medium", "crf": 18, "pix_fmt": "yuv420p", "threads": REEL_THREADS, "an": None}
+
+# -------------------------------
+# Rendering
+# -------------------------------
+def build_reel(segments: list, output_path: str, fade_duration: float = 1.0):
+    """
+    One ffmpeg graph that seeks into every source, normalizes each segment
+    (size, SAR, frame rate), fades it, concatenates and grades the result.
+    """
+    width, height = TIMELINE_SIZE
+    streams = []
+    for segment in segments:
+        stream = (
+            ffmpeg.input(segment.source_path, ss=segment.in_point, t=segment.duration).video
+            .filter('scale', width, height)
+            .filter('setsar', '1/1')
+            .filter('fps', REEL_FPS)
+            .filter('fade', type='in', start_time=0, duration=fade_duration)
+            .filter('fade', type='out', start_time=segment.duration - fade_duration, duration=fade_duration)
+        )
+        streams.append(stream)
+    reel = ffmpeg.concat(*streams, v=1, a=0).filter('eq', **GRADE)
+    return ffmpeg.output(reel, output_path, format='mp4', **REEL_OUTPUT_ARGS)
+
+def render_reel(duration: float, output_path: str, video_dir: str = VIDEO_DIR, index_path: str = INDEX_PATH,
+                rng: random.Random = None, runner_options: dict = None) -> list:
+    """Renders a `duration`-second reel from random stock footage. Returns the segments used."""
+    rng = rng or random.Random()
+    stock_clips = load_stock_index(video_dir, index_path)
+    if not stock_clips:
+        raise ValueError("No stock clips to build a reel from")
+    segments = plan_segments(choose_clips(stock_clips, duration, rng=rng), duration, random_seek=True, rng=rng)
+    run_ffmpeg(build_reel(segments, output_path), stage="reel", expected_duration=duration, **(runner_options or {}))
+    return segments
+
+# -------------------------------
+# Cache
+# -------------------------------
+class ReelCache:
+    """
+    Directory of finished reels: <id>.mp4 next to <id>.json (duration, segments).
+    A reel is only listed once its .json exists, so readers never see one that
+    is still being written.
+    """
+    def __init__(self, cache_dir: str = None, max_bytes: int = None, stock: int = None):
+        self.cache_dir = cache_dir or os.environ.get("REEL_CACHE_DIR", os.path.join(project_root, "data", "reel_cache"))
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.environ.get("REEL_CACHE_MAX_MB", "4096")) * 1024 * 1024)
+        self.stock = stock if stock is not None else int(os.environ.get("REEL_STOCK", "2"))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def reels(self) -> list:
+        """Finished reels, oldest first."""
+        reels = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.cache_dir, name)
+            video_path = meta_path[:-len(".json")] + ".mp4"
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                size = os.path.getsize(video_path)
+            except (OSError, ValueError):
+                continue  # taken or evicted meanwhile
+            reels.append({**meta, "path": video_path, "meta_path": meta_path, "size": size})
+        return sorted(reels, key=lambda reel: reel["created"])
+
+    def find(self, min_duration: float):
+        """Metadata of the reel take() would pick, without taking it (render planning), or None."""
+        return next((reel for reel in sorted(self.reels(), key=lambda reel: reel["duration"])
+                     if reel["duration"] >= min_duration), None)
+
+    def take(self, min_duration: float, destination: str):
+        """
+        Moves the shortest reel of at least `min_duration` seconds to `destination`.
+        Returns its metadata, or None if no reel is long enough.
+        """
+        for reel in sorted(self.reels(), key=lambda reel: reel["duration"]):
+            if reel["duration"] < min_duration:
+                continue
+            claimed = f"{reel['path']}.{uuid.uuid4().hex[:8]}.claimed"
+            try:
+                os.rename(reel["path"], claimed)  # atomic: only one render gets it
+            except OSError:
+                continue
+            os.remove(reel["meta_path"])
+            shutil.move(claimed, destination)
+            return {**reel, "path": destination}
+        return None
+
+    def add(self, duration: float, render=render_reel, **render_options) -> dict:
+        """Renders a reel into the cache and publishes it. Returns its metadata."""
+        reel_id = f"reel_{int(duration)}s_{uuid.uuid4().hex[:8]}"
+        video_path = os.path.join(self.cache_dir, f"{reel_id}.mp4")
+        temp_path = os.path.join(self.cache_dir, f"{reel_id}.part.mp4")
+        try:
+            segments = render(duration, temp_path, **render_options)
+            os.replace(temp_path, video_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        meta = {
+            "duration": duration,
+            "created": time.time(),
+            "segments": [segment.to_dict() for segment in segments],
+        }
+        temp_meta_path = os.path.join(self.cache_dir, f"{reel_id}.json.tmp")
+        with open(temp_meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(temp_meta_path, os.path.join(self.cache_dir, f"{reel_id}.json"))
+        return {**meta, "path": video_path}
+
+    def missing(self, durations=REEL_DURATIONS) -> list:
+        """Reel lengths below their stock level, shortest (cheapest, most used) first."""
+        have = {}
+        for reel in self.reels():
+            have[reel["duration"]] = have.get(reel["duration"], 0) + 1
+        return [duration for duration in sorted(durations) for _ in range(self.stock - have.get(duration, 0))]
+
+    def evict(self):
+        """Deletes the oldest reels until the cache fits in max_bytes."""
+        reels = self.reels()
+        total = sum(reel["size"] for reel in reels)
+        for reel in reels:
+            if total <= self.max_bytes:
+                break
+            for path in (reel["meta_path"], reel["path"]):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= reel["size"]
+
+# -------------------------------
+# Idle-time filler
+# -------------------------------
+def host_is_idle(max_load: float = None, own_load: float = 0.0) -> bool:
+    """
+    True when the 1-minute load average per core, minus `own_load` (the filler's
+    own encoder threads while it renders), is below REEL_IDLE_LOAD. Always True
+    where the load average can't be read.
+    """
+    max_load = max_load if max_load is not None else float(os.environ.get("REEL_IDLE_LOAD", "0.5"))
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return True
+    return max(load - own_load, 0.0) / (os.cpu_count() or 1) < max_load
+
+def lower_priority():
+    """Renice this process (and the ffmpeg it starts) by REEL_NICE, where supported."""
+    try:
+        os.nice(int(os.environ.get("REEL_NICE", "10")))
+    except (AttributeError, OSError):
+        pass
+
+def _watch(cancel_event: threading.Event, done: threading.Event, only_when_idle: bool,
+           stop_event: threading.Event = None, interval: float = 5.0):
+    """Cancels the reel being rendered when the host gets busy or the filler is stopped."""
+    while not done.wait(interval):
+        if (stop_event and stop_event.is_set()) or (only_when_idle and not host_is_idle(own_load=REEL_THREADS)):
+            cancel_event.set()
+            return
+
+def fill(cache: ReelCache, durations=REEL_DURATIONS, only_when_idle: bool = True, stop_event: threading.Event = None,
+         check_interval: float = 5.0) -> int:
+    """
+    Renders missing reels, checking for idleness before each and every
+    `check_interval` seconds while one renders. Returns how many were added.
+    """
+    added = 0
+    for duration in cache.missing(durations):
+        if (stop_event and stop_event.is_set()) or (only_when_idle and not host_is_idle()):
+            break
+        print(f"Pre-rendering a {duration}s b-roll reel...")
+        cancel_event, done = threading.Event(), threading.Event()
+        threading.Thread(
+            target=_watch, args=(cancel_event, done, only_when_idle, stop_event, check_interval),
+            name="reel-idle-watch", daemon=True,
+        ).start()
+        try:
+            cache.add(duration, runner_options={"cancel_event": cancel_event})
+        except FFmpegCancelled:
+            print(f"Host is busy, cancelled the {duration}s reel")
+            break
+        finally:
+            done.set()
+        cache.evict()
+        added += 1
+    return added
+
+def run_filler(cache: ReelCache = None, interval: float = 60.0, stop_event: threading.Event = None):
+    """Tops the reel stock up whenever the host is idle, until `stop_event` is set."""
+    cache = cache or ReelCache()
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            fill(cache, stop_event=stop_event)
+        except Exception as e:
+            print(f"Error pre-rendering b-roll reels: {e}")
+        stop_event.wait(interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render b-roll reels from the stock library.")
+    parser.add_argument("--fill", action="store_true", help="Render every missing reel now, idle or not.")
+    parser.add_argument("--daemon", action="store_true", help="Keep the stock topped up while the host is idle.")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between idle checks in --daemon mode.")
+    args = parser.parse_args()
+
+    cache = ReelCache()
+    if args.daemon or args.fill:
+        lower_priority()
+    if args.daemon:
+        run_filler(cache, args.interval)
+    elif args.fill:
+        print(f"Added {fill(cache, only_when_idle=False)} reel(s) to {cache.cache_dir}")
+    for reel in cache.reels():
+        print(f"{os.path.basename(reel['path'])}: {reel['duration']}s, {reel['size'] / 1024 / 1024:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Dry-run planner for create_video: resolves the clip timeline, audio layout,
+captions, filtergraph and encoder settings without encoding anything, and
+estimates the encode time from encoder speed measured on this host. Given a
+cached b-roll reel (find_background_reel), it plans around the reel as
+create_video does with `reel_path`; the plan's "reel" then names it and no clip
+encodes are estimated.
+
+Encoder speed is calibrated once per (host, encoder, preset, frame size) by
+encoding a few seconds of testsrc2 to the null muxer; results are kept in
+data/encoder_speed.json. Delete that file after a hardware change.
+
+    plan = plan_video(story, intro_text, "voice.wav", "music.mp3", clips, "out.mp4")
+    print(json.dumps(plan, indent=2))
+"""
+import json
+import os
+import platform
+import threading
+import time
+import ffmpeg
+from artifacts import AudioArtifact
+from ffmpeg_runner import run_ffmpeg
+from story_text import is_metadata_line, clean_story_line
+from video_generator import (
+    RENDITIONS,
+    VOICE_SPEED_FACTOR,
+    INTRO_SILENCE_SECONDS,
+    build_audio_mix,
+    build_output_args,
+    build_rendition_outputs,
+    build_video_timeline,
+    caption_layout,
+    plan_background_segments,
+    probe_duration,
+    rendition_output_path,
+)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+SPEED_CACHE_PATH = os.path.join(project_root, "data", "encoder_speed.json")
+CALIBRATION_SECONDS = 3.0
+INTRO_WORDS_PER_SECOND = 2.5  # Kokoro at speed 1.0, used to estimate the (not yet voiced) intro
+INTRO_SAMPLE_RATE = 24000
+# Clips and the intro card are written with ffmpeg's defaults (libx264, medium preset)
+INTERMEDIATE_ARGS = {"c:v": "libx264", "preset": "medium"}
+
+_speed_lock = threading.Lock()
+
+# -------------------------------
+# Encoder speed
+# -------------------------------
+def _speed_key(output_args: dict, size: tuple) -> str:
+    return f"{platform.node()}|{output_args.get('c:v', 'libx264')}|{output_args.get('preset', 'medium')}|{size[0]}x{size[1]}"
+
+def _load_speeds(cache_path: str) -> dict:
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def measure_encoder_speed(output_args: dict, size: tuple, cache_path: str = SPEED_CACHE_PATH,
+                          seconds: float = CALIBRATION_SECONDS) -> float:
+    """
+    Returns the encoder's speed at `size` as a multiple of real time (2.0 = twice
+    as fast as playback), measuring it once and caching the result.
+    """
+    key = _speed_key(output_args, size)
+    with _speed_lock:
+        speeds = _load_speeds(cache_path)
+        if key in speeds:
+            return speeds[key]
+
+        encoder_args = {k: v for k, v in output_args.items() if k in ("c:v", "preset", "pix_fmt", "threads", "gpu")}
+        source = ffmpeg.input(f"testsrc2=s={size[0]}x{size[1]}:r=30:d={seconds}", f="lavfi")
+        started = time.monotonic()
+        run_ffmpeg(ffmpeg.output(source, "-", f="null", **encoder_args), stage="calibrate", expected_duration=seconds)
+        speed = seconds / max(time.monotonic() - started, 1e-3)
+
+        speeds[key] = round(speed, 3)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(speeds, f, indent=2, sort_keys=True)
+        return speeds[key]
+
+# -------------------------------
+# Planning
+# -------------------------------
+def count_caption_words(story_text: str) -> int:
+    """Captions are one event per spoken word; counts the narration's words."""
+    return sum(
+        len(clean_story_line(line).split())
+        for line in story_text.splitlines()
+        if line.strip() and not is_metadata_line(line)
+    )
+
+def plan_timeline(intro_duration: float, segments: list, reel: dict = None, clips_duration: float = None) -> list:
+    """Where each source lands in the final video: the intro card, then the reel or the clip segments."""
+    timeline = [{"source": "intro", "start": 0.0, "end": round(intro_duration, 3)}]
+    if reel:
+        return timeline + [{"source": reel["path"], "start": round(intro_duration, 3), "end": round(intro_duration + clips_duration, 3)}]
+    for segment in segments:
+        timeline.append({
+            "source": segment.source_path,
+            "start": round(intro_duration + segment.start, 3),
+            "end": round(intro_duration + segment.start + segment.duration, 3),
+        })
+    return timeline
+
+def plan_video(
+    story_text: str,
+    intro_text: str,
+    audio_path: str,
+    background_music_path: str,
+    background_video_paths: list,
+    output_video_path: str,
+    caption_fontsize: int = 64,
+    music_volume: float = 0.30,
+    fade_duration: float = 1.0,
+    use_gpu: bool = False,
+    gpu_device_id: int = 0,
+    renditions: list = None,
+    measure: bool = True,
+    reel: dict = None,
+) -> dict:
+    """
+    Returns the JSON-serialisable plan for the matching create_video call.
+    Only probes inputs (clips through the stock index); with measure=True a
+    missing encoder speed is calibrated (a few seconds of encoding, once per
+    host). The intro narration doesn't exist yet, so its duration is estimated
+    from the word count. `audio_path` may be an AudioArtifact, which skips the probe.
+    `reel` is the metadata of the cached reel the render will take, if any.
+    """
+    renditions = renditions or ["landscape"]
+    unknown_renditions = set(renditions) - set(RENDITIONS)
+    if unknown_renditions:
+        raise ValueError(f"Unknown renditions {sorted(unknown_renditions)}; choose from {list(RENDITIONS)}")
+
+    # Audio layout
+    intro_duration = max(fade_duration * 2, len(intro_text.split()) / INTRO_WORDS_PER_SECOND)
+    if isinstance(audio_path, AudioArtifact):
+        audio_path, voice_duration = audio_path.path, audio_path.duration
+    else:
+        voice_duration = probe_duration(audio_path)
+    voice_duration /= VOICE_SPEED_FACTOR
+    total_duration = intro_duration + INTRO_SILENCE_SECONDS + voice_duration
+
+    # A cached reel (see reel_cache) replaces the clip segments, as in create_video
+    clips_duration = total_duration - intro_duration
+    if reel:
+        segments = []
+        clip_paths = [os.path.abspath(output_video_path.replace(".mp4", "_reel.mp4")).replace('\\', '/')]
+    else:
+        segments = plan_background_segments(background_video_paths, clips_duration)
+        clip_paths = [
+            os.path.abspath(output_video_path.replace(".mp4", f"_looped_scaled_video_{i}.mp4")).replace('\\', '/')
+            for i in range(len(segments))
+        ]
+
+    # Final filtergraph, built against the working files create_video would write
+    rendition_paths = {name: rendition_output_path(output_video_path, name) for name in renditions}
+    caption_paths = {name: path.replace(".mp4", ".ass") for name, path in rendition_paths.items()}
+    mixed_audio = build_audio_mix(
+        audio_path, output_video_path.replace(".mp4", "_intro_audio.wav"), background_music_path,
+        voice_duration, intro_duration, INTRO_SAMPLE_RATE,
+        music_volume=music_volume, fade_duration=fade_duration,
+        speed_factor=VOICE_SPEED_FACTOR, silence_duration=INTRO_SILENCE_SECONDS, analyze_music=False,
+    )
+    video_stream = build_video_timeline(
+        output_video_path.replace(".mp4", "_intro_video.mp4"), clip_paths, total_duration, require_files=False,
+        clip_durations=[clips_duration] if reel else None, clips_graded=bool(reel), fade_duration=fade_duration,
+    )
+    output_args = build_output_args(use_gpu, gpu_device_id)
+    final_output = build_rendition_outputs(video_stream, mixed_audio, rendition_paths, output_args, caption_paths)
+
+    plan = {
+        "outputs": rendition_paths,
+        "audio": {
+            "intro_seconds": round(intro_duration, 3),
+            "intro_estimated": True,
+            "silence_seconds": INTRO_SILENCE_SECONDS,
+            "voice_seconds": round(voice_duration, 3),
+            "voice_speed_factor": VOICE_SPEED_FACTOR,
+            "total_seconds": round(total_duration, 3),
+            "music": background_music_path,
+        },
+        "reel": {"path": reel["path"], "duration": reel["duration"]} if reel else None,
+        "clips": [segment.to_dict() for segment in segments],
+        "timeline": plan_timeline(intro_duration, segments, reel, clips_duration),
+        "captions": {
+            "count": count_caption_words(story_text),
+            "layouts": {name: caption_layout(name, caption_fontsize) for name in renditions},
+        },
+        "encoder": {
+            "output_args": output_args,
+            "renditions": {name: RENDITIONS[name] for name in renditions},
+        },
+        "ffmpeg": {"final": ffmpeg.compile(final_output)},
+    }
+    plan["estimate"] = estimate_encode_time(plan, output_args) if measure else None
+    return plan
+
+def estimate_encode_time(plan: dict, output_args: dict, cache_path: str = SPEED_CACHE_PATH) -> dict:
+    """Seconds each encoding stage should take at the measured encoder speeds."""
+    intermediate_speed = measure_encoder_speed(INTERMEDIATE_ARGS, (1920, 1080), cache_path)
+    final_speeds = {
+        name: measure_encoder_speed(output_args, spec["size"], cache_path)
+        for name, spec in plan["encoder"]["renditions"].items()
+    }
+    total_duration = plan["audio"]["total_seconds"]
+    stages = {"intro": plan["audio"]["intro_seconds"] / intermediate_speed}
+    if not plan.get("reel"):
+        # A cached reel is already encoded; only the clip segments cost an encode
+        stages["clips"] = sum(clip["duration"] for clip in plan["clips"]) / intermediate_speed
+    # Renditions share one process and the same cores, so their encode times add up
+    stages["final"] = sum(total_duration / speed for speed in final_speeds.values())
+    return {
+        "speeds": {"intermediate": intermediate_speed, **final_speeds},
+        "stages": {stage: round(seconds, 1) for stage, seconds in stages.items()},
+        "total_seconds": round(sum(stages.values()), 1),
+    }
@@ -0,0 +1,113 @@
+import os
+import random
+import ffmpeg
+import soundfile as sf
+from ffmpeg_runner import run_ffmpeg
+from captions import write_ass_captions
+
+# -------------------------------
+# ffmpeg renderer for gen_short.py
+# -------------------------------
+# Each image becomes a Ken Burns segment (zoompan/crop expressions evaluated
+# inside ffmpeg), the segments are concatenated, the spoken words are burned
+# in from an ASS track, and everything goes through one encode.
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+SHORT_SIZE = (1920, 1080)
+SHORT_FPS = 24
+ZOOM_AMOUNT = 0.1   # zoom_in goes from 100% to 110% over the segment
+PAN_PIXELS = 100    # pan_left/pan_right travel across the segment
+ANIMATIONS = ("zoom_in", "pan_left", "pan_right")
+FONTS_DIR = os.path.join(project_root, "assets", "fonts")
+
+def _cover(stream, width: int, height: int):
+    """Scales an image to fill width x height and crops the overflow, like CSS background-size: cover."""
+    return (
+        stream
+        .filter('scale', w=width, h=height, force_original_aspect_ratio='increase')
+        .filter('crop', w=width, h=height)
+    )
+
+def ken_burns_segment(image_path: str, duration: float, animation: str, size: tuple = SHORT_SIZE, fps: int = SHORT_FPS):
+    """
+    Returns a video stream of `duration` seconds animating one still image.
+    zoom_in zooms towards the center; pan_left/pan_right slide a window across
+    an image scaled PAN_PIXELS wider than the frame.
+    """
+    width, height = size
+    frames = max(1, round(duration * fps))
+    image = ffmpeg.input(image_path, loop=1, framerate=fps, t=frames / fps).video
+
+    if animation == "zoom_in":
+        stream = _cover(image, width, height).filter(
+            'zoompan',
+            z=f'1+{ZOOM_AMOUNT}*on/{frames}',
+            x='iw/2-(iw/zoom/2)',
+            y='ih/2-(ih/zoom/2)',
+            d=1,
+            s=f'{width}x{height}',
+            fps=fps,
+        )
+    elif animation in ("pan_left", "pan_right"):
+        progress = f'(t/{frames / fps})'
+        x = f'{PAN_PIXELS}*{progress}' if animation == "pan_left" else f'{PAN_PIXELS}*(1-{progress})'
+        stream = _cover(image, width + PAN_PIXELS, height).filter('crop', w=width, h=height, x=x, y=0)
+    else:
+        stream = _cover(image, width, height)
+    return stream.filter('setsar', 1)
+
+def build_short_timeline(image_paths: list, audio_duration: float, animations: list = None, rng=random):
+    """
+    Splits the narration evenly across the images and concatenates their segments.
+    `animations` picks one per image; by default each is chosen at random.
+    """
+    duration_per_image = audio_duration / len(image_paths)
+    animations = animations or [rng.choice(ANIMATIONS) for _ in image_paths]
+    segments = [
+        ken_burns_segment(image_path, duration_per_image, animation)
+        for image_path, animation in zip(image_paths, animations)
+    ]
+    if len(segments) == 1:
+        return segments[0]
+    return ffmpeg.concat(*segments, v=1, a=0)
+
+def render_short(
+    image_paths: list,
+    audio_path: str,
+    word_timestamps: list,
+    output_path: str,
+    font: str = "Fredoka One",
+    fontsize: int = 50,
+    stroke_width: int = 3,
+    animations: list = None,
+    runner_options: dict = None,
+) -> str:
+    """
+    Renders the short in a single ffmpeg run: Ken Burns image segments,
+    word-by-word ASS captions (skipped if there are no timestamps) and the narration.
+    """
+    audio_duration = sf.info(audio_path).duration
+    video_stream = build_short_timeline(image_paths, audio_duration, animations)
+
+    ass_path = os.path.splitext(output_path)[0] + ".ass"
+    if word_timestamps:
+        write_ass_captions(word_timestamps, ass_path, font, fontsize, stroke_width, play_res=SHORT_SIZE)
+        video_stream = video_stream.filter('subtitles', filename=ass_path, fontsdir=FONTS_DIR)
+    else:
+        print("No word timestamps found for captions.")
+
+    audio = ffmpeg.input(audio_path).audio
+    output = ffmpeg.output(
+        video_stream, audio, output_path,
+        r=SHORT_FPS, t=audio_duration,
+        **{'c:v': 'libx264', 'preset': 'fast', 'pix_fmt': 'yuv420p', 'c:a': 'aac', 'b:a': '192k'}
+    )
+    try:
+        run_ffmpeg(output, stage="short", expected_duration=audio_duration, **(runner_options or {}))
+    finally:
+        if os.path.exists(ass_path):
+            os.remove(ass_path)
+    print(f"Short rendered to {output_path}")
+    return output_path
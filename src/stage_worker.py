@@ -0,0 +1,228 @@
+"""
+Long-lived stage workers for the SQLite job queue (see job_queue.py).
+
+Each worker process serves one stage, keeps that stage's models warm between
+jobs and claims tasks with a lease that it renews while working. Run as many
+workers per stage as there are cores/GPUs for it. Render workers on other
+machines need the same JOBS_DIR and JOB_DB_PATH storage, and JOB_DB_JOURNAL=delete
+on every worker when the database is shared over NFS (see job_queue.py).
+
+Usage (from the project root):
+    python src/stage_worker.py submit                      # queue a video from config/prompt.txt
+    python src/stage_worker.py work --stage story
+    python src/stage_worker.py work --stage tts
+    python src/stage_worker.py work --stage transcribe
+    python src/stage_worker.py work --stage thumbnail
+    python src/stage_worker.py work --stage render         # start one per render slot
+    python src/stage_worker.py status [JOB_ID]
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import sys
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+project_root = os.path.dirname(current_dir)
+
+from job_queue import STAGES, JobQueue, LeaseLost, worker_id
+from utils.logger_config import logger, log_stage
+from utils.telegram_notifier import notify
+
+JOBS_DIR = os.environ.get("JOBS_DIR", os.path.join(project_root, "data", "jobs"))
+
+# -------------------------------
+# Stage handlers
+# -------------------------------
+# Each handler gets the job state and the job's directory and returns the keys
+# it adds to the state. Raising marks the attempt as failed (it is retried).
+def run_story(state: dict, job_dir: str, cancel_event: threading.Event) -> dict:
+    from story_generator import generate_story_package
+    story_package = generate_story_package(state["prompt"])
+    with open(os.path.join(job_dir, "story.txt"), "w", encoding="utf-8") as f:
+        f.write(story_package["story"])
+    return {"story": story_package["story"], "intro": story_package["intro"], "thumbnail_text": story_package["thumbnail_text"]}
+
+# Audio is passed on as AudioArtifact dicts, so later stages never probe it.
+def run_tts(state: dict, job_dir: str, cancel_event: threading.Event) -> dict:
+    from artifacts import write_audio
+    from voice_generator import generate_voice, generate_and_measure_audio, available_voices
+    audio = generate_voice(state["story"], os.path.join(job_dir, "story.wav"), output_text_path=os.path.join(job_dir, "story_voiced.txt"))
+    intro_voice = random.choice(available_voices)
+    intro_samples, intro_sample_rate, _ = generate_and_measure_audio(state["intro"], intro_voice)
+    intro_audio = write_audio(os.path.join(job_dir, "intro.wav"), intro_samples, intro_sample_rate, voice=intro_voice, speed=1.0)
+    return {"audio": audio.to_dict(), "intro_audio": intro_audio.to_dict()}
+
+def run_transcribe(state: dict, job_dir: str, cancel_event: threading.Event) -> dict:
+    from transcriber import get_word_timestamps
+    word_timestamps = get_word_timestamps(state["audio"]["path"])
+    if word_timestamps is None:
+        raise RuntimeError(f"Could not transcribe {state['audio']['path']}")
+    words_path = os.path.join(job_dir, "words.json")
+    with open(words_path, "w", encoding="utf-8") as f:
+        json.dump(word_timestamps, f)
+    return {"words_path": words_path}
+
+def run_thumbnail(state: dict, job_dir: str, cancel_event: threading.Event) -> dict:
+    from thumbnail_generator import generate_image_from_text_sync
+    thumbnail_path = os.path.join(job_dir, "thumbnail.png")
+    generate_image_from_text_sync(state["thumbnail_text"], thumbnail_path)
+    return {"thumbnail_path": thumbnail_path}
+
+def run_render(state: dict, job_dir: str, cancel_event: threading.Event) -> dict:
+    from artifacts import AudioArtifact
+    from main import select_background_music, select_background_videos
+    from video_generator import create_video, detect_gpu_support, take_background_reel, VOICE_SPEED_FACTOR, INTRO_SILENCE_SECONDS
+
+    audio = AudioArtifact.from_dict(state["audio"])
+    background_music_path = select_background_music(project_root)
+    clips_duration = audio.duration / VOICE_SPEED_FACTOR + INTRO_SILENCE_SECONDS
+    output_video_path = os.path.join(job_dir, "final_story_video.mp4")
+    # REEL_CACHE=1: a pre-rendered b-roll reel replaces the stock clips
+    reel_path = take_background_reel(clips_duration, output_video_path)
+    background_video_paths = [] if reel_path else select_background_videos(project_root, clips_duration)
+    if not background_music_path or not (reel_path or background_video_paths):
+        raise RuntimeError("No stock music or videos to render with")
+    with open(state["words_path"], "r", encoding="utf-8") as f:
+        word_timestamps = json.load(f)
+
+    gpu_available, _, encoder_available = detect_gpu_support()
+    outputs = create_video(
+        story_text=state["story"],
+        intro_text=state["intro"],
+        audio_path=audio,
+        background_music_path=background_music_path,
+        background_video_paths=background_video_paths,
+        output_video_path=output_video_path,
+        use_gpu=gpu_available and encoder_available,
+        cancel_event=cancel_event,
+        renditions=[name.strip() for name in os.environ.get("VIDEO_RENDITIONS", "landscape").split(",") if name.strip()],
+        intro_audio_path=AudioArtifact.from_dict(state["intro_audio"]),
+        intro_image_path=state["thumbnail_path"],
+        word_timestamps=word_timestamps,
+        reel_path=reel_path,
+    )
+    return {"outputs": outputs}
+
+HANDLERS = {
+    "story": run_story,
+    "tts": run_tts,
+    "transcribe": run_transcribe,
+    "thumbnail": run_thumbnail,
+    "render": run_render,
+}
+
+# Models each stage loads once per worker process, before its first task
+WARM_MODELS = {
+    "tts": ["kokoro", "kokoro_voices"],
+    "transcribe": ["vosk"],
+}
+
+def next_stage(stage: str) -> str:
+    index = STAGES.index(stage)
+    return STAGES[index + 1] if index + 1 < len(STAGES) else None
+
+# -------------------------------
+# Worker loop
+# -------------------------------
+def _keep_lease(queue: JobQueue, task, owner: str, lease_seconds: float, done: threading.Event, lost: threading.Event):
+    """Renews the lease every third of its length; sets `lost` if another worker took the task."""
+    while not done.wait(lease_seconds / 3):
+        try:
+            queue.heartbeat(task, owner, lease_seconds)
+        except LeaseLost:
+            lost.set()
+            return
+        except Exception as e:
+            logger.warning(f"Lease renewal for task {task.id} failed: {e}")
+
+def process_task(queue: JobQueue, task, owner: str, lease_seconds: float):
+    job_dir = os.path.join(JOBS_DIR, task.job_id)
+    os.makedirs(job_dir, exist_ok=True)
+    done, lost = threading.Event(), threading.Event()
+    threading.Thread(
+        target=_keep_lease, args=(queue, task, owner, lease_seconds, done, lost), name="job-lease", daemon=True
+    ).start()
+
+    with log_stage(task.stage):
+        logger.info(f"Job {task.job_id}: {task.stage} started (attempt {task.attempts}/{task.max_attempts})")
+        try:
+            result = HANDLERS[task.stage](task.state, job_dir, lost)
+            done.set()
+            following = next_stage(task.stage)
+            queue.complete(task, owner, result, following)
+            logger.info(f"Job {task.job_id}: {task.stage} completed")
+            if following is None:
+                notify("Video Generation", "Completed", f"Job {task.job_id}: {', '.join(result.get('outputs', {}).values())}")
+        except LeaseLost:
+            logger.warning(f"Job {task.job_id}: lost the {task.stage} lease to another worker, dropping the result")
+        except Exception as e:
+            done.set()
+            logger.error(f"Job {task.job_id}: {task.stage} failed: {e}")
+            try:
+                queue.fail(task, owner, f"{type(e).__name__}: {e}")
+            except LeaseLost:
+                return
+            if task.attempts >= task.max_attempts:
+                notify("Video Generation", "Failed", f"Job {task.job_id} failed at {task.stage}: {e}")
+        finally:
+            done.set()
+
+def run_worker(stage: str, queue: JobQueue = None, poll_interval: float = 2.0, lease_seconds: float = None,
+               stop_event: threading.Event = None, max_tasks: int = None) -> int:
+    """
+    Claims and runs `stage` tasks until `stop_event` is set (or `max_tasks`
+    have run). Returns the number of tasks processed.
+    """
+    queue = queue or JobQueue()
+    lease_seconds = lease_seconds or float(os.environ.get("JOB_LEASE_SECONDS", "300"))
+    stop_event = stop_event or threading.Event()
+    owner = worker_id()
+
+    if stage in WARM_MODELS and os.environ.get("MODEL_PREFETCH", "1") != "0":
+        from model_registry import prefetch, wait_for
+        wait_for(prefetch(WARM_MODELS[stage]))
+    print(f"Worker {owner} serving stage '{stage}' from {queue.db_path}")
+
+    processed = 0
+    while not stop_event.is_set() and (max_tasks is None or processed < max_tasks):
+        task = queue.claim(stage, owner, lease_seconds)
+        if task is None:
+            stop_event.wait(poll_interval)
+            continue
+        process_task(queue, task, owner, lease_seconds)
+        processed += 1
+    return processed
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite-backed video job queue and stage workers.")
+    parser.add_argument("--db", default=None, help="Queue database (JOB_DB_PATH).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    work = commands.add_parser("work", help="Run a worker for one stage.")
+    work.add_argument("--stage", required=True, choices=STAGES)
+    work.add_argument("--poll-interval", type=float, default=2.0)
+    submit = commands.add_parser("submit", help="Queue a new video.")
+    submit.add_argument("--prompt-file", default=os.path.join(project_root, "config", "prompt.txt"))
+    status = commands.add_parser("status", help="Show a job, or task counts per stage.")
+    status.add_argument("job_id", nargs="?")
+    args = parser.parse_args()
+
+    queue = JobQueue(args.db)
+    if args.command == "submit":
+        with open(args.prompt_file, "r", encoding="utf-8") as f:
+            prompt = f.read().strip()
+        print(queue.submit({"prompt": prompt}))
+    elif args.command == "status":
+        print(json.dumps(queue.job(args.job_id) if args.job_id else queue.counts(), indent=2))
+    else:
+        stop_event = threading.Event()
+        # Finish the current task, then exit (docker stop / Ctrl+C)
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+        signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+        run_worker(args.stage, queue, args.poll_interval, stop_event=stop_event)
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,70 @@
-import google.generativeai as genai
+import json
 import os
+import random
 from utils.logger_config import logger
+from llm_client import get_client, LLMQuotaError
  
-# Ensure the output directory exists
 OUTPUT_DIR = "output/generatedStory"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
- 
-# Configure the Gemini API key
-# It's recommended to set this as an environment variable
-# For example: os.environ["GEMINI_API_KEY"] = "YOUR_API_KEY"
-genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
  
 def save_story_to_file(story_content: str, filename: str = "generated_story.txt"):
     """
    
     """
+    # Ensure the output directory exists
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
     filepath = os.path.join(OUTPUT_DIR, filename)
     with open(filepath, "w", encoding="utf-8") as f:
         f.write(story_content)
     logger.info(f"Story saved to {filepath}")
  
+def _require_api_key():
+    if not os.environ.get("GEMINI_API_KEY"):
+        logger.error("GEMINI_API_KEY environment variable not set.")
+        raise ValueError("GEMINI_API_KEY environment variable not set.")
+
+def _intro_prompt(story_content: str) -> str:
+    return f"Summarize the following content into a maximum of 20 words for an intro: {story_content}"
+
+def _limit_intro(intro_text: str) -> str:
+    # Ensure the intro text is indeed limited to 20 words
+    words = intro_text.split()
+    if len(words) > 20:
+        intro_text = " ".join(words[:20]) + "..."
+    return intro_text
+
+def _fallback_intro(story_content: str, error: Exception) -> str:
+    logger.warning(f"API quota exceeded for intro text. Using fallback method. ({error})")
+    # Fallback: Use first 20 words of the story as intro
+    intro_text = _limit_intro(story_content)
+    logger.info(f"Using fallback intro text: {intro_text}")
+    return intro_text
+
 def generate_intro_text(story_content: str) -> str:
     """
     Generate intro text for the story content.
-    Falls back to simple truncation if API is unavailable.
+    Falls back to simple truncation if the API quota is exhausted.
     """
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        logger.error("GEMINI_API_KEY environment variable not set.")
-        raise ValueError("GEMINI_API_KEY environment variable not set.")
-    
-    genai.configure(api_key=api_key)
-    
+    _require_api_key()
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = f"Summarize the following content into a maximum of 20 words for an intro: {story_content}"
-        response = model.generate_content(prompt)
-        intro_text = response.text
-        # Ensure the intro text is indeed limited to 20 words
-        words = intro_text.split()
-        if len(words) > 20:
-            intro_text = " ".join(words[:20]) + "..."
-        return intro_text
+        return _limit_intro(get_client().generate_sync(_intro_prompt(story_content)))
+    except LLMQuotaError as e:
+        return _fallback_intro(story_content, e)
     except Exception as e:
         logger.error(f"Error generating intro text with Gemini API: {e}")
-        
-        # Check if it's a quota error
-        if "429" in str(e) or "quota" in str(e).lower():
-            logger.warning("API quota exceeded for intro text. Using fallback method.")
-            # Fallback: Use first 20 words of the story as intro
-            words = story_content.split()
-            if len(words) <= 20:
-                intro_text = story_content
-            else:
-                intro_text = " ".join(words[:20]) + "..."
-            logger.info(f"Using fallback intro text: {intro_text}")
-            return intro_text
-        else:
-            # For other errors, still raise the exception
-            raise RuntimeError(f"Error generating intro text with Gemini API: {e}")
+        raise RuntimeError(f"Error generating intro text with Gemini API: {e}")
+
+async def generate_intro_text_async(story_content: str) -> str:
+    """
+    Async variant of generate_intro_text for callers already running an event loop.
+    """
+    _require_api_key()
+    try:
+        return _limit_intro(await get_client().generate(_intro_prompt(story_content)))
+    except LLMQuotaError as e:
+        return _fallback_intro(story_content, e)
+    except Exception as e:
+        logger.error(f"Error generating intro text with Gemini API: {e}")
+        raise RuntimeError(f"Error generating intro text with Gemini API: {e}")
  
 def get_fallback_stories():
     """
@@ -72,10 +78,17 @@ def get_fallback_stories():
         "The GPS kept redirecting me to an empty field despite multiple route requests. When I finally arrived, there was a 'For Sale' sign with my phone number. I had never seen this place before.",
     ]
 
+def _fallback_story(error: Exception) -> str:
+    logger.warning(f"API quota exceeded. Using fallback story. ({error})")
+    content = random.choice(get_fallback_stories())
+    logger.info(f"Using fallback story: {content[:50]}...")
+    save_story_to_file(content, "fallback_story.txt")
+    return content
+
 def generate_story(prompt: str) -> str:
     """
     Generates a content using the Gemini API based on the provided prompt.
-    Falls back to pre-written stories if API is unavailable.
+    Falls back to pre-written stories if the API quota is exhausted.
  
     Args:
         prompt (str): The prompt to guide the content generation.
@@ -83,34 +96,115 @@ def generate_story(prompt: str) -> str:
     Returns:
         str: The generated content.
     """
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        logger.error("GEMINI_API_KEY environment variable not set.")
-        raise ValueError("GEMINI_API_KEY environment variable not set.")
-    
-    genai.configure(api_key=api_key)
-    
+    _require_api_key()
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
-        content = response.text
-        save_story_to_file(content) # Save the story
-        return content
+        content = get_client().generate_sync(prompt)
+    except LLMQuotaError as e:
+        return _fallback_story(e)
     except Exception as e:
         logger.error(f"Error generating story with Gemini API: {e}")
-        
-        # Check if it's a quota error
-        if "429" in str(e) or "quota" in str(e).lower():
-            logger.warning("API quota exceeded. Using fallback story.")
-            import random
-            fallback_stories = get_fallback_stories()
-            content = random.choice(fallback_stories)
-            logger.info(f"Using fallback story: {content[:50]}...")
-            save_story_to_file(content, "fallback_story.txt")
-            return content
-        else:
-            # For other errors, still raise the exception
-            raise RuntimeError(f"Error generating story with Gemini API: {e}")
+        raise RuntimeError(f"Error generating story with Gemini API: {e}")
+    save_story_to_file(content) # Save the story
+    return content
+
+def stream_story(prompt: str):
+    """
+    Yields the story text chunk by chunk as Gemini streams it, then saves the full story.
+    Falls back to a pre-written story (yielded whole) if the quota is exhausted
+    before anything was streamed.
+    """
+    _require_api_key()
+    parts = []
+    try:
+        for chunk in get_client().stream_sync(prompt):
+            parts.append(chunk)
+            yield chunk
+    except LLMQuotaError as e:
+        if parts:
+            raise RuntimeError(f"Story stream interrupted by quota exhaustion: {e}")
+        yield _fallback_story(e)
+        return
+    except Exception as e:
+        logger.error(f"Error streaming story with Gemini API: {e}")
+        raise RuntimeError(f"Error streaming story with Gemini API: {e}")
+    save_story_to_file("".join(parts)) # Save the story
+
+# Structured mode: story, intro and thumbnail text from a single request
+STORY_PACKAGE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "story": {"type": "STRING"},
+        "intro": {"type": "STRING"},
+        "thumbnail_text": {"type": "STRING"},
+    },
+    "required": ["story", "intro", "thumbnail_text"],
+}
+STORY_PACKAGE_CONFIG = {"response_mime_type": "application/json", "response_schema": STORY_PACKAGE_SCHEMA}
+
+def _story_package_prompt(prompt: str) -> str:
+    return (
+        f"{prompt}\n\n"
+        "Return a JSON object with these fields:\n"
+        '- "story": the full story narration only, without the intro line, titles or labels\n'
+        '- "intro": a hook for the start of the video that summarises the story in at most 20 words\n'
+        '- "thumbnail_text": the text of the social media post shown on the thumbnail'
+    )
+
+def parse_story_package(response_text: str) -> dict:
+    """
+    Validates the structured response. Raises ValueError if it isn't usable.
+    """
+    package = json.loads(response_text)
+    if not isinstance(package, dict):
+        raise ValueError("Structured response is not a JSON object.")
+    story = str(package.get("story") or "").strip()
+    intro = str(package.get("intro") or "").strip()
+    if not story or not intro:
+        raise ValueError("Structured response is missing the story or intro.")
+    intro = _limit_intro(intro)
+    thumbnail_text = str(package.get("thumbnail_text") or "").strip() or intro
+    return {"story": story, "intro": intro, "thumbnail_text": thumbnail_text}
+
+def generate_story_package(prompt: str) -> dict:
+    """
+    Generates the story body, intro line and thumbnail text with one Gemini request.
+    Returns {"story", "intro", "thumbnail_text"}. Falls back to a pre-written story
+    if the quota is exhausted, and to a separate intro request if the JSON is unusable.
+    """
+    _require_api_key()
+    try:
+        response_text = get_client().generate_sync(_story_package_prompt(prompt), generation_config=STORY_PACKAGE_CONFIG)
+    except LLMQuotaError as e:
+        story = _fallback_story(e)
+        intro = _limit_intro(story)
+        return {"story": story, "intro": intro, "thumbnail_text": intro}
+    except Exception as e:
+        logger.error(f"Error generating story package with Gemini API: {e}")
+        raise RuntimeError(f"Error generating story package with Gemini API: {e}")
+
+    try:
+        package = parse_story_package(response_text)
+    except ValueError as e:
+        logger.warning(f"Structured story response unusable ({e}). Treating it as plain story text.")
+        intro = generate_intro_text(response_text)
+        package = {"story": response_text, "intro": intro, "thumbnail_text": intro}
+    save_story_to_file(package["story"]) # Save the story
+    return package
+
+async def generate_story_async(prompt: str) -> str:
+    """
+    Async variant of generate_story for callers already running an event loop.
+    """
+    _require_api_key()
+    try:
+        content = await get_client().generate(prompt)
+    except LLMQuotaError as e:
+        return _fallback_story(e)
+    except Exception as e:
+        logger.error(f"Error generating story with Gemini API: {e}")
+        raise RuntimeError(f"Error generating story with Gemini API: {e}")
+    save_story_to_file(content) # Save the story
+    return content
  
  
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+import re
+import pysbd
+
+# -------------------------
+# Story text cleaning
+# -------------------------
+# Lines like "Image: ...", "Text: ...", "**Title**", "# Heading" or "[NARRATOR]: ..."
+# are metadata; re.match anchors every alternative at the start of the line.
+METADATA_LINE_PATTERN = re.compile(r"^Image:|^Text:|\*\*.*?\*\*|^#+\s.*|\[.*?\]:")
+BRACKETED_PATTERN = re.compile(r"\[.*?\]")
+EMOJI_PATTERN = re.compile(r"[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF]")
+SENTENCE_END_PATTERN = re.compile(r"[.!?…][\"'”’)]*\s")
+
+def is_metadata_line(line: str) -> bool:
+    return bool(METADATA_LINE_PATTERN.match(line))
+
+def clean_story_line(line: str) -> str:
+    """
+    Removes bracketed sounds and emojis from a narration line,
+    e.g. "[sound of rain] It started..." -> "It started...".
+    """
+    clean_line = BRACKETED_PATTERN.sub("", line)
+    clean_line = EMOJI_PATTERN.sub("", clean_line)
+    return clean_line.strip()
+
+def _line_kind(partial_line: str):
+    """
+    Classifies the start of a line that is still streaming in:
+    "metadata", "narration", or None if more text is needed to decide.
+    """
+    if is_metadata_line(partial_line):
+        return "metadata"
+    # Prefixes that could still turn into one of the metadata patterns
+    if partial_line.startswith("**") or "**".startswith(partial_line):
+        return None
+    if partial_line.startswith("#") and not partial_line.lstrip("#"):
+        return None
+    if partial_line.startswith("[") and (("]" not in partial_line) or partial_line.endswith("]")):
+        return None  # "[NARRATOR" / "[NARRATOR]" may still be followed by ":"
+    if any(marker.startswith(partial_line) for marker in ("Image:", "Text:")):
+        return None
+    return "narration"
+
+class IncrementalSentenceSplitter:
+    """
+    Turns streamed story text into clean narration sentences as soon as they
+    are complete. Applies the same metadata/cleaning rules as extract_story_text,
+    and runs pysbd over the buffered narration, holding back the last segment
+    until more text (or the end of the stream) shows it is finished.
+    """
+    def __init__(self, language: str = "en"):
+        self.segmenter = pysbd.Segmenter(language=language, clean=False)
+        self.pending_line = ""
+        self.line_kind = None  # kind of the line currently streaming in
+        self.narration = ""
+
+    def _append_narration(self, text: str):
+        clean_text = clean_story_line(text)
+        if clean_text:
+            self.narration = f"{self.narration} {clean_text}" if self.narration else clean_text
+
+    def _finish_line(self, line: str):
+        kind = self.line_kind or ("metadata" if is_metadata_line(line) else "narration")
+        if line.strip() and kind == "narration":
+            self._append_narration(line)
+        self.line_kind = None
+
+    def _pop_sentences(self, final: bool) -> list:
+        if not self.narration:
+            return []
+        segments = [s.strip() for s in self.segmenter.segment(self.narration) if s.strip()]
+        if final:
+            self.narration = ""
+            return segments
+        complete, self.narration = segments[:-1], segments[-1] if segments else ""
+        return complete
+
+    def feed(self, chunk: str) -> list:
+        """Adds streamed text and returns the sentences it completed."""
+        self.pending_line += chunk
+        while "\n" in self.pending_line:
+            line, self.pending_line = self.pending_line.split("\n", 1)
+            self._finish_line(line)
+
+        # Release finished sentences from a long narration line before its newline arrives
+        if self.line_kind is None and self.pending_line.strip():
+            self.line_kind = _line_kind(self.pending_line)
+        if self.line_kind == "narration" and "[" not in self.pending_line.rsplit("]", 1)[-1]:
+            ends = list(SENTENCE_END_PATTERN.finditer(self.pending_line))
+            if ends:
+                cut = ends[-1].end()
+                self._append_narration(self.pending_line[:cut])
+                self.pending_line = self.pending_line[cut:]
+        return self._pop_sentences(final=False)
+
+    def flush(self) -> list:
+        """Ends the stream and returns every remaining sentence."""
+        if self.pending_line:
+            self._finish_line(self.pending_line)
+            self.pending_line = ""
+        return self._pop_sentences(final=True)
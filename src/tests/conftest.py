@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The pipeline modules import each other by bare name (e.g. `from utils.logger_config import logger`),
+# so make both the project root and src/ importable for the tests.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.dirname(current_dir)
+project_root = os.path.dirname(src_dir)
+for path in (project_root, src_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
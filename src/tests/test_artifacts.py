@@ -0,0 +1,36 @@
+import json
+import numpy as np
+import pytest
+import clip_planner
+import render_planner
+from artifacts import AudioArtifact, as_audio, load_audio, write_audio
+
+def test_written_audio_carries_its_metadata(tmp_path):
+    path = str(tmp_path / "voice.wav")
+    audio = write_audio(path, np.zeros(48000, dtype=np.float32), 24000, voice="af_heart")
+    assert (audio.duration, audio.sample_rate, audio.channels) == (2.0, 24000, 1)
+    # Loading the same file gives the same handle, minus the producer params
+    loaded = load_audio(path)
+    assert (loaded.duration, loaded.sample_rate, loaded.channels, loaded.content_hash) == (
+        audio.duration, audio.sample_rate, audio.channels, audio.content_hash
+    )
+    assert as_audio(audio) is audio and as_audio(path) == loaded
+
+def test_cache_key_covers_content_and_params(tmp_path):
+    path = str(tmp_path / "voice.wav")
+    audio = write_audio(path, np.zeros((2400, 2), dtype=np.float32), 24000, voice="af_heart", speed=1.0)
+    assert audio.channels == 2
+    assert audio.cache_key == AudioArtifact.from_dict(json.loads(json.dumps(audio.to_dict()))).cache_key
+    assert audio.cache_key != AudioArtifact(**{**audio.to_dict(), "params": {"voice": "am_adam", "speed": 1.0}}).cache_key
+
+def test_planner_uses_the_artifact_duration(tmp_path, monkeypatch):
+    def no_probe(path, codec_type="audio"):
+        raise AssertionError("the voice artifact should not be probed")
+
+    monkeypatch.setattr(render_planner, "probe_duration", no_probe)
+    monkeypatch.setattr(clip_planner, "get_clip", lambda path, index_path=None: {"source_path": path, "duration": 200.0})
+    audio = AudioArtifact("voice.wav", 90.0, 24000, 1, "0" * 64)
+    plan = render_planner.plan_video(
+        "One two three.", "a short intro", audio, "music.mp3", ["a.mp4"], str(tmp_path / "final.mp4"), measure=False,
+    )
+    assert plan["audio"]["voice_seconds"] == pytest.approx(100.0)
@@ -0,0 +1,53 @@
+import importlib.util
+import os
+import numpy as np
+import pytest
+import voice_generator
+
+# Loaded by path: src/benchmarks is a script directory, not a package
+_spec = importlib.util.spec_from_file_location(
+    "bench_tts", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "bench_tts.py")
+)
+bench_tts = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench_tts)
+
+def test_sentences_follow_their_length_distribution():
+    sentences = bench_tts.build_sentences("short", 20, seed=1)
+    assert sentences == bench_tts.build_sentences("short", 20, seed=1)
+    low, high = bench_tts.SENTENCE_DISTRIBUTIONS["short"]
+    assert all(low <= len(sentence.split()) <= high and sentence.endswith(".") for sentence in sentences)
+
+def test_stream_chunks_rebuild_the_text():
+    text = " ".join(bench_tts.build_sentences("mixed", 10))
+    chunks = bench_tts.stream_chunks(text, words_per_chunk=5)
+    assert "".join(chunks) == text
+    assert all(len(chunk.split()) <= 5 for chunk in chunks)
+
+def test_case_result_schema():
+    case = {"voice": "am_adam", "provider": "CPUExecutionProvider", "threads": 2, "distribution": "short",
+            "mode": "generate", "sentences": 10, "seed": 0}
+    result = bench_tts.case_result(case, 1.23456, 4.0, 8.0, 10, 0.5, 512.34)
+    assert result == {**case, "model_load_seconds": 1.2346, "synthesis_seconds": 4.0, "audio_seconds": 8.0,
+                      "real_time_factor": 0.5, "sentences_per_second": 2.5, "first_audio_latency_seconds": 0.5,
+                      "peak_rss_mb": 512.3}
+    assert bench_tts.case_result(case, 1.0, 0.0, 0.0, 0, None, 1.0)["real_time_factor"] is None
+    report = bench_tts.build_report([result], {"kokoro": "k.onnx", "voices": "v.bin"})
+    assert set(report) == {"generated_at", "host", "model", "results"} and report["results"] == [result]
+
+class FakeKokoro:
+    voices = {"am_adam": None}
+
+    def create(self, text, voice, speed, lang):
+        return np.zeros(24000, dtype=np.float32), 24000
+
+@pytest.mark.parametrize("mode", bench_tts.MODES)
+def test_cases_run_through_voice_generator(monkeypatch, mode):
+    monkeypatch.setenv("KOKORO_PROVIDER", "")
+    monkeypatch.setenv("KOKORO_THREADS", "")
+    kokoro = FakeKokoro()  # get_kokoro returns the one cached model
+    monkeypatch.setattr(voice_generator, "get_kokoro", lambda: kokoro)
+    case = {"voice": "am_adam", "provider": "CPUExecutionProvider", "threads": 1, "distribution": "medium",
+            "mode": mode, "sentences": 3, "seed": 0}
+    result = bench_tts.run_case(case)
+    # One kokoro.create (1 s of audio) per sentence after segmentation
+    assert result["audio_seconds"] == 3.0 and result["first_audio_latency_seconds"] is not None
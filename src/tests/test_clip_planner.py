@@ -0,0 +1,83 @@
+import os
+import random
+import pytest
+import clip_planner
+from clip_planner import choose_clips, load_stock_index, plan_segments
+
+CLIPS = [
+    {"source_path": "a.mp4", "duration": 12.0},
+    {"source_path": "b.mp4", "duration": 30.0},
+    {"source_path": "c.mp4", "duration": 95.0},
+]
+
+def test_segments_cover_the_duration_exactly():
+    segments = plan_segments(CLIPS, 100.0)
+    assert sum(segment.duration for segment in segments) == pytest.approx(100.0, abs=1e-6)
+    assert [(s.source_path, s.in_point, s.out_point, s.start) for s in segments] == [
+        ("a.mp4", 0.0, 12.0, 0.0), ("b.mp4", 0.0, 30.0, 12.0), ("c.mp4", 0.0, 58.0, 42.0),
+    ]
+
+def test_long_clips_are_used_past_sixty_seconds():
+    segments = plan_segments([CLIPS[2]], 90.0)
+    assert len(segments) == 1 and segments[0].out_point == 90.0
+
+def test_random_seek_stays_inside_the_clip():
+    rng = random.Random(7)
+    for segment in plan_segments(CLIPS, 120.0, random_seek=True, rng=rng):
+        clip = next(c for c in CLIPS if c["source_path"] == segment.source_path)
+        assert 0.0 <= segment.in_point and segment.out_point <= clip["duration"] + 1e-3
+
+def test_no_flash_segment_at_the_end():
+    # 12 s + 30 s leaves 1 s: the b.mp4 segment is shortened so the last one gets MIN_SEGMENT_SECONDS
+    segments = plan_segments(CLIPS, 43.0)
+    assert [segment.duration for segment in segments] == [12.0, 28.0, 3.0]
+
+def test_max_segment_and_cycling():
+    segments = plan_segments(CLIPS[:1], 30.0, max_segment=10.0)
+    assert [segment.duration for segment in segments] == [10.0, 10.0, 10.0]
+
+def test_choose_clips_stops_once_covered():
+    chosen = choose_clips(CLIPS, 20.0, rng=random.Random(1))
+    assert sum(clip["duration"] for clip in chosen[:-1]) < 20.0 <= sum(clip["duration"] for clip in chosen)
+
+def test_stock_index_only_probes_new_files(tmp_path, monkeypatch):
+    video_dir = tmp_path / "videos"
+    video_dir.mkdir()
+    (video_dir / "a.mp4").write_bytes(b"a")
+    probed = []
+
+    def fake_probe(path):
+        probed.append(path)
+        return {"source_path": path, "source_size": 1, "source_mtime": os.stat(path).st_mtime, "duration": 5.0}
+
+    monkeypatch.setattr(clip_planner, "probe_clip", fake_probe)
+    index_path = str(tmp_path / "index.json")
+    assert [clip["duration"] for clip in load_stock_index(str(video_dir), index_path)] == [5.0]
+    assert [clip["duration"] for clip in load_stock_index(str(video_dir), index_path)] == [5.0]
+    assert len(probed) == 1
+
+def _index_clips(paths, index_path):
+    for path in paths:
+        clip_planner.get_clip(path, index_path)
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork to share the patched probe")
+def test_concurrent_processes_keep_every_index_entry(tmp_path, monkeypatch):
+    import multiprocessing
+    monkeypatch.setattr(
+        clip_planner, "probe_clip",
+        lambda path: {"source_path": path, "source_size": 1, "source_mtime": os.stat(path).st_mtime, "duration": 5.0},
+    )
+    paths = []
+    for i in range(40):
+        (tmp_path / f"{i}.mp4").write_bytes(b"a")
+        paths.append(str(tmp_path / f"{i}.mp4"))
+    index_path = str(tmp_path / "index.json")
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_index_clips, args=(paths[i::4], index_path)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+    assert len(clip_planner._load_index(index_path)["clips"]) == 40
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
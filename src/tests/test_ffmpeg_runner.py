@@ -0,0 +1,70 @@
+import shutil
+import threading
+import ffmpeg
+import pytest
+from ffmpeg_runner import FFmpegProgress, FFmpegCancelled, FFmpegTimeout, _apply_progress_line, run_ffmpeg
+
+def test_progress_block_parsing():
+    """
+    Parses one -progress block and checks the derived percent/eta.
+    """
+    progress = FFmpegProgress(stage="test", expected_duration=20.0)
+    block = [
+        ("frame", "240"),
+        ("fps", "48.00"),
+        ("total_size", "1048576"),
+        ("out_time_us", "10000000"),
+        ("speed", "2.00x"),
+    ]
+    for key, value in block:
+        assert not _apply_progress_line(progress, key, value)
+    assert _apply_progress_line(progress, "progress", "continue")
+
+    assert progress.frame == 240
+    assert progress.out_time == pytest.approx(10.0)
+    assert progress.speed == pytest.approx(2.0)
+    assert progress.percent == pytest.approx(50.0)
+    assert progress.eta == pytest.approx(5.0)
+    assert not progress.finished
+
+    assert _apply_progress_line(progress, "progress", "end")
+    assert progress.finished
+
+def test_progress_handles_na_values():
+    progress = FFmpegProgress(stage="test")
+    _apply_progress_line(progress, "out_time_us", "N/A")
+    _apply_progress_line(progress, "speed", "N/A")
+    assert progress.out_time == 0.0
+    assert progress.speed == 0.0
+    assert progress.percent is None
+    assert progress.eta is None
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg binary not available")
+
+@needs_ffmpeg
+def test_run_ffmpeg_reports_progress(tmp_path):
+    reports = []
+    stream = ffmpeg.input("testsrc=duration=2:size=320x240:rate=24", f="lavfi")
+    run_ffmpeg(
+        ffmpeg.output(stream, str(tmp_path / "out.mp4")),
+        stage="test", expected_duration=2.0, progress_callback=lambda p: reports.append(p.out_time),
+    )
+    assert reports
+    assert (tmp_path / "out.mp4").stat().st_size > 0
+
+@needs_ffmpeg
+def test_run_ffmpeg_failure_keeps_stderr_tail(tmp_path):
+    with pytest.raises(ffmpeg.Error) as excinfo:
+        run_ffmpeg(ffmpeg.output(ffmpeg.input(str(tmp_path / "missing.wav")), str(tmp_path / "out.wav")), stderr_tail_lines=5)
+    assert excinfo.value.stderr.count(b"\n") <= 5
+
+@needs_ffmpeg
+def test_run_ffmpeg_timeout_and_cancel(tmp_path):
+    endless = ffmpeg.input("testsrc=size=320x240:rate=24", f="lavfi", re=None)
+    with pytest.raises(FFmpegTimeout):
+        run_ffmpeg(ffmpeg.output(endless, str(tmp_path / "a.mp4")), timeout=0.5)
+
+    cancel_event = threading.Event()
+    threading.Timer(0.5, cancel_event.set).start()
+    with pytest.raises(FFmpegCancelled):
+        run_ffmpeg(ffmpeg.output(endless, str(tmp_path / "b.mp4")), cancel_event=cancel_event)
@@ -0,0 +1,29 @@
+import json
+import pytest
+import gen_short
+from gen_short import fallback_image_prompt, parse_image_prompts
+
+SENTENCES = ["The old house creaked.", "A shadow moved at night.", "She opened the door."]
+
+def test_a_non_list_response_falls_back_for_every_sentence():
+    response = json.dumps({"prompts": ["house", "shadow", "door"]})
+    assert parse_image_prompts(response, SENTENCES) == [fallback_image_prompt(s) for s in SENTENCES]
+
+@pytest.mark.parametrize("items", [["old house, creaking"], ["a", "b", "c", "d"]])
+def test_a_length_mismatch_keeps_the_prompts_in_sentence_order(items):
+    prompts = parse_image_prompts(json.dumps(items), SENTENCES)
+    assert len(prompts) == len(SENTENCES) and prompts[0] == items[0]
+    if len(items) < len(SENTENCES):
+        assert prompts[1:] == [fallback_image_prompt(s) for s in SENTENCES[1:]]
+
+def test_unusable_items_fall_back_one_by_one():
+    prompts = parse_image_prompts(json.dumps(["old house", "  ", 7]), SENTENCES)
+    assert prompts == ["old house", fallback_image_prompt(SENTENCES[1]), fallback_image_prompt(SENTENCES[2])]
+
+@pytest.mark.asyncio
+async def test_no_sentences_makes_no_request(monkeypatch):
+    def no_client():
+        raise AssertionError("no LLM request for an empty sentence list")
+
+    monkeypatch.setattr(gen_short, "get_client", no_client)
+    assert await gen_short.generate_image_prompts([]) == []
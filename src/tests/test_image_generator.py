@@ -0,0 +1,54 @@
+import os
+import sys
+import types
+import pytest
+from image_generator import ImageGenerator, SCHEDULERS
+
+class FakePipe:
+    scheduler = None
+
+@pytest.fixture
+def onnx_generator(tmp_path, monkeypatch):
+    monkeypatch.setattr(ImageGenerator, "_resolve_model_path", lambda self: self.model_id)
+    monkeypatch.setattr(ImageGenerator, "_load_onnx_pipeline", lambda self: FakePipe())
+
+    def make(model_id):
+        return ImageGenerator(str(tmp_path), backend="onnx", model_id=model_id, scheduler="lcm")
+    return make
+
+def test_onnx_lcm_falls_back_without_an_lcm_model(onnx_generator):
+    # The LCM-LoRA can't be fused on ONNX: 4 LCM steps on plain SD would give noise
+    generator = onnx_generator("runwayml/stable-diffusion-v1-5")
+    assert generator.scheduler_name == "default"
+    assert generator.default_steps == SCHEDULERS["default"][1]
+
+def test_onnx_lcm_keeps_an_lcm_model(onnx_generator, monkeypatch):
+    monkeypatch.setattr(ImageGenerator, "_apply_scheduler", lambda self, lcm_lora=None: None)
+    generator = onnx_generator("SimianLuo/LCM_Dreamshaper_v7")
+    assert (generator.scheduler_name, generator.default_steps) == ("lcm", 4)
+
+def test_onnx_export_is_kept_for_the_next_start(tmp_path, monkeypatch):
+    loads = []
+
+    class ORTStableDiffusionPipeline:
+        scheduler = None
+
+        @classmethod
+        def from_pretrained(cls, path, export=False, provider=None):
+            loads.append((path, export))
+            return cls()
+
+        def save_pretrained(self, path):
+            os.makedirs(os.path.join(path, "unet"))
+            open(os.path.join(path, "unet", "model.onnx"), "wb").close()
+
+    monkeypatch.setitem(sys.modules, "optimum", types.ModuleType("optimum"))
+    monkeypatch.setitem(sys.modules, "optimum.onnxruntime", types.SimpleNamespace(ORTStableDiffusionPipeline=ORTStableDiffusionPipeline))
+    monkeypatch.setenv("IMAGE_ONNX_DIR", str(tmp_path / "onnx"))
+    monkeypatch.setattr(ImageGenerator, "_resolve_model_path", lambda self: self.model_id)
+    for _ in range(2):
+        ImageGenerator(str(tmp_path / "out"), backend="onnx", model_id="org/sd-model", scheduler="default")
+
+    export_dir = str(tmp_path / "onnx" / "org_sd-model")
+    assert loads == [("org/sd-model", True), (export_dir, False)]
+    assert os.listdir(tmp_path / "onnx") == ["org_sd-model"]
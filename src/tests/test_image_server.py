@@ -0,0 +1,53 @@
+import threading
+import time
+import pytest
+from image_server import BatchingWorker
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def generate_images(self, prompts, output_paths=None, batch_size=None, width=768, height=512):
+        self.release.wait(5)
+        self.calls.append((list(prompts), (width, height)))
+        return output_paths
+
+def test_jobs_queued_together_share_a_batch():
+    generator = FakeGenerator()
+    worker = BatchingWorker(generator, batch_size=4, batch_window=0.2)
+    first = worker.submit(["a"], ["a.png"], 768, 512)
+    time.sleep(0.05)  # the worker is now waiting for more jobs to batch
+    second = worker.submit(["b", "c"], ["b.png", "c.png"], 768, 512)
+    generator.release.set()
+
+    assert first.result(5) == ["a.png"]
+    assert second.result(5) == ["b.png", "c.png"]
+    assert generator.calls == [(["a", "b", "c"], (768, 512))]
+
+def test_different_sizes_are_not_batched_together():
+    generator = FakeGenerator()
+    generator.release.set()
+    worker = BatchingWorker(generator, batch_size=4, batch_window=0.2)
+    futures = [worker.submit(["a"], ["a.png"], 768, 512), worker.submit(["b"], ["b.png"], 512, 512)]
+    for future in futures:
+        future.result(5)
+    assert [call[1] for call in generator.calls] == [(768, 512), (512, 512)]
+
+def test_a_different_size_job_keeps_its_place():
+    generator = FakeGenerator()
+    worker = BatchingWorker(generator, batch_size=4, batch_window=0.2)
+    futures = [worker.submit(["a"], ["a.png"], 768, 512)]
+    time.sleep(0.05)
+    futures += [worker.submit(["b"], ["b.png"], 512, 512), worker.submit(["c"], ["c.png"], 768, 512)]
+    generator.release.set()
+    for future in futures:
+        future.result(5)
+    assert [call[0] for call in generator.calls] == [["a"], ["b"], ["c"]]
+
+def test_generator_errors_reach_every_job_in_the_batch():
+    generator = FakeGenerator()
+    generator.generate_images = lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("out of memory"))
+    worker = BatchingWorker(generator, batch_size=4, batch_window=0.0)
+    with pytest.raises(RuntimeError):
+        worker.submit(["a"], ["a.png"], 768, 512).result(5)
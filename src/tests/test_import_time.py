@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import pytest
+
+# Entry points and the modules they pull in. Importing them must stay cheap:
+# models, browsers, SDK clients and binary probes are loaded on first use.
+MODULES = [
+    "main",
+    "gen_short",
+    "story_generator",
+    "voice_generator",
+    "video_generator",
+    "transcriber",
+    "thumbnail_generator",
+    "pollinations_image_generator",
+    "image_generator",
+    "short_renderer",
+    "music_library",
+    "model_registry",
+    "render_planner",
+    "job_queue",
+    "stage_worker",
+    "clip_planner",
+    "reel_cache",
+    "artifacts",
+]
+HEAVY_MODULES = {"kokoro_onnx", "onnxruntime", "playwright", "vosk", "torch", "diffusers", "moviepy", "google.generativeai"}
+BUDGET_MS = float(os.environ.get("IMPORT_TIME_BUDGET_MS", "1000"))
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_times(module: str) -> dict:
+    """Runs `python -X importtime -c "import module"` and returns {imported module: cumulative µs}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True, timeout=60,
+    )
+    if result.returncode != 0:
+        missing = result.stderr.strip().splitlines()[-1]
+        if "ModuleNotFoundError" in missing:
+            pytest.skip(f"{module} can't be imported here: {missing}")
+        pytest.fail(result.stderr)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_is_lazy_and_within_budget(module):
+    times = import_times(module)
+    assert not HEAVY_MODULES & set(times), f"{module} imports {sorted(HEAVY_MODULES & set(times))} at import time"
+    assert times[module] / 1000 <= BUDGET_MS, f"importing {module} took {times[module] / 1000:.0f} ms"
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+import pytest
+import stage_worker
+from job_queue import JobQueue, LeaseLost
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2, retry_delay=0)
+
+def test_completed_stage_queues_the_next_with_merged_state(queue):
+    job_id = queue.submit({"prompt": "a haunted lighthouse"})
+    task = queue.claim("story", "w1")
+    assert task.state == {"prompt": "a haunted lighthouse"} and task.attempts == 1
+    assert queue.claim("story", "w2") is None
+
+    queue.complete(task, "w1", {"story": "It was dark."}, next_stage="tts")
+    tts_task = queue.claim("tts", "w2")
+    assert tts_task.state == {"prompt": "a haunted lighthouse", "story": "It was dark."}
+    queue.complete(tts_task, "w2", {"audio_path": "story.wav"})
+    job = queue.job(job_id)
+    assert job["status"] == "done"
+    assert [(t["stage"], t["status"]) for t in job["tasks"]] == [("story", "done"), ("tts", "done")]
+
+def test_expired_lease_is_reclaimed_and_old_owner_is_fenced(queue):
+    queue.submit({})
+    task = queue.claim("story", "w1", lease_seconds=0.05)
+    time.sleep(0.1)
+    retaken = queue.claim("story", "w2")
+    assert retaken.id == task.id and retaken.attempts == 2
+    with pytest.raises(LeaseLost):
+        queue.complete(task, "w1", {"story": "stale"})
+    with pytest.raises(LeaseLost):
+        queue.heartbeat(task, "w1")
+
+def test_failures_are_retried_then_fail_the_job(queue):
+    job_id = queue.submit({})
+    queue.fail(queue.claim("story", "w1"), "w1", "quota")
+    task = queue.claim("story", "w1")
+    assert task.attempts == 2
+    queue.fail(task, "w1", "quota again")
+    assert queue.claim("story", "w1") is None
+    job = queue.job(job_id)
+    assert job["status"] == "failed" and job["error"] == "quota again"
+
+def test_concurrent_workers_never_claim_the_same_task(queue):
+    for _ in range(20):
+        queue.submit({})
+    claimed, lock = [], threading.Lock()
+
+    def worker(name):
+        while (task := queue.claim("story", name)) is not None:
+            with lock:
+                claimed.append(task.id)
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(set(claimed)) and len(claimed) == 20
+
+def test_worker_runs_the_stage_handler(queue, tmp_path, monkeypatch):
+    monkeypatch.setattr(stage_worker, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setitem(stage_worker.HANDLERS, "story", lambda state, job_dir, cancel: {"story": state["prompt"].upper()})
+    job_id = queue.submit({"prompt": "boo"})
+
+    assert stage_worker.run_worker("story", queue, poll_interval=0.01, max_tasks=1) == 1
+    job = queue.job(job_id)
+    assert job["state"]["story"] == "BOO"
+    assert queue.counts() == {"story": {"done": 1}, "tts": {"pending": 1}}
+
+def test_shared_storage_uses_a_rollback_journal(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    JobQueue(db_path).submit({"prompt": "local"})
+    shared = JobQueue(db_path, journal_mode="delete")
+    with shared._connect() as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    shared.submit({"prompt": "shared"})
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(("-wal", "-shm"))]
+    with pytest.raises(ValueError):
+        JobQueue(db_path, journal_mode="memory")
@@ -0,0 +1,48 @@
+import json
+import pytest
+from llm_cache import LLMCache, cache_key
+from llm_client import GeminiClient, LLMCacheMiss, LLMQuotaError
+from llm_stub_server import start_server
+
+@pytest.fixture
+def stub_url():
+    server = start_server(port=0)
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}"
+    server.shutdown()
+
+def test_cache_key_depends_on_model_prompt_and_params():
+    base = cache_key("gemini-1.5-flash", "prompt", {"temperature": 0.5})
+    assert base == cache_key("gemini-1.5-flash", "prompt", {"temperature": 0.5})
+    assert base != cache_key("gemini-1.5-pro", "prompt", {"temperature": 0.5})
+    assert base != cache_key("gemini-1.5-flash", "prompt!", {"temperature": 0.5})
+    assert base != cache_key("gemini-1.5-flash", "prompt", {"temperature": 0.7})
+
+def test_record_then_replay_offline(tmp_path, stub_url):
+    recorder = GeminiClient(api_key="test", base_url=stub_url, cache=LLMCache("record", str(tmp_path)))
+    recorded = recorder.generate_sync("Write a story.")
+    assert recorded
+
+    # Replay never touches the network: the base URL points nowhere
+    replayer = GeminiClient(api_key="test", base_url="http://127.0.0.1:9", cache=LLMCache("replay", str(tmp_path)))
+    assert replayer.generate_sync("Write a story.") == recorded
+    with pytest.raises(LLMCacheMiss):
+        replayer.generate_sync("A prompt nobody recorded.")
+
+def test_stub_serves_schema_shaped_json(stub_url):
+    client = GeminiClient(api_key="test", base_url=stub_url, cache=LLMCache("off"))
+    schema = {"type": "object", "properties": {"story": {"type": "string"}, "intro": {"type": "string"}}}
+    text = client.generate_sync("x", generation_config={"response_mime_type": "application/json", "response_schema": schema})
+    assert set(json.loads(text)) == {"story", "intro"}
+
+def test_stub_errors_map_to_quota_error(monkeypatch):
+    import llm_client
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt: 0.0)
+    server = start_server(port=0, error_rate=1.0)
+    host, port = server.server_address[:2]
+    try:
+        client = GeminiClient(api_key="test", base_url=f"http://{host}:{port}", max_retries=1, cache=LLMCache("off"))
+        with pytest.raises(LLMQuotaError):
+            client.generate_sync("hi")
+    finally:
+        server.shutdown()
@@ -0,0 +1,77 @@
+import random
+import pytest
+from google.api_core import exceptions as google_exceptions
+import llm_client
+from llm_client import GeminiClient, TokenBucket, LLMQuotaError, LLMError, backoff_delay
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Fails with the queued exceptions, then answers."""
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+    async def generate_content_async(self, prompt, generation_config=None, request_options=None):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return FakeResponse(f"echo: {prompt}")
+
+def make_client(model, max_retries=3):
+    client = GeminiClient(api_key="test", requests_per_minute=6000, burst=100, timeout=5, max_retries=max_retries)
+    client._configured = True
+    client._models[client.default_model] = model
+    return client
+
+def test_token_bucket_spaces_requests_after_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate_per_second=2.0, capacity=2, clock=clock)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    clock.now = 10.0  # refill is capped at capacity
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+
+def test_backoff_delay_is_jittered_and_capped():
+    rng = random.Random(1)
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base=1.0, cap=8.0, rng=rng)
+        assert 0.0 <= delay <= min(8.0, 2 ** attempt)
+
+def test_retries_quota_errors_then_succeeds(monkeypatch):
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt: 0.0)
+    model = FakeModel([google_exceptions.ResourceExhausted("quota"), google_exceptions.ServiceUnavailable("busy")])
+    client = make_client(model)
+    assert client.generate_sync("hi") == "echo: hi"
+    assert model.calls == 3
+
+def test_raises_quota_error_after_retries(monkeypatch):
+    monkeypatch.setattr(llm_client, "backoff_delay", lambda attempt: 0.0)
+    model = FakeModel([google_exceptions.ResourceExhausted("quota")] * 5)
+    client = make_client(model, max_retries=2)
+    with pytest.raises(LLMQuotaError):
+        client.generate_sync("hi")
+    assert model.calls == 3
+
+def test_non_retryable_errors_fail_fast():
+    model = FakeModel([google_exceptions.InvalidArgument("bad prompt")])
+    client = make_client(model)
+    with pytest.raises(LLMError):
+        client.generate_sync("hi")
+    assert model.calls == 1
+
+@pytest.mark.asyncio
+async def test_async_generate_from_another_loop():
+    client = make_client(FakeModel([]))
+    assert await client.generate("hi") == "echo: hi"
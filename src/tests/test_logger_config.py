@@ -0,0 +1,47 @@
+import json
+import logging
+from utils.logger_config import ConsoleFilter, JsonFormatter, RunContextFilter, StageSampler, RUN_ID, log_stage
+
+def _record(message, level=logging.INFO, **extra):
+    record = logging.LogRecord("ZAKUTO_Logger", level, __file__, 0, message, None, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    RunContextFilter().filter(record)
+    return record
+
+def test_records_carry_run_id_and_stage():
+    with log_stage("audio"):
+        record = _record("hello")
+    assert (record.run_id, record.stage) == (RUN_ID, "audio")
+    assert _record("explicit", stage="final").stage == "final"
+
+def test_json_formatter_includes_extra_fields():
+    entry = json.loads(JsonFormatter().format(_record("encoded", stage="final", frames=240)))
+    assert entry["message"] == "encoded"
+    assert entry["stage"] == "final" and entry["run_id"] == RUN_ID
+    assert entry["frames"] == 240
+
+def test_verbose_records_are_sampled_per_stage():
+    sampler = StageSampler(head=5, every=10)
+    kept = [sampler.filter(_record(f"line {i}", stage="clip_0", verbose=True)) for i in range(105)]
+    assert sum(kept) == 5 + 10
+    # Each stage has its own budget, and warnings always pass
+    assert sampler.filter(_record("first", stage="final", verbose=True))
+    assert sampler.filter(_record("bad", level=logging.WARNING, stage="clip_0", verbose=True))
+    # Non-verbose records are never sampled
+    assert all(sampler.filter(_record("normal", stage="clip_0")) for _ in range(50))
+
+def test_verbose_records_stay_off_the_console():
+    console = ConsoleFilter()
+    assert not console.filter(_record("frame=  240 fps=60", stage="final", verbose=True))
+    assert console.filter(_record("ffmpeg failed", level=logging.ERROR, stage="final", verbose=True))
+    assert console.filter(_record("Rendering final video", stage="final"))
+
+def test_entering_a_stage_renews_the_sample_budget(monkeypatch):
+    from utils import logger_config
+    sampler = StageSampler(head=2, every=0)
+    monkeypatch.setattr(logger_config, "_sampler", sampler)
+    for job in range(2):
+        with log_stage("render"):
+            kept = [sampler.filter(_record(f"job {job} line {i}", stage="final", verbose=True)) for i in range(5)]
+        assert sum(kept) == 2  # each job gets its own head budget
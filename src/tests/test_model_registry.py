@@ -0,0 +1,173 @@
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import threading
+import types
+import pytest
+import model_registry
+from model_registry import ModelAsset, ModelIntegrityError, compute_sha256, ensure_asset, prefetch, wait_for
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, "MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(model_registry, "LOCK_PATH", str(tmp_path / "models.lock.json"))
+    monkeypatch.setattr(model_registry, "_verified", set())
+
+    def add(name, **kwargs):
+        asset = ModelAsset(name=name, version="1", **kwargs)
+        monkeypatch.setitem(model_registry.MODELS, name, asset)
+        monkeypatch.setitem(model_registry._asset_locks, name, threading.Lock())
+        return asset
+
+    return add
+
+def test_first_verification_is_recorded_and_not_repeated(registry, tmp_path, monkeypatch):
+    (tmp_path / "tiny.onnx").write_bytes(b"weights")
+    registry("tiny", path="tiny.onnx")
+
+    assert ensure_asset("tiny") == str(tmp_path / "tiny.onnx")
+    lock = json.loads((tmp_path / "models.lock.json").read_text())
+    assert lock["tiny"]["sha256"] == compute_sha256(str(tmp_path / "tiny.onnx"))
+
+    # Unchanged file in a new process: the recorded checksum is trusted without re-hashing
+    monkeypatch.setattr(model_registry, "_verified", set())
+    monkeypatch.setattr(model_registry, "compute_sha256", lambda path: pytest.fail("re-hashed an unchanged file"))
+    assert ensure_asset("tiny") == str(tmp_path / "tiny.onnx")
+
+def test_changed_file_fails_verification(registry, tmp_path, monkeypatch):
+    model_file = tmp_path / "tiny.onnx"
+    model_file.write_bytes(b"weights")
+    registry("tiny", path="tiny.onnx")
+    ensure_asset("tiny")
+
+    model_file.write_bytes(b"tampered weights")
+    monkeypatch.setattr(model_registry, "_verified", set())
+    with pytest.raises(ModelIntegrityError):
+        ensure_asset("tiny")
+
+def test_pinned_checksum_is_enforced(registry, tmp_path):
+    (tmp_path / "tiny.onnx").write_bytes(b"weights")
+    registry("tiny", path="tiny.onnx", sha256="0" * 64)
+    with pytest.raises(ModelIntegrityError):
+        ensure_asset("tiny")
+
+def test_directory_checksum_covers_names_and_contents(tmp_path):
+    model_dir = tmp_path / "vosk"
+    (model_dir / "am").mkdir(parents=True)
+    (model_dir / "am" / "final.mdl").write_bytes(b"acoustic")
+    before = compute_sha256(str(model_dir))
+    (model_dir / "am" / "final.mdl").rename(model_dir / "am" / "other.mdl")
+    assert compute_sha256(str(model_dir)) != before
+
+def test_prefetch_runs_in_background_and_reports_failures(registry, tmp_path):
+    (tmp_path / "tiny.onnx").write_bytes(b"weights")
+    registry("tiny", path="tiny.onnx")
+    registry("missing", path="missing.onnx", sha256="0" * 64, url="http://127.0.0.1:9/missing.onnx")
+
+    futures = prefetch(["tiny", "missing"], warm=False)
+    results = wait_for(futures, timeout=30)
+    assert results["tiny"] == os.path.join(str(tmp_path), "tiny.onnx")
+    assert isinstance(results["missing"], Exception)
+
+@pytest.fixture
+def fake_hub(tmp_path, monkeypatch):
+    """huggingface_hub stand-in: a one-file snapshot; `published` holds the hub's LFS hashes."""
+    hub = types.SimpleNamespace(calls=[], published={})
+    snapshot = tmp_path / "snapshot"
+
+    def snapshot_download(repo_id, revision=None, allow_patterns=None):
+        hub.calls.append(allow_patterns)
+        (snapshot / "unet").mkdir(parents=True, exist_ok=True)
+        (snapshot / "unet" / "diffusion_pytorch_model.safetensors").write_bytes(b"unet weights")
+        return str(snapshot)
+
+    class HfApi:
+        def model_info(self, repo_id, revision=None, files_metadata=False):
+            siblings = [types.SimpleNamespace(rfilename=name, lfs=types.SimpleNamespace(sha256=sha256))
+                        for name, sha256 in hub.published.items()]
+            return types.SimpleNamespace(siblings=siblings)
+
+    monkeypatch.setitem(sys.modules, "huggingface_hub", types.SimpleNamespace(snapshot_download=snapshot_download, HfApi=HfApi))
+    hub.weights = snapshot / "unet" / "diffusion_pytorch_model.safetensors"
+    return hub
+
+def test_hub_snapshot_is_filtered_verified_and_recorded(registry, tmp_path, fake_hub):
+    fake_hub.published["unet/diffusion_pytorch_model.safetensors"] = hashlib.sha256(b"unet weights").hexdigest()
+    registry("hub", repo_id="org/model", allow_patterns=("model_index.json", "unet/diffusion_pytorch_model.safetensors"))
+
+    assert ensure_asset("hub") == str(tmp_path / "snapshot")
+    assert fake_hub.calls == [["model_index.json", "unet/diffusion_pytorch_model.safetensors"]]
+    lock = json.loads((tmp_path / "models.lock.json").read_text())
+    assert lock["hub"]["files"]["unet/diffusion_pytorch_model.safetensors"]["sha256"] == fake_hub.published[
+        "unet/diffusion_pytorch_model.safetensors"]
+    # Recorded: the next run doesn't ask the hub again, but notices a changed file
+    assert ensure_asset("hub") == str(tmp_path / "snapshot") and len(fake_hub.calls) == 1
+    fake_hub.weights.write_bytes(b"tampered weights")
+    with pytest.raises(ModelIntegrityError):
+        ensure_asset("hub")
+
+def test_hub_snapshot_with_wrong_weights_is_rejected(registry, fake_hub):
+    fake_hub.published["unet/diffusion_pytorch_model.safetensors"] = "0" * 64
+    registry("hub", repo_id="org/model")
+    with pytest.raises(ModelIntegrityError):
+        ensure_asset("hub")
+    assert "hub" not in model_registry._read_lock()
+
+class FakeResponse:
+    def __init__(self, body: bytes, content_length: int):
+        self.body, self.headers = body, {"Content-Length": str(content_length)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+def test_truncated_download_is_not_recorded(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry.requests, "get", lambda url, **kwargs: FakeResponse(b"weig", 7))
+    registry("tiny", path="tiny.onnx", url="http://models.invalid/tiny.onnx")
+    with pytest.raises(ModelIntegrityError, match="incomplete"):
+        ensure_asset("tiny")
+    assert os.listdir(tmp_path) == []
+
+def test_pinned_checksum_is_checked_before_extracting(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry.requests, "get", lambda url, **kwargs: FakeResponse(b"not the archive", 15))
+    registry("vosk", path="vosk-model", url="http://models.invalid/vosk-model.zip", sha256="0" * 64)
+    with pytest.raises(ModelIntegrityError, match="sha256"):
+        ensure_asset("vosk")
+    assert os.listdir(tmp_path) == []
+
+def test_sd_snapshot_skips_checkpoint_variants():
+    patterns = model_registry.MODELS["sd"].allow_patterns
+    for unwanted in ("v1-5-pruned.ckpt", "unet/diffusion_pytorch_model.fp16.safetensors",
+                     "unet/diffusion_pytorch_model.non_ema.safetensors", "safety_checker/model.safetensors"):
+        assert not any(fnmatch.fnmatch(unwanted, pattern) for pattern in patterns)
+    assert any(fnmatch.fnmatch("unet/diffusion_pytorch_model.safetensors", pattern) for pattern in patterns)
+
+def test_concurrent_vosk_loads_build_one_model(monkeypatch):
+    import time
+    import transcriber
+    built = []
+
+    class Model:
+        def __init__(self, path):
+            time.sleep(0.05)
+            built.append(path)
+
+    monkeypatch.setitem(sys.modules, "vosk", types.SimpleNamespace(Model=Model))
+    transcriber._load_vosk_model.cache_clear()
+    threads = [threading.Thread(target=transcriber.load_vosk_model, args=("vosk-model",)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    transcriber._load_vosk_model.cache_clear()
+    assert built == ["vosk-model"]
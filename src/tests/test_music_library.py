@@ -0,0 +1,91 @@
+import os
+import numpy as np
+import ffmpeg
+import music_library
+
+EBUR128_LOG = """[Parsed_ebur128_0 @ 0x55d] t: 29.9  TARGET:-23 LUFS    M: -15.2 S: -15.0     I: -15.8 LUFS       LRA:   3.1 LU
+[Parsed_ebur128_0 @ 0x55d] Summary:
+
+  Integrated loudness:
+    I:         -16.4 LUFS
+    Threshold: -26.6 LUFS
+
+  Loudness range:
+    LRA:         3.2 LU
+"""
+
+def test_parse_integrated_loudness_uses_summary():
+    assert music_library.parse_integrated_loudness(EBUR128_LOG) == -16.4
+    assert music_library.parse_integrated_loudness("no loudness here") is None
+
+def test_load_pcm_is_memory_mapped(tmp_path):
+    samples = np.arange(8, dtype="<f4")
+    pcm_path = tmp_path / "track.f32le"
+    samples.tofile(pcm_path)
+    frames = music_library.load_pcm({"pcm_path": str(pcm_path), "channels": 2})
+    assert isinstance(frames, np.memmap)
+    assert frames.shape == (4, 2)
+    assert frames[3, 1] == 7.0
+
+def test_looped_input_reads_pcm_with_offset():
+    entry = {"pcm_path": "/tmp/track.f32le", "sample_format": "f32le", "sample_rate": 44100, "channels": 2, "duration": 30.0}
+    stream = music_library.looped_music_input("track.mp3", start_offset=35.0, entry=entry)
+    args = ffmpeg.compile(ffmpeg.output(stream, "out.wav"))
+    assert args[args.index("-stream_loop") + 1] == "-1"
+    assert args[args.index("-f") + 1] == "f32le"
+    assert float(args[args.index("-ss") + 1]) == 5.0
+
+def test_loudness_gain_normalises_to_reference_when_enabled(monkeypatch):
+    quiet_track = {"integrated_lufs": music_library.REFERENCE_LUFS - 6.0}
+    monkeypatch.delenv("MUSIC_NORMALIZE", raising=False)
+    assert music_library.loudness_gain(quiet_track, 0.3) == 0.3  # the level create_video always used
+    monkeypatch.setenv("MUSIC_NORMALIZE", "1")
+    assert abs(music_library.loudness_gain(quiet_track, 0.3) - 0.3 * 10 ** (6 / 20)) < 1e-9
+    assert music_library.loudness_gain(None, 0.3) == 0.3
+
+def test_same_named_tracks_get_separate_pcm_files(tmp_path, monkeypatch):
+    def fake_run_ffmpeg(stream_spec, stage=None, **kwargs):
+        pcm_path = next(arg for arg in ffmpeg.compile(stream_spec) if arg.endswith(".part"))
+        np.zeros(8, dtype="<f4").tofile(pcm_path)
+        return EBUR128_LOG.encode()
+
+    monkeypatch.setattr(music_library, "run_ffmpeg", fake_run_ffmpeg)
+    for folder, content in (("a", b"first"), ("b", b"second")):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "theme.mp3").write_bytes(content)
+    index_path = str(tmp_path / "library" / "index.json")
+    first = music_library.get_track(str(tmp_path / "a" / "theme.mp3"), index_path=index_path)
+    second = music_library.get_track(str(tmp_path / "b" / "theme.mp3"), index_path=index_path)
+
+    assert first["pcm_path"] != second["pcm_path"]
+    assert first["integrated_lufs"] == -16.4
+    assert all(os.path.exists(entry["pcm_path"]) for entry in (first, second))
+    assert not [name for name in os.listdir(tmp_path / "library") if name.endswith((".part", ".tmp"))]
+
+def test_analysis_runs_outside_the_index_lock(tmp_path, monkeypatch):
+    import threading
+    index_path = str(tmp_path / "library" / "index.json")
+    for name in ("known.mp3", "new.mp3"):
+        (tmp_path / name).write_bytes(name.encode())
+    analysing, release = threading.Event(), threading.Event()
+
+    def fake_run_ffmpeg(stream_spec, stage=None, **kwargs):
+        pcm_path = next(arg for arg in ffmpeg.compile(stream_spec) if arg.endswith(".part"))
+        np.zeros(8, dtype="<f4").tofile(pcm_path)
+        if "new" in " ".join(ffmpeg.compile(stream_spec)):
+            analysing.set()
+            release.wait(5)
+        return EBUR128_LOG.encode()
+
+    monkeypatch.setattr(music_library, "run_ffmpeg", fake_run_ffmpeg)
+    known = music_library.get_track(str(tmp_path / "known.mp3"), index_path=index_path)
+    slow = threading.Thread(target=music_library.get_track, args=(str(tmp_path / "new.mp3"),), kwargs={"index_path": index_path})
+    slow.start()
+    try:
+        assert analysing.wait(5)
+        # Another render's lookup doesn't wait for the analysis
+        assert music_library.get_track(str(tmp_path / "known.mp3"), index_path=index_path) == known
+    finally:
+        release.set()
+        slow.join()
+    assert len(music_library._load_index(index_path)["tracks"]) == 2
@@ -0,0 +1,130 @@
+import asyncio
+import os
+from io import BytesIO
+import pytest
+from aiohttp import web
+from PIL import Image
+import pollinations_image_generator as pollinations
+from image_cache import ImageCache, sniff_image_type
+
+def _png_bytes() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def image_server(monkeypatch):
+    """Local Pollinations stand-in: the first request fails with 503, the rest return a PNG."""
+    state = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+    png = _png_bytes()
+
+    async def handle(request):
+        state["requests"] += 1
+        if state["requests"] == 1:
+            return web.Response(status=503)
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        await asyncio.sleep(0.05)
+        state["in_flight"] -= 1
+        return web.Response(body=png, content_type="image/png")
+
+    async def start():
+        app = web.Application()
+        app.router.add_get("/p/{prompt}", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(pollinations, "build_pollinations_url", lambda prompt: f"http://127.0.0.1:{port}/p/{prompt}")
+        return runner
+
+    monkeypatch.setattr(pollinations, "backoff_delay", lambda attempt, base, cap: 0.0)
+    return start, state
+
+@pytest.mark.asyncio
+async def test_async_batch_retries_and_bounds_concurrency(image_server, tmp_path):
+    start, state = image_server
+    cache = ImageCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    runner = await start()
+    try:
+        async with pollinations.create_image_session(concurrency=2) as session:
+            results = await asyncio.gather(*(
+                pollinations.generate_pollinations_image_async(session, f"prompt{i}", str(tmp_path / f"image_{i}.png"), cache=cache)
+                for i in range(5)
+            ))
+    finally:
+        await runner.cleanup()
+
+    assert results == [str(tmp_path / f"image_{i}.png") for i in range(5)]
+    assert state["requests"] == 6  # one retry after the 503
+    assert state["max_in_flight"] <= 2
+
+@pytest.mark.asyncio
+async def test_cache_hits_skip_the_request(image_server, tmp_path):
+    start, state = image_server
+    cache = ImageCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    runner = await start()
+    try:
+        async with pollinations.create_image_session() as session:
+            for _ in range(2):
+                await pollinations.generate_pollinations_image_async(session, "a prompt", str(tmp_path / "first.png"), cache=cache)
+            path = await pollinations.generate_pollinations_image_async(session, "a prompt", str(tmp_path / "second.png"), cache=cache)
+    finally:
+        await runner.cleanup()
+
+    assert state["requests"] == 2  # 503 + one download, later calls are hits
+    assert open(path, "rb").read() == _png_bytes()
+
+@pytest.mark.asyncio
+async def test_concurrent_downloads_of_one_prompt(image_server, tmp_path):
+    start, state = image_server
+    cache = ImageCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    runner = await start()
+    try:
+        async with pollinations.create_image_session() as session:
+            results = await asyncio.gather(*(
+                pollinations.generate_pollinations_image_async(session, "same prompt", str(tmp_path / f"image_{i}.png"), cache=cache)
+                for i in range(3)
+            ))
+    finally:
+        await runner.cleanup()
+
+    assert all(open(path, "rb").read() == _png_bytes() for path in results)
+    assert not [name for name in os.listdir(cache.cache_dir) if name.endswith(".tmp")]
+
+def test_interleaved_writers_of_one_key_do_not_collide(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    png = _png_bytes()
+    first, second = cache.writer("key"), cache.writer("key")
+    assert first.path != second.path
+    first.write(png[:20])
+    second.write(png[:20])
+    first.write(png[20:])
+    first.close()
+    path = cache.commit("key", first)
+    second.write(png[20:])
+    second.close()
+    assert cache.commit("key", second) == path
+    assert open(path, "rb").read() == png
+
+def test_sniff_image_type():
+    assert sniff_image_type(_png_bytes()[:12]) == ".png"
+    assert sniff_image_type(b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01") == ".jpg"
+    assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBP") == ".webp"
+    assert sniff_image_type(b"<html><body>") is None
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=250)
+    paths = []
+    for i, key in enumerate(["a", "b", "c"]):
+        writer = cache.writer(key)
+        writer.write(b"\x89PNG\r\n\x1a\n" + bytes(92))
+        writer.close()
+        paths.append(cache.commit(key, writer))
+        os.utime(paths[-1], (i, i))
+        if key == "b":
+            cache.get("a")  # touching "a" makes "b" the oldest
+
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
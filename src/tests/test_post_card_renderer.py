@@ -0,0 +1,47 @@
+import asyncio
+import importlib.util
+import pytest
+from PIL import Image, ImageChops, ImageStat
+from post_card_renderer import get_font, render_post_card, wrap_text
+
+POST_OPTIONS = dict(username="TestUser", handle="@test", time_ago="1h", likes="12.3K", comments="456", shares="78")
+needs_playwright = pytest.mark.skipif(importlib.util.find_spec("playwright") is None, reason="playwright not installed")
+
+def test_wrap_text_keeps_newlines_and_breaks_long_words():
+    font = get_font("x", "regular", 15)
+    lines = wrap_text("first line\n\n" + "word " * 40 + "\n" + "x" * 200, font, 300)
+    assert lines[:2] == ["first line", ""]
+    assert all(font.getlength(line) <= 300 for line in lines)
+    assert "".join(line for line in lines if set(line) == {"x"}) == "x" * 200
+
+@pytest.mark.parametrize("platform, max_width", [("x", 580), ("facebook", 500)])
+def test_cards_shrink_to_fit_and_grow_with_text(tmp_path, platform, max_width):
+    short = Image.open(render_post_card(platform, "Short post.", str(tmp_path / "short.png"), **POST_OPTIONS))
+    long = Image.open(render_post_card(platform, "A much longer post. " * 30, str(tmp_path / "long.png"), **POST_OPTIONS))
+    assert short.width < long.width == max_width + 32  # max-width + padding
+    assert long.height > short.height
+
+def test_unknown_platform_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        render_post_card("myspace", "text", str(tmp_path / "card.png"))
+
+@needs_playwright
+@pytest.mark.parametrize("platform", ["x", "facebook"])
+def test_pillow_card_matches_playwright_render(tmp_path, platform):
+    """
+    Pixel diff against the Chromium screenshot of the HTML template. Fonts differ
+    between the two, so the check is on size and overall similarity, not exact pixels.
+    """
+    from thumbnail_generator import generate_image_from_text
+
+    text = "This is a test post for the renderer comparison.\n\nIt has two paragraphs."
+    for renderer in ("playwright", "pillow"):
+        asyncio.run(generate_image_from_text(text, str(tmp_path / f"{renderer}.png"), platform=platform,
+                                             renderer=renderer, **POST_OPTIONS))
+    reference = Image.open(tmp_path / "playwright.png").convert("RGB")
+    candidate = Image.open(tmp_path / "pillow.png").convert("RGB")
+
+    assert abs(candidate.width - reference.width) <= reference.width * 0.1
+    assert abs(candidate.height - reference.height) <= reference.height * 0.1
+    diff = ImageChops.difference(reference, candidate.resize(reference.size))
+    assert sum(ImageStat.Stat(diff).mean) / 3 < 12
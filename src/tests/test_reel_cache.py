@@ -0,0 +1,107 @@
+import os
+import shutil
+import subprocess
+import threading
+import pytest
+import ffmpeg
+import reel_cache
+import video_generator
+from clip_planner import ClipSegment
+from ffmpeg_runner import FFmpegCancelled
+from reel_cache import ReelCache, build_reel
+
+def fake_render(duration, output_path, size=1000):
+    with open(output_path, "wb") as f:
+        f.write(b"\0" * size)
+    return [ClipSegment("a.mp4", 0.0, float(duration), 0.0)]
+
+def test_take_picks_the_shortest_sufficient_reel(tmp_path):
+    cache = ReelCache(str(tmp_path / "cache"), max_bytes=10**9, stock=1)
+    for duration in (30, 60, 120):
+        cache.add(duration, render=fake_render)
+    destination = str(tmp_path / "reel.mp4")
+    reel = cache.take(45.0, destination)
+    assert reel["duration"] == 60 and os.path.exists(destination)
+    assert sorted(r["duration"] for r in cache.reels()) == [30, 120]
+    assert cache.take(200.0, str(tmp_path / "none.mp4")) is None
+
+def test_missing_and_evict(tmp_path):
+    cache = ReelCache(str(tmp_path / "cache"), max_bytes=2500, stock=2)
+    assert cache.missing((30, 60)) == [30, 30, 60, 60]
+    for duration in (30, 30, 60):
+        cache.add(duration, render=fake_render)
+    assert cache.missing((30, 60)) == [60]
+    cache.evict()
+    # Three 1000-byte reels over a 2500-byte budget: the oldest goes
+    assert [r["duration"] for r in cache.reels()] == [30, 60]
+
+def test_partial_renders_are_not_listed(tmp_path):
+    cache = ReelCache(str(tmp_path / "cache"), stock=1)
+
+    def failing_render(duration, output_path):
+        fake_render(duration, output_path)
+        raise RuntimeError("encoder died")
+
+    with pytest.raises(RuntimeError):
+        cache.add(30, render=failing_render)
+    assert cache.reels() == [] and os.listdir(cache.cache_dir) == []
+
+def test_build_reel_normalizes_and_grades_once():
+    segments = [ClipSegment("a.mp4", 2.0, 12.0, 0.0), ClipSegment("b.mp4", 0.0, 20.0, 10.0)]
+    graph = " ".join(ffmpeg.compile(build_reel(segments, "reel.mp4")))
+    assert graph.count("fps=30") == 2 and graph.count("eq=") == 1
+    assert "-ss 2.0 -t 10.0 -i a.mp4" in graph
+
+def test_timeline_only_trims_a_graded_reel():
+    stream = video_generator.build_video_timeline(
+        "intro.mp4", ["reel.mp4"], 70.0, require_files=False, clip_durations=[65.0], clips_graded=True
+    )
+    args = ffmpeg.compile(ffmpeg.output(stream, "out.mp4"))
+    graph = " ".join(args)
+    assert "-t 65.0 -i reel.mp4" in graph
+    assert graph.count("eq=") == 1 and "scale" not in graph
+
+def test_reels_are_only_taken_when_enabled(tmp_path, monkeypatch):
+    monkeypatch.delenv("REEL_CACHE", raising=False)
+    monkeypatch.setenv("REEL_CACHE_DIR", str(tmp_path / "cache"))
+    ReelCache(stock=1).add(60, render=fake_render)
+    assert video_generator.find_background_reel(30.0) is None
+    assert video_generator.take_background_reel(30.0, str(tmp_path / "out.mp4")) is None
+    monkeypatch.setenv("REEL_CACHE", "1")
+    # The margin covers the intro narration's measured length
+    assert video_generator.take_background_reel(59.5, str(tmp_path / "out.mp4")) is None
+    assert video_generator.find_background_reel(30.0)["duration"] == 60
+    assert video_generator.take_background_reel(30.0, str(tmp_path / "out.mp4")).endswith("out_reel.mp4")
+    assert ReelCache().reels() == []
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_render_reel_end_to_end(tmp_path):
+    video_dir = tmp_path / "videos"
+    video_dir.mkdir()
+    for name, size in (("a.mp4", "320x240"), ("b.mp4", "640x360")):
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"testsrc2=s={size}:r=25:d=4",
+             "-pix_fmt", "yuv420p", str(video_dir / name)],
+            check=True,
+        )
+    cache = ReelCache(str(tmp_path / "cache"), stock=1)
+    reel = cache.add(6, video_dir=str(video_dir), index_path=str(tmp_path / "index.json"))
+    info = ffmpeg.probe(reel["path"])["streams"][0]
+    assert (info["width"], info["height"]) == (1920, 1080)
+    assert float(info["duration"]) == pytest.approx(6.0, abs=0.1)
+
+def test_fill_cancels_a_reel_when_the_host_gets_busy(tmp_path, monkeypatch):
+    idle = threading.Event()
+    idle.set()
+    monkeypatch.setattr(reel_cache, "host_is_idle", lambda max_load=None, own_load=0.0: idle.is_set())
+
+    def slow_render(duration, output_path, runner_options=None):
+        idle.clear()  # a render job arrives while the reel is being encoded
+        if not runner_options["cancel_event"].wait(5):
+            return fake_render(duration, output_path)
+        raise FFmpegCancelled("reel (cancelled)", b"", b"")
+
+    cache = ReelCache(str(tmp_path / "cache"), stock=1)
+    monkeypatch.setattr(cache, "add", lambda duration, **options: ReelCache.add(cache, duration, render=slow_render, **options))
+    assert reel_cache.fill(cache, durations=(30, 60), check_interval=0.01) == 0
+    assert cache.reels() == [] and os.listdir(cache.cache_dir) == []
@@ -0,0 +1,73 @@
+import json
+import platform
+import pytest
+import clip_planner
+import render_planner
+from clip_planner import ClipSegment
+from render_planner import count_caption_words, estimate_encode_time, plan_timeline, plan_video
+
+def test_timeline_places_segments_after_the_intro():
+    segments = [ClipSegment("a.mp4", 0.0, 20.0, 0.0), ClipSegment("b.mp4", 4.0, 14.0, 20.0)]
+    assert plan_timeline(5.0, segments) == [
+        {"source": "intro", "start": 0.0, "end": 5.0},
+        {"source": "a.mp4", "start": 5.0, "end": 25.0},
+        {"source": "b.mp4", "start": 25.0, "end": 35.0},
+    ]
+
+def test_caption_count_skips_metadata():
+    story = "**Title**\nImage: a dark hallway\n[creak] The door opened.\nNobody was there."
+    assert count_caption_words(story) == 6
+
+def test_plan_video_without_encoding(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_planner, "probe_duration", lambda path, codec_type="audio": 90.0)
+    monkeypatch.setattr(clip_planner, "get_clip", lambda path, index_path=None: {"source_path": path, "duration": 40.0})
+    speeds = {
+        f"{platform.node()}|libx264|medium|1920x1080": 4.0,
+        f"{platform.node()}|libx264|fast|1920x1080": 2.0,
+        f"{platform.node()}|libx264|fast|1080x1920": 2.0,
+    }
+    cache_path = tmp_path / "encoder_speed.json"
+    cache_path.write_text(json.dumps(speeds))
+
+    plan = plan_video(
+        "One two three four.", "a short intro for the card", "voice.wav", "music.mp3", ["a.mp4", "b.mp4"],
+        str(tmp_path / "final.mp4"), renditions=["landscape", "vertical"], measure=False,
+    )
+    json.dumps(plan)
+    assert plan["audio"]["total_seconds"] == round(2.4 + 1.0 + 100.0, 3)
+    assert plan["captions"] == {
+        "count": 4,
+        "layouts": {
+            "landscape": {"play_res": (1920, 1080), "fontsize": 64, "alignment": 5, "margin_v": 0, "stroke_width": 5},
+            "vertical": {"play_res": (1080, 1920), "fontsize": 80, "alignment": 2, "margin_v": 560, "stroke_width": 5},
+        },
+    }
+    # 101 s after the intro card: a.mp4 and b.mp4 in full, then 21 s of a.mp4 again
+    assert [(clip["source_path"], clip["duration"]) for clip in plan["clips"]] == [("a.mp4", 40.0), ("b.mp4", 40.0), ("a.mp4", 21.0)]
+    graph = " ".join(plan["ffmpeg"]["final"])
+    assert "split=2" in graph and str(tmp_path / "final_vertical.mp4") in graph
+
+    estimate = estimate_encode_time(plan, plan["encoder"]["output_args"], str(cache_path))
+    assert estimate["stages"] == {"intro": 0.6, "clips": 25.2, "final": 103.4}
+    assert estimate["total_seconds"] == 129.2
+
+def test_plan_video_with_a_cached_reel(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_planner, "probe_duration", lambda path, codec_type="audio": 90.0)
+    monkeypatch.setattr(clip_planner, "get_clip", lambda path, index_path=None: pytest.fail("clips are not planned when a reel fits"))
+    cache_path = tmp_path / "encoder_speed.json"
+    cache_path.write_text(json.dumps({
+        f"{platform.node()}|libx264|medium|1920x1080": 4.0,
+        f"{platform.node()}|libx264|fast|1920x1080": 2.0,
+    }))
+
+    plan = plan_video(
+        "One two three four.", "a short intro for the card", "voice.wav", "music.mp3", [],
+        str(tmp_path / "final.mp4"), measure=False, reel={"path": str(tmp_path / "reels" / "reel_120s.mp4"), "duration": 120},
+    )
+    assert plan["reel"]["duration"] == 120 and plan["clips"] == []
+    assert plan["timeline"][1] == {"source": plan["reel"]["path"], "start": 2.4, "end": 103.4}
+    graph = " ".join(plan["ffmpeg"]["final"])
+    assert "-t 101.0 -i" in graph and "final_reel.mp4" in graph
+
+    estimate = estimate_encode_time(plan, plan["encoder"]["output_args"], str(cache_path))
+    assert estimate["stages"] == {"intro": 0.6, "final": 51.7}
@@ -0,0 +1,47 @@
+import shutil
+import ffmpeg
+import numpy as np
+import pytest
+import soundfile as sf
+from video_generator import RENDITIONS, build_rendition_outputs, caption_layout, crop_to_aspect, encode_final, rendition_output_path
+
+def test_crop_to_aspect_centers_the_largest_crop():
+    assert crop_to_aspect((1920, 1080), (1080, 1920)) == (608, 1080, 656, 0)
+    assert crop_to_aspect((1920, 1080), (1280, 720)) == (1920, 1080, 0, 0)
+
+def test_vertical_captions_sit_at_the_same_relative_height():
+    layouts = [caption_layout(name, 64) for name in ("vertical", "vertical_720")]
+    heights = [layout["margin_v"] / layout["play_res"][1] for layout in layouts]
+    assert heights[0] == pytest.approx(heights[1], abs=0.005)
+    assert [layout["fontsize"] / layout["play_res"][1] for layout in layouts] == pytest.approx([80 / 1920] * 2, abs=0.001)
+    assert [layout["stroke_width"] for layout in layouts] == [5, 3]
+
+def test_renditions_share_one_decode():
+    video = ffmpeg.input("timeline.mp4").video.filter("eq", contrast=1.1)
+    audio = ffmpeg.input("mix.wav").audio.filter("atempo", 0.9)
+    paths = {name: rendition_output_path("out/video.mp4", name) for name in ["landscape", "vertical", "vertical_720"]}
+    args = ffmpeg.compile(build_rendition_outputs(video, audio, paths, {"c:v": "libx264"}, {"vertical": "out/video_vertical.ass"}))
+
+    graph = args[args.index("-filter_complex") + 1]
+    assert args.count("-i") == 2
+    assert graph.count("eq=") == 1 and "split=3" in graph and "asplit=3" in graph
+    assert "scale=1080:1920" in graph and "scale=720:1280" in graph
+    assert graph.count("subtitles=") == 1
+    assert [arg for arg in args if arg.endswith(".mp4")][-3:] == ["out/video.mp4", "out/video_vertical.mp4", "out/video_vertical_720.mp4"]
+    vertical_args = args[args.index("out/video.mp4") + 1:args.index("out/video_vertical.mp4")]
+    assert vertical_args[vertical_args.index("-bufsize") + 1] == RENDITIONS["vertical"]["bufsize"]
+    assert "-bufsize" not in args[:args.index("out/video.mp4")]
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg binary not available")
+def test_encode_final_writes_every_rendition(tmp_path):
+    audio_path = tmp_path / "mix.wav"
+    sf.write(audio_path, np.zeros(24000, dtype=np.float32), 24000)
+    video = ffmpeg.input("color=red:s=1920x1080:d=1", f="lavfi").video
+    paths = {name: str(tmp_path / f"{name}.mp4") for name in ["landscape", "vertical"]}
+
+    encode_final(video, ffmpeg.input(str(audio_path)).audio, paths, {"c:v": "libx264", "preset": "ultrafast"}, 1.0)
+    sizes = {}
+    for name, path in paths.items():
+        stream = next(s for s in ffmpeg.probe(path)["streams"] if s["codec_type"] == "video")
+        sizes[name] = (stream["width"], stream["height"])
+    assert sizes == {"landscape": (1920, 1080), "vertical": (1080, 1920)}
@@ -0,0 +1,30 @@
+import shutil
+import ffmpeg
+import numpy as np
+import pytest
+import soundfile as sf
+from PIL import Image
+from short_renderer import build_short_timeline, render_short
+
+def test_timeline_uses_ffmpeg_expressions_for_each_animation():
+    stream = build_short_timeline(["a.png", "b.png", "c.png"], 9.0, animations=["zoom_in", "pan_left", "pan_right"])
+    args = " ".join(ffmpeg.compile(ffmpeg.output(stream, "out.mp4")))
+    assert "zoompan=" in args and "on/72" in args
+    assert "100*(t/3.0)" in args and "100*(1-(t/3.0))" in args
+    assert "concat=a=0:n=3:v=1" in args
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg binary not available")
+def test_render_short_single_encode(tmp_path):
+    image_paths = []
+    for i, color in enumerate(["red", "blue"]):
+        path = tmp_path / f"image_{i}.png"
+        Image.new("RGB", (640, 360), color).save(path)
+        image_paths.append(str(path))
+    audio_path = tmp_path / "voice.wav"
+    sf.write(audio_path, np.zeros(24000 * 2, dtype=np.float32), 24000)
+    words = [{"word": "hello", "start": 0.2, "end": 0.6}, {"word": "there", "start": 0.7, "end": 1.1}]
+
+    output_path = render_short(image_paths, str(audio_path), words, str(tmp_path / "short.mp4"))
+    video = next(s for s in ffmpeg.probe(output_path)["streams"] if s["codec_type"] == "video")
+    assert (video["width"], video["height"]) == (1920, 1080)
+    assert not (tmp_path / "short.ass").exists()
@@ -0,0 +1,19 @@
+import json
+import pytest
+from story_generator import parse_story_package
+
+def test_parse_story_package_limits_intro():
+    text = json.dumps({"story": "It happened at night.", "intro": " ".join(["word"] * 30), "thumbnail_text": "Post text"})
+    package = parse_story_package(text)
+    assert package["story"] == "It happened at night."
+    assert len(package["intro"].split()) == 20
+    assert package["thumbnail_text"] == "Post text"
+
+def test_parse_story_package_defaults_thumbnail_to_intro():
+    package = parse_story_package(json.dumps({"story": "Story.", "intro": "Hook."}))
+    assert package["thumbnail_text"] == "Hook."
+
+@pytest.mark.parametrize("text", ['{"story": "", "intro": "Hook."}', '["story"]', "not json"])
+def test_parse_story_package_rejects_unusable_responses(text):
+    with pytest.raises(ValueError):
+        parse_story_package(text)
@@ -0,0 +1,43 @@
+import pysbd
+from story_text import IncrementalSentenceSplitter, clean_story_line, is_metadata_line
+
+STORY = """**1️⃣ Post-style Intro**
+
+Image: A blurry, rain-soaked street at night.
+
+[NARRATOR]: It was a Tuesday, the kind that soaked your bones.
+[sound of rain] I was running, late again. The heels of my shoes clicked on the pavement! Was anyone following?
+# Scene two
+My coworker, Mark, leaned against my desk 😊. He held a crumpled piece of paper. "Well, well," he said.
+"""
+
+def batch_sentences(text):
+    """What extract_story_text + pysbd produce for the whole story at once."""
+    lines = [clean_story_line(l) for l in text.splitlines() if l.strip() and not is_metadata_line(l)]
+    narration = " ".join(l for l in lines if l)
+    return [s.strip() for s in pysbd.Segmenter(language="en", clean=False).segment(narration) if s.strip()]
+
+def stream_sentences(text, chunk_size):
+    splitter = IncrementalSentenceSplitter()
+    sentences = []
+    for i in range(0, len(text), chunk_size):
+        sentences.extend(splitter.feed(text[i:i + chunk_size]))
+    return sentences + splitter.flush()
+
+def test_streamed_sentences_match_batch_segmentation():
+    expected = batch_sentences(STORY)
+    for chunk_size in (1, 3, 7, 16, 64, len(STORY)):
+        assert stream_sentences(STORY, chunk_size) == expected, chunk_size
+
+def test_sentences_are_released_before_the_line_ends():
+    splitter = IncrementalSentenceSplitter()
+    released = splitter.feed("The door creaked open. Then the lights went out. And some")
+    assert released == ["The door creaked open."]
+    assert splitter.feed(" more") == []
+    assert splitter.flush() == ["Then the lights went out.", "And some more"]
+
+def test_metadata_lines_are_never_released():
+    splitter = IncrementalSentenceSplitter()
+    assert splitter.feed("[NARRATOR]: Secret line. Still secret. ") == []
+    assert splitter.feed("\nImage: A picture. Of things. ") == []
+    assert splitter.flush() == []
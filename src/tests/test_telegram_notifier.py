@@ -0,0 +1,55 @@
+import threading
+import time
+import utils.telegram_notifier as telegram_notifier
+from utils.telegram_notifier import NotificationQueue, TELEGRAM_MAX_LENGTH
+
+def test_burst_is_coalesced_into_one_message():
+    sent = []
+    notifications = NotificationQueue(sent.append, coalesce_seconds=0.2)
+    for i in range(3):
+        notifications.put(f"message {i}")
+    assert notifications.flush(5)
+    assert len(sent) == 1
+    assert all(f"message {i}" in sent[0] for i in range(3))
+
+def test_long_bursts_are_split_at_the_telegram_limit():
+    sent = []
+    notifications = NotificationQueue(sent.append, coalesce_seconds=0.2)
+    for _ in range(3):
+        notifications.put("x" * 3000)
+    assert notifications.flush(5)
+    assert len(sent) == 3
+    assert all(len(text) <= TELEGRAM_MAX_LENGTH for text in sent)
+
+def test_slow_endpoint_never_blocks_the_caller():
+    release = threading.Event()
+    sent = []
+
+    def slow_send(text):
+        release.wait(5)
+        sent.append(text)
+
+    notifications = NotificationQueue(slow_send, max_size=2, coalesce_seconds=0.0)
+    start = time.monotonic()
+    results = [notifications.put(f"message {i}") for i in range(10)]
+    assert time.monotonic() - start < 0.5
+    assert not all(results)  # the bounded queue dropped the overflow
+
+    release.set()
+    assert notifications.flush(5)
+    assert any("dropped" in text for text in sent)
+
+def test_oversize_messages_and_location_fit_the_telegram_limit(monkeypatch):
+    sent = []
+    monkeypatch.setattr(telegram_notifier, "_notifier", type("Fake", (), {"send_message": lambda self, text: sent.append(text)})())
+    monkeypatch.setattr(telegram_notifier, "get_ip_info", lambda: "203.0.113.7 (Reykjavik, IS)")
+    notifications = NotificationQueue(
+        telegram_notifier._send_with_location, coalesce_seconds=0.2,
+        max_length=TELEGRAM_MAX_LENGTH - telegram_notifier.LOCATION_RESERVE,
+    )
+    notifications.put("line\n" * 1000 + "y" * 5000)  # one message longer than the limit
+    notifications.put("z" * (TELEGRAM_MAX_LENGTH - 100))  # fits alone, but not with the suffix unreserved
+    assert notifications.flush(5)
+    assert all(len(text) <= TELEGRAM_MAX_LENGTH and text.endswith("(Reykjavik, IS)") for text in sent)
+    body = "".join(text.rsplit("\n📍", 1)[0] for text in sent)
+    assert body.count("y") == 5000 and body.count("z") == TELEGRAM_MAX_LENGTH - 100
@@ -1,7 +1,7 @@
 import asyncio
 import os
 import pytest
-from src.thumbnail_generator import generate_image_from_text
+from src.thumbnail_generator import generate_image_from_text, generate_platform_variants
 
 @pytest.mark.asyncio
 async def test_generate_x_thumbnail():
@@ -74,4 +74,82 @@ async def test_generate_random_thumbnail():
     
     assert os.path.exists(output_path)
     assert os.path.getsize(output_path) > 0
-    os.remove(output_path) # Clean up the generated file
\ No newline at end of file
+    os.remove(output_path) # Clean up the generated file
+
+@pytest.mark.asyncio
+async def test_generate_platform_variants_in_one_browser():
+    """
+    Tests the batch API: one post rendered for every platform concurrently.
+    """
+    output_dir = "output/generatedThumbnail"
+    paths = await generate_platform_variants("A batch test post!", output_dir, basename="test_variant")
+
+    assert set(paths) == {"x", "facebook"}
+    for path in paths.values():
+        assert os.path.exists(path)
+        assert os.path.getsize(path) > 0
+        os.remove(path) # Clean up the generated file
+
+class FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def set_content(self, html):
+        if not self.browser.connected:
+            raise RuntimeError("Target closed")
+
+    async def wait_for_selector(self, selector):
+        return None
+
+    async def screenshot(self, path, clip=None):
+        open(path, "wb").close()
+
+    async def close(self):
+        self.closed = True
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.pages = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, viewport):
+        return self
+
+    async def new_page(self):
+        self.pages.append(FakePage(self))
+        return self.pages[-1]
+
+def test_pages_of_a_dead_browser_are_not_reused(tmp_path):
+    from src.thumbnail_generator import BrowserPool
+
+    browsers = []
+
+    async def launch():
+        browsers.append(FakeBrowser())
+        return browsers[-1]
+
+    async def scenario():
+        pool = BrowserPool(size=2)
+        pool._playwright = type("Playwright", (), {"chromium": type("Chromium", (), {"launch": staticmethod(launch)})})()
+        await pool.render("<p>", ".card", str(tmp_path / "a.png"))
+        browsers[0].connected = False  # Chromium crashed
+        for name in ("b.png", "c.png", "d.png"):
+            await pool.render("<p>", ".card", str(tmp_path / name))
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert len(browsers) == 2
+    assert all(page.browser is browsers[1] for _, page in pool._pages._queue)
+    assert all(page.closed for page in browsers[0].pages)
+
+def test_local_avatar_is_inlined(tmp_path):
+    from src.thumbnail_generator import build_post_html
+
+    avatar = tmp_path / "me.png"
+    avatar.write_bytes(b"\x89PNG\r\n\x1a\nfake")
+    html, _ = build_post_html("Hello", "x", profile_pic_path=str(avatar))
+    assert "data:image/png;base64," in html and str(avatar) not in html
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+import voice_generator
+from artifacts import load_audio
+
+class FakeKokoro:
+    voices = {"af_heart": None}
+
+    def create(self, text, voice, speed, lang):
+        return np.zeros(2400, dtype=np.float32), 24000
+
+@pytest.fixture
+def kokoro(monkeypatch):
+    monkeypatch.setattr(voice_generator, "get_kokoro", lambda: FakeKokoro())
+
+def test_stream_returns_the_audio_it_wrote(tmp_path, kokoro):
+    path = str(tmp_path / "voice.wav")
+    story, audio = voice_generator.generate_voice_from_stream(
+        iter(["One sentence here. Ano", "ther one follows."]), path, voice="af_heart"
+    )
+    assert story == "One sentence here. Another one follows."
+    assert audio.duration == pytest.approx(0.2) and audio.params["voice"] == "af_heart"
+    loaded = load_audio(path)
+    assert (loaded.duration, loaded.sample_rate, loaded.content_hash) == (audio.duration, audio.sample_rate, audio.content_hash)
+
+def test_a_failed_stream_leaves_no_partial_wav(tmp_path, kokoro):
+    path = tmp_path / "voice.wav"
+
+    def chunks():
+        yield "First sentence. Second sentence. Third "
+        raise ConnectionError("stream dropped")
+
+    with pytest.raises(ConnectionError):
+        voice_generator.generate_voice_from_stream(chunks(), str(path), voice="af_heart")
+    assert not path.exists()
@@ -1,7 +1,16 @@
 import asyncio
-from playwright.async_api import async_playwright
+import atexit
+import base64
+import mimetypes
 import os
 import random
+from utils.background_loop import BackgroundLoop
+from post_card_renderer import render_post_card
+
+VIEWPORT = {"width": 1280, "height": 720} # A reasonable viewport size
+PLATFORMS = ("x", "facebook")
+# THUMBNAIL_RENDERER: playwright (HTML templates in Chromium) or pillow (post_card_renderer, no browser)
+RENDERERS = ("playwright", "pillow")
 
 def format_number(num):
     if num >= 1_000_000:
@@ -10,9 +19,38 @@ def format_number(num):
         return f"{round(num / 1_000, 1)}K"
     return str(num)
 
-async def generate_image_from_text(
+def resolve_post_options(platform: str = None, likes: str = None, comments: str = None, shares: str = None):
+    """
+    Fills in a random platform and random high counts for anything not provided.
+    """
+    if platform is None:
+        platform = random.choice(["x", "facebook"])
+
+    # Generate random high numbers if not provided
+    if likes is None:
+        likes = format_number(random.randint(20000, 100000))
+    if comments is None:
+        comments = format_number(random.randint(1000, 10000))
+    if shares is None:
+        shares = format_number(random.randint(500, 5000))
+    return platform, likes, comments, shares
+
+def avatar_url(profile_pic_path: str):
+    """
+    CSS url for the avatar. Pages render from about:blank (set_content), which
+    can't load local files, so a local picture is inlined as a data URI.
+    """
+    if not profile_pic_path:
+        return None
+    local_path = profile_pic_path[len("file://"):] if profile_pic_path.startswith("file://") else profile_pic_path
+    if not os.path.isfile(local_path):
+        return profile_pic_path  # a web URL
+    mime_type = mimetypes.guess_type(local_path)[0] or "image/png"
+    with open(local_path, "rb") as f:
+        return f"data:{mime_type};base64,{base64.b64encode(f.read()).decode('ascii')}"
+
+def build_post_html(
     text_content: str,
-    output_path: str,
     platform: str = None,
     profile_pic_path: str = None,
     username: str = "User Name",
@@ -23,19 +61,11 @@ async def generate_image_from_text(
     shares: str = None
 ):
     """
-    Generates an image with text content using Playwright to render HTML and take a screenshot.
+    Returns (html, card selector) for a post.
     Randomly selects between X and Facebook templates if platform is not specified.
     """
-    if platform is None:
-        platform = random.choice(["x", "facebook"])
-
-    # Generate random high numbers if not provided
-    if likes is None:
-        likes = format_number(random.randint(20000, 100000))
-    if comments is None:
-        comments = format_number(random.randint(1000, 10000))
-    if shares is None:
-        shares = format_number(random.randint(500, 5000))
+    platform, likes, comments, shares = resolve_post_options(platform, likes, comments, shares)
+    profile_pic_path = avatar_url(profile_pic_path)
 
     if platform == "x":
         html_template = f"""
@@ -292,44 +322,165 @@ async def generate_image_from_text(
     else:
         raise ValueError(f"Unsupported platform: {platform}. Choose 'x' or 'facebook'.")
 
-    # Create a temporary HTML file
-    temp_html_path = "temp_post.html"
-    with open(temp_html_path, "w", encoding="utf-8") as f:
-        f.write(html_template)
+    selector = ".tweet-card" if platform == "x" else ".fb-card"
+    return html_template, selector
+
+class BrowserPool:
+    """
+    One long-lived Chromium with a shared context and a pool of reusable pages.
+    Only used from the thumbnail BackgroundLoop, since Playwright objects are
+    bound to the event loop that created them.
+
+    Pages are tagged with the browser generation that made them. After a
+    relaunch (the browser disconnected), pages of the old browser are closed
+    instead of being handed out or returned to the pool.
+    """
+    def __init__(self, size: int = None):
+        self.size = size or int(os.environ.get("THUMBNAIL_PAGES", "4"))
+        self._playwright = None
+        self._browser = None
+        self._pages = None
+        self._generation = 0
+        self._start_lock = asyncio.Lock()
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch()
-        page = await browser.new_page()
-        await page.set_viewport_size({"width": 1280, "height": 720}) # Set a reasonable viewport size
-        await page.goto(f"file://{os.path.abspath(temp_html_path)}")
-        
-        # Wait for the content to be fully rendered
-        selector = ".tweet-card" if platform == "x" else ".fb-card"
-        await page.wait_for_selector(selector)
+    async def _ensure_started(self):
+        async with self._start_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch()
+            self._generation += 1
+            context = await self._browser.new_context(viewport=VIEWPORT)
+            if self._pages is None:
+                self._pages = asyncio.Queue()
+            for _ in range(self.size):
+                self._pages.put_nowait((self._generation, await context.new_page()))
 
-        # Get the bounding box of the element
-        post_card_element = await page.query_selector(selector)
-        if post_card_element:
-            bounding_box = await post_card_element.bounding_box()
+    async def _discard(self, page):
+        try:
+            await page.close()
+        except Exception:
+            pass  # its browser is already gone
+
+    async def _get_page(self):
+        while True:
+            generation, page = await self._pages.get()
+            if generation == self._generation:
+                return generation, page
+            await self._discard(page)
+
+    async def render(self, html: str, selector: str, output_path: str):
+        await self._ensure_started()
+        generation, page = await self._get_page()
+        try:
+            await page.set_content(html)
+
+            # Wait for the content to be fully rendered
+            post_card_element = await page.wait_for_selector(selector)
+
+            # Get the bounding box of the element
+            bounding_box = await post_card_element.bounding_box() if post_card_element else None
             if bounding_box:
                 await page.screenshot(path=output_path, clip=bounding_box)
             else:
-                await page.screenshot(path=output_path) # Fallback if bounding box not found
-        else:
-            await page.screenshot(path=output_path) # Fallback if element not found
+                await page.screenshot(path=output_path) # Fallback if element or bounding box not found
+        finally:
+            if generation == self._generation and self._browser.is_connected():
+                self._pages.put_nowait((generation, page))
+            else:
+                await self._discard(page)
 
-        await browser.close()
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
 
-    # Clean up the temporary HTML file
-    os.remove(temp_html_path)
+_browser_loop = BackgroundLoop("thumbnail-browser")
+_browser_pool = None
+
+async def _render_post(html: str, selector: str, output_path: str):
+    global _browser_pool
+    if _browser_pool is None:
+        _browser_pool = BrowserPool()
+    await _browser_pool.render(html, selector, output_path)
+
+async def generate_image_from_text(
+    text_content: str,
+    output_path: str,
+    platform: str = None,
+    profile_pic_path: str = None,
+    username: str = "User Name",
+    handle: str = "@username",
+    time_ago: str = "1h",
+    likes: str = None,
+    comments: str = None,
+    shares: str = None,
+    renderer: str = None
+):
+    """
+    Generates an image with text content using Playwright to render HTML and take a screenshot.
+    Randomly selects between X and Facebook templates if platform is not specified.
+    Pages come from the shared browser pool, so only the first call starts Chromium.
+    renderer="pillow" (or THUMBNAIL_RENDERER=pillow) draws the same card with Pillow instead.
+    """
+    renderer = (renderer or os.environ.get("THUMBNAIL_RENDERER", "playwright")).lower()
+    if renderer not in RENDERERS:
+        raise ValueError(f"Unsupported thumbnail renderer: {renderer}. Choose one of {RENDERERS}.")
+    platform, likes, comments, shares = resolve_post_options(platform, likes, comments, shares)
+
+    if renderer == "pillow":
+        render_post_card(platform, text_content, output_path, profile_pic_path, username, handle, time_ago, likes, comments, shares)
+    else:
+        html, selector = build_post_html(
+            text_content, platform, profile_pic_path, username, handle, time_ago, likes, comments, shares
+        )
+        await _browser_loop.wrap(_render_post(html, selector, output_path))
     print(f"Image generated and saved to: {output_path}")
+    return output_path
+
+def generate_image_from_text_sync(*args, **kwargs):
+    """generate_image_from_text for synchronous callers (keeps the pooled browser warm across calls)."""
+    return _browser_loop.run(generate_image_from_text(*args, **kwargs))
+
+async def generate_images_from_texts(jobs: list) -> list:
+    """
+    Renders many thumbnails concurrently in the pooled browser. Each job is a dict of
+    generate_image_from_text keyword arguments. Returns the output paths in job order.
+    """
+    return list(await asyncio.gather(*(generate_image_from_text(**job) for job in jobs)))
+
+async def generate_platform_variants(text_content: str, output_dir: str, basename: str = "thumbnail",
+                                     platforms: tuple = PLATFORMS, **post_options) -> dict:
+    """
+    Renders the same post for every platform, e.g. {"x": ".../thumbnail_x.png", "facebook": ...}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [
+        dict(text_content=text_content, output_path=os.path.join(output_dir, f"{basename}_{platform}.png"),
+             platform=platform, **post_options)
+        for platform in platforms
+    ]
+    return dict(zip(platforms, await generate_images_from_texts(jobs)))
+
+def close_browser_pool():
+    """Closes the pooled browser (also registered to run at exit)."""
+    global _browser_pool
+    if _browser_pool is not None:
+        _browser_loop.run(_browser_pool.close(), timeout=10)
+    _browser_pool = None
+    _browser_loop.stop()
+
+atexit.register(close_browser_pool)
 
 if __name__ == "__main__":
     # Example usage:
     sample_text = "This is a sample post with some emojis! 😊✨\n\nIt should automatically resize based on the content length and line breaks."
-    output_file_x = "output/generatedVideo/x_post_image.png"
-    output_file_fb = "output/generatedVideo/fb_post_image.png"
     
-    asyncio.run(generate_image_from_text(sample_text, output_file_x, platform="x"))
-    asyncio.run(generate_image_from_text(sample_text, output_file_fb, platform="facebook"))
-    asyncio.run(generate_image_from_text(sample_text, "output/generatedVideo/random_post_image.png")) # Random platform
+    # X and Facebook variants rendered concurrently in one browser
+    asyncio.run(generate_platform_variants(sample_text, "output/generatedVideo", basename="post_image"))
+    generate_image_from_text_sync(sample_text, "output/generatedVideo/random_post_image.png") # Random platform
@@ -1,51 +1,43 @@
 import json
 import os
+import threading
 import wave
-import vosk
-from zipfile import ZipFile
+from functools import lru_cache
 import requests
-import shutil
+from model_registry import ensure_asset
+
+_vosk_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def _load_vosk_model(model_path: str):
+    import vosk
+    return vosk.Model(model_path)
+
+def load_vosk_model(model_path: str):
+    """
+    Loads the Vosk model once per process. Thread-safe, so the prefetch
+    warm-up and get_word_timestamps never build it twice.
+    """
+    with _vosk_lock:
+        return _load_vosk_model(model_path)
 
 def get_word_timestamps(audio_path: str):
     """
     Transcribes an audio file and returns word-level timestamps.
     Downloads the Vosk model if it's not already present.
     """
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(current_dir) # Go up one level from 'src' to the project root
-    model_path = os.path.join(project_root, "data", "models", "vosk-model-small-en-us-0.15")
-    model_zip_name = "vosk-model-small-en-us-0.15.zip"
-    model_url = f"https://alphacephei.com/vosk/models/{model_zip_name}"
-
-    # Download and extract the model if it doesn't exist
-    if not os.path.exists(model_path):
-        print(f"Vosk model not found. Downloading from {model_url}...")
-        try:
-            # Ensure the data/models directory exists for the zip file
-            os.makedirs(os.path.dirname(model_path), exist_ok=True)
-            model_zip_full_path = os.path.join(os.path.dirname(model_path), model_zip_name)
-
-            with requests.get(model_url, stream=True) as r:
-                r.raise_for_status()
-                with open(model_zip_full_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            
-            print("Model downloaded. Extracting...")
-            with ZipFile(model_zip_full_path, 'r') as zip_ref:
-                zip_ref.extractall(os.path.dirname(model_path)) # Extract to data/models
-            
-            os.remove(model_zip_full_path)
-            print("Model extracted successfully.")
-        except requests.exceptions.RequestException as e:
-            print(f"Error downloading model: {e}")
-            return None
-        except Exception as e:
-            print(f"An error occurred during model setup: {e}")
-            return None
+    try:
+        model_path = ensure_asset("vosk")
+    except requests.exceptions.RequestException as e:
+        print(f"Error downloading model: {e}")
+        return None
+    except Exception as e:
+        print(f"An error occurred during model setup: {e}")
+        return None
 
     try:
-        model = vosk.Model(model_path)
+        import vosk
+        model = load_vosk_model(model_path)
         wf = wave.open(audio_path, "rb")
         
         if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running forever in a daemon thread.
+
+    Long-lived async resources (gRPC channels, browsers) are bound to the loop
+    that created them, so they can't survive the fresh loop every asyncio.run()
+    makes. Owning one loop lets them be reused from sync code (run) and from
+    any other event loop (wrap).
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                started = threading.Event()
+
+                def run_forever():
+                    self._loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(self._loop)
+                    started.set()
+                    self._loop.run_forever()
+
+                self._thread = threading.Thread(target=run_forever, name=self.name, daemon=True)
+                self._thread.start()
+                started.wait()
+            return self._loop
+
+    def submit(self, coro):
+        """Schedules a coroutine on the loop and returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """Runs a coroutine on the loop and blocks until it finishes."""
+        return self.submit(coro).result(timeout)
+
+    async def wrap(self, coro):
+        """Awaits a coroutine on the loop from any other running event loop."""
+        try:
+            if asyncio.get_running_loop() is self._loop:
+                return await coro
+        except RuntimeError:
+            pass
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def stop(self):
+        with self._lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._loop.close()
+            self._loop = None
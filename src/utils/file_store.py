@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: callers' threading locks still apply within one process
+    fcntl = None
+
+# -------------------------------
+# Shared JSON indexes
+# -------------------------------
+# Render workers, the reel filler and main.py can be separate processes on the
+# same storage. An index update is a read-modify-write, so it runs under an
+# exclusive flock on "<index>.lock"; the new index is written to a unique temp
+# file and renamed over the old one, so readers never see a partial file.
+
+@contextmanager
+def locked(path: str):
+    """Holds an exclusive lock (across processes) for read-modify-writes of `path`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_json_atomic(path: str, data, **dump_options):
+    """Writes JSON through a unique temp file in the same directory, then renames it over `path`."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_options)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -1,31 +1,170 @@
+import atexit
+import contextlib
+import contextvars
+import json
 import logging
+import os
+import queue
 import sys
-from logging.handlers import TimedRotatingFileHandler
+import threading
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+# -------------------------------
+# Logging setup
+# -------------------------------
+# Callers only put records on a queue (QueueHandler); a QueueListener thread
+# formats them and does the console/file I/O. Every record carries the run ID
+# and the pipeline stage. The file gets one JSON object per line.
+#
+# Verbose records (extra={"verbose": True}, e.g. ffmpeg stderr lines) are
+# sampled per stage before they are queued: the first LOG_SAMPLE_HEAD lines of
+# a stage are kept, then one in every LOG_SAMPLE_EVERY. Warnings and errors are
+# never sampled. Verbose records only go to the file, never to the console.
+# Entering a stage (set_stage/log_stage, e.g. each job a stage worker runs)
+# starts a fresh sample budget for every stage.
+
+RUN_ID = os.environ.get("ZAKUTO_RUN_ID") or uuid.uuid4().hex[:12]
+_current_stage = contextvars.ContextVar("log_stage", default="-")
+
+def set_stage(stage: str):
+    """Sets the stage recorded on log records from this thread/task."""
+    _current_stage.set(stage)
+    _reset_sampling()
+
+@contextlib.contextmanager
+def log_stage(stage: str):
+    """Records logged inside the block carry `stage`."""
+    token = _current_stage.set(stage)
+    _reset_sampling()
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+class RunContextFilter(logging.Filter):
+    """Adds run_id and stage (unless given via extra=) to every record."""
+    def filter(self, record):
+        record.run_id = RUN_ID
+        if not getattr(record, "stage", None):
+            record.stage = _current_stage.get()
+        return True
+
+class StageSampler(logging.Filter):
+    """Keeps the first `head` verbose records per stage, then one in every `every`."""
+    def __init__(self, head: int = 20, every: int = 100):
+        super().__init__()
+        self.head = head
+        self.every = every
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def filter(self, record):
+        if not getattr(record, "verbose", False) or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            count = self._counts.get(record.stage, 0) + 1
+            self._counts[record.stage] = count
+        if count <= self.head:
+            return True
+        if self.every and (count - self.head) % self.every == 0:
+            record.sampled = count  # number of verbose lines seen so far in this stage
+            return True
+        return False
+
+class ConsoleFilter(logging.Filter):
+    """Keeps verbose records below WARNING off the console (they stay in the file)."""
+    def filter(self, record):
+        return not getattr(record, "verbose", False) or record.levelno >= logging.WARNING
+
+# Attributes every LogRecord has; anything else was passed via extra= and goes into the JSON
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "run_id", "stage", "verbose"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "run_id": record.run_id,
+            "stage": record.stage,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """Drops records instead of blocking or erroring when the log queue is full."""
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener = None
+_sampler = None
+
+def _reset_sampling():
+    if _sampler is not None:
+        _sampler.reset()
 
 def setup_logger():
+    global _listener, _sampler
     logger = logging.getLogger("ZAKUTO_Logger")
     logger.setLevel(logging.INFO)
 
     # Prevent duplicate logs if logger is already configured
     if logger.hasHandlers():
         logger.handlers.clear()
-
-    # Formatter
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    if _listener is not None:
+        _listener.stop()
 
     # Console Handler
     stdout_handler = logging.StreamHandler(sys.stdout)
     stdout_handler.setLevel(logging.INFO)
-    stdout_handler.setFormatter(formatter)
-    logger.addHandler(stdout_handler)
+    stdout_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - [%(stage)s] %(message)s'))
+    stdout_handler.addFilter(ConsoleFilter())
 
-    # File Handler
-    file_handler = TimedRotatingFileHandler('logs/ZAKUTO.log', when='midnight', interval=1, backupCount=7)
+    # File Handler (JSON lines)
+    os.makedirs('logs', exist_ok=True)
+    file_handler = TimedRotatingFileHandler('logs/ZAKUTO.log', when='midnight', interval=1, backupCount=7, encoding='utf-8')
     file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    file_handler.setFormatter(JsonFormatter())
+
+    # Callers only enqueue; the listener thread does the formatting and I/O
+    log_queue = queue.Queue(maxsize=int(os.environ.get("LOG_QUEUE_SIZE", "10000")))
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RunContextFilter())
+    _sampler = StageSampler(
+        head=int(os.environ.get("LOG_SAMPLE_HEAD", "20")),
+        every=int(os.environ.get("LOG_SAMPLE_EVERY", "100")),
+    )
+    queue_handler.addFilter(_sampler)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
 
+    _listener = QueueListener(log_queue, stdout_handler, file_handler, respect_handler_level=True)
+    _listener.start()
     return logger
 
+def flush_logs():
+    """Stops the listener after it has written every queued record (run at exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(flush_logs)
+
 # Global logger instance
 logger = setup_logger()
@@ -1,8 +1,43 @@
+import atexit
+import os
+import queue
+import threading
+import time
 import requests
 from utils.config_data import get_telegram_token, get_telegram_chat_id
 
+# -------------------------------
+# Background delivery
+# -------------------------------
+# notify() only formats the message and puts it on a bounded queue; a daemon
+# thread does the IP lookup (cached) and the HTTP calls on a reused session.
+# Messages arriving within TELEGRAM_COALESCE_SECONDS of each other go out as
+# one Telegram message. When the queue is full new messages are dropped, so a
+# slow or unreachable Telegram never blocks the pipeline.
+TELEGRAM_MAX_LENGTH = 4096
+MESSAGE_SEPARATOR = "\n\n──────────\n\n"
+# Room kept in every batch for the "📍 Location" line _send_with_location appends
+LOCATION_RESERVE = 160
+
+def split_message(text: str, max_length: int) -> list:
+    """Splits text into parts of at most max_length, at line breaks where possible."""
+    parts = []
+    while len(text) > max_length:
+        cut = text.rfind("\n", 0, max_length + 1)
+        if cut <= 0:
+            cut = max_length
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return parts
+
+_ip_info = None
+
 def get_ip_info():
-    """Fetches public IP and location information."""
+    """Fetches public IP and location information (looked up once per process)."""
+    global _ip_info
+    if _ip_info is not None:
+        return _ip_info
     try:
         response = requests.get("https://ipinfo.io/json", timeout=5)
         response.raise_for_status()
@@ -10,18 +45,21 @@ def get_ip_info():
         ip = data.get("ip", "N/A")
         city = data.get("city", "N/A")
         country = data.get("country", "N/A")
-        return f"{ip} ({city}, {country})"
+        _ip_info = f"{ip} ({city}, {country})"
+        return _ip_info
     except requests.exceptions.RequestException:
         return "Could not retrieve IP info"
 
 class TelegramNotifier:
-    def __init__(self):
+    def __init__(self, timeout: float = None):
         self.token = get_telegram_token()
         self.chat_id = get_telegram_chat_id()
         if not self.token or "YOUR_TELEGRAM_BOT_TOKEN" in self.token:
             raise ValueError("Telegram token is not configured in src/utils/config_data.py")
         if not self.chat_id or "YOUR_TELEGRAM_CHAT_ID" in self.chat_id:
             raise ValueError("Telegram chat ID is not configured in src/utils/config_data.py")
+        self.timeout = timeout or float(os.environ.get("TELEGRAM_TIMEOUT", "10"))
+        self.session = requests.Session()  # keeps the connection to api.telegram.org alive
 
     def send_message(self, message):
         url = f"https://api.telegram.org/bot{self.token}/sendMessage"
@@ -31,14 +69,117 @@ class TelegramNotifier:
             "parse_mode": "Markdown",
         }
         try:
-            response = requests.post(url, params=params)
+            response = self.session.post(url, params=params, timeout=self.timeout)
             response.raise_for_status()
         except requests.exceptions.RequestException as e:
             print(f"Error sending message to Telegram: {e}")
 
+class NotificationQueue:
+    """
+    Bounded queue drained by one daemon thread. `send` is called with the
+    combined text of every message that arrived within `coalesce_seconds`.
+    """
+    def __init__(self, send, max_size: int = 100, coalesce_seconds: float = 1.0, max_length: int = TELEGRAM_MAX_LENGTH):
+        self.send = send
+        self.coalesce_seconds = coalesce_seconds
+        self.max_length = max_length
+        self.queue = queue.Queue(maxsize=max_size)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+        self._thread.start()
+
+    def put(self, message: str) -> bool:
+        """Queues a message without blocking. Returns False if it was dropped."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _collect(self) -> list:
+        messages = [self.queue.get()]
+        deadline = time.monotonic() + self.coalesce_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                messages.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return messages
+
+    def _batches(self, messages: list) -> list:
+        """Joins messages into as few texts of at most max_length as possible; longer messages are split."""
+        batches, current = [], ""
+        for message in messages:
+            for part in split_message(message, self.max_length):
+                candidate = f"{current}{MESSAGE_SEPARATOR}{part}" if current else part
+                if current and len(candidate) > self.max_length:
+                    batches.append(current)
+                    current = part
+                else:
+                    current = candidate
+        batches.append(current)
+        return batches
+
+    def _run(self):
+        while True:
+            messages = self._collect()
+            received = len(messages)
+            if self.dropped:
+                messages.append(f"⚠️ {self.dropped} notification(s) dropped, queue was full.")
+                self.dropped = 0
+            try:
+                for text in self._batches(messages):
+                    self.send(text)
+            except Exception as e:
+                print(f"Error sending Telegram notification: {e}")
+            finally:
+                for _ in range(received):
+                    self.queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Waits up to `timeout` seconds for queued messages to be sent. Returns True if all were."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+_notifier = None
+_notification_queue = None
+_queue_lock = threading.Lock()
+
+def _send_with_location(text: str):
+    global _notifier
+    if _notifier is None:
+        _notifier = TelegramNotifier()
+    suffix = f"\n📍 *Location:* {get_ip_info()}"
+    # Batches leave LOCATION_RESERVE for the suffix; split anyway if the location is unusually long
+    for part in split_message(text, TELEGRAM_MAX_LENGTH - len(suffix)):
+        _notifier.send_message(f"{part}{suffix}")
+
+def get_notification_queue() -> NotificationQueue:
+    global _notification_queue
+    with _queue_lock:
+        if _notification_queue is None:
+            _notification_queue = NotificationQueue(
+                _send_with_location,
+                max_size=int(os.environ.get("TELEGRAM_QUEUE_SIZE", "100")),
+                coalesce_seconds=float(os.environ.get("TELEGRAM_COALESCE_SECONDS", "1.0")),
+                max_length=TELEGRAM_MAX_LENGTH - LOCATION_RESERVE,
+            )
+            # Give the last messages (e.g. "Video Generation Completed") a chance to go out
+            atexit.register(_notification_queue.flush, float(os.environ.get("TELEGRAM_EXIT_FLUSH_SECONDS", "5")))
+    return _notification_queue
+
 def notify(event: str, status: str, details: str = ""):
     """
     Sends a structured and formatted message to Telegram.
+    Returns immediately; delivery happens on the notifier thread.
     """
     emojis = {
         "Started": "🚀",
@@ -47,7 +188,6 @@ def notify(event: str, status: str, details: str = ""):
         "Info": "ℹ️"
     }
     status_emoji = emojis.get(status, "⚙️")
-    ip_info = get_ip_info()
 
     # Format the message
     message = f"*{event}*\n\n"
@@ -55,8 +195,5 @@ def notify(event: str, status: str, details: str = ""):
     if details:
         details = details.replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace(']', '\\]')
         message += f"📝 *Details:* {details}\n"
-    
-    message += f"📍 *Location:* {ip_info}"
 
-    notifier = TelegramNotifier()
-    notifier.send_message(message)
+    get_notification_queue().put(message.rstrip("\n"))
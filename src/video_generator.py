@@ -4,19 +4,23 @@ import ffmpeg  # Import ffmpeg-python
 import base64 # Import base64 for font embedding
 import math # Import math for ceiling division
 import time # Import time for sleep
-from moviepy.config import change_settings
+from functools import lru_cache
 import pysbd
 import numpy as np
-import soundfile as sf
 import subprocess
 import sys
-from voice_generator import extract_story_text, generate_and_measure_audio, kokoro, available_voices
-from thumbnail_generator import generate_image_from_text
+from ffmpeg_runner import run_ffmpeg, log_progress
+from utils.logger_config import logger
+from captions import write_ass_captions
+from artifacts import as_audio, write_audio
+import music_library
 
+@lru_cache(maxsize=1)
 def detect_gpu_support():
     """
     Detect if GPU acceleration is available for video encoding.
     Returns (has_gpu, gpu_count, encoder_available)
+    Runs the probes once per process; later calls return the cached result.
     """
     has_gpu = False
     gpu_count = 0
@@ -70,8 +74,13 @@ def detect_gpu_support():
 # -------------------------------
 # 1) Fix ImageMagick path for cross-platform compatibility
 # -------------------------------
+@lru_cache(maxsize=1)
 def setup_imagemagick():
-    """Setup ImageMagick binary path based on environment"""
+    """
+    Setup ImageMagick binary path based on environment.
+    Only MoviePy TextClip needs it, so call this before using TextClip; it probes once per process.
+    """
+    from moviepy.config import change_settings
     import platform
     import subprocess
     
@@ -114,8 +123,6 @@ def setup_imagemagick():
     
     print("Warning: ImageMagick not found. TextClip may not work properly.")
 
-# Setup ImageMagick for cross-platform compatibility
-setup_imagemagick()
 import textwrap
 
 def wrap_text(text: str, font_path: str, font_size: int, max_width: int) -> str:
@@ -140,7 +147,447 @@ def wrap_text(text: str, font_path: str, font_size: int, max_width: int) -> str:
 
 
 # -------------------------------
-# 2) Main video creation function
+# 2) Render stages
+# -------------------------------
+# create_video is split into the stages below so they can be timed on their
+# own (see src/benchmarks/bench_render.py) without TTS, Playwright or Vosk.
+def probe_duration(media_path: str, codec_type: str = "audio") -> float:
+    """Returns the duration of the first stream of `codec_type`, or 0.0."""
+    probe = ffmpeg.probe(media_path)
+    for stream in probe['streams']:
+        if stream['codec_type'] == codec_type:
+            return float(stream['duration'])
+    return 0.0
+
+def render_intro_card(
+    intro_image_path: str,
+    intro_duration: float,
+    output_path: str,
+    fade_duration: float = 1.0,
+    runner_options: dict = None,
+) -> str:
+    """
+    Renders the intro card: the thumbnail centered on a black 1920x1080 background with fades.
+    """
+    # Create a black background
+    black_bg = ffmpeg.input(f'color=black:s=1920x1080:d={intro_duration}', f='lavfi')
+
+    # Scale the intro image to be smaller and overlay it on the black background
+    image_input = ffmpeg.input(intro_image_path, loop=1, t=intro_duration)
+    scaled_image = image_input.video.filter('scale', w='if(gte(iw,ih), min(iw, 1280), -1)', h='if(gte(iw,ih), -1, min(ih, 720))')
+
+    intro_video_stream = ffmpeg.overlay(black_bg, scaled_image, x='(W-w)/2', y='(H-h)/2')
+
+    intro_video_stream = intro_video_stream.filter('fade', type='in', start_time=0, duration=fade_duration)
+    intro_video_stream = intro_video_stream.filter('fade', type='out', start_time=intro_duration - fade_duration, duration=fade_duration)
+    run_ffmpeg(
+        ffmpeg.output(intro_video_stream, output_path, t=intro_duration, r=24, pix_fmt='yuv420p'),
+        stage="intro", expected_duration=intro_duration, **(runner_options or {})
+    )
+    return output_path
+
+def build_audio_mix(
+    audio_path: str,
+    intro_audio_path: str,
+    background_music_path: str,
+    voice_duration: float,
+    intro_duration: float,
+    intro_sample_rate: int,
+    music_volume: float = 0.30,
+    fade_duration: float = 1.0,
+    speed_factor: float = 0.9,
+    silence_duration: float = 1.0,
+    analyze_music: bool = True,
+):
+    """
+    Builds the mixed audio stream: intro voice + music, a pause, then the narration + music.
+    `voice_duration` is the narration duration after the atempo `speed_factor` is applied.
+    Music comes from the pre-analysed library (see music_library); with
+    MUSIC_NORMALIZE=1 it is loudness-normalised before `music_volume` is applied. With analyze_music=False
+    a track missing from the library is looped from the original file instead.
+    """
+    voice_audio_input = ffmpeg.input(audio_path)
+
+    # Music is looped at the input level (-stream_loop -1) from the pre-decoded
+    # library PCM, so ffmpeg never buffers a narration-length aloop window.
+    # The intro and the body read separate inputs; the body starts where the intro's music stops.
+    music_entry = None
+    try:
+        music_entry = music_library.get_track(background_music_path, analyze=analyze_music)
+    except (ffmpeg.Error, OSError) as e:
+        print(f"Warning: could not analyse background music, looping the original file: {e}")
+    music_gain = music_library.loudness_gain(music_entry, music_volume)
+    intro_music_input = music_library.looped_music_input(background_music_path, entry=music_entry, analyze=analyze_music)
+    bg_music_input = music_library.looped_music_input(
+        background_music_path, start_offset=intro_duration + silence_duration, entry=music_entry, analyze=analyze_music
+    )
+
+    # Trim background music
+    bg_music_stream = bg_music_input.audio.filter('atrim', duration=voice_duration)
+    bg_music_stream = (
+        bg_music_stream
+        .filter('volume', f'{music_gain}')
+        .filter('afade', t='in', st=0, d=fade_duration)
+        .filter('afade', t='out', st=voice_duration - fade_duration, d=fade_duration)
+    )
+
+    # Voice audio with speed change
+    voice_audio_stream = (
+        voice_audio_input.audio
+        .filter('atempo', speed_factor)
+        .filter('volume', '1.0')
+    )
+
+    # Concatenate intro audio with main audio
+    intro_audio_input = ffmpeg.input(intro_audio_path)
+    # Create a silent audio stream for the pause
+    silent_audio = ffmpeg.input(f'anullsrc=cl=stereo:r={intro_sample_rate}', f='lavfi').audio.filter('atrim', duration=silence_duration)
+
+    # Trim background music for intro
+    intro_bg_music_stream = intro_music_input.audio.filter('atrim', duration=intro_duration)
+    intro_bg_music_stream = (
+        intro_bg_music_stream
+        .filter('volume', f'{music_gain}')
+        .filter('afade', t='in', st=0, d=fade_duration)
+        .filter('afade', t='out', st=intro_duration - fade_duration, d=fade_duration)
+    )
+
+    # Mix intro audio with intro background music
+    mixed_intro_audio = ffmpeg.filter([intro_audio_input.audio, intro_bg_music_stream], 'amix', inputs=2, duration='longest')
+
+    mixed_main_audio = ffmpeg.filter([voice_audio_stream, bg_music_stream], 'amix', inputs=2, duration='longest')
+    return ffmpeg.concat(mixed_intro_audio, silent_audio, mixed_main_audio, v=0, a=1)
+
+def measure_audio_mix(mixed_audio, temp_mixed_audio_path: str, expected_duration: float = None, runner_options: dict = None) -> float:
+    """
+    Renders the mixed audio to a temporary WAV to get its exact duration, then removes it.
+    """
+    try:
+        run_ffmpeg(
+            ffmpeg.output(mixed_audio, temp_mixed_audio_path, format='wav'),
+            stage="audio_mix", expected_duration=expected_duration, **(runner_options or {})
+        )
+        mixed_audio_duration = probe_duration(temp_mixed_audio_path)
+        if mixed_audio_duration == 0.0:
+            raise ValueError("Could not determine mixed audio duration from ffprobe.")
+        return mixed_audio_duration
+    finally:
+        if os.path.exists(temp_mixed_audio_path):
+            os.remove(temp_mixed_audio_path)
+            print(f"Cleaned up temporary mixed audio file: {temp_mixed_audio_path}")
+
+def prepare_background_clip(
+    video_path: str,
+    output_path: str,
+    duration: float,
+    fade_duration: float = 1.0,
+    stage: str = "clip",
+    runner_options: dict = None,
+    start: float = None,
+) -> str:
+    """
+    Loops, scales and fades one stock clip into a temporary 1920x1080 file of `duration` seconds.
+    With `start` (a planned segment, see clip_planner) only source[start:start + duration]
+    is decoded, without looping, and the fades sit at the segment's own edges.
+    """
+    if start is None:
+        probe_video = ffmpeg.probe(video_path)
+        video_stream_info = next((s for s in probe_video['streams'] if s['codec_type'] == 'video'), None)
+        if video_stream_info is None:
+            raise ValueError(f"Could not find video stream in {video_path}")
+        current_video_duration = float(video_stream_info['duration'])
+
+        # Use stream_loop=-1 to loop each video indefinitely at the input level
+        input_stream = ffmpeg.input(video_path, stream_loop=-1)
+    else:
+        current_video_duration = duration
+        # Input-level seek and length: frames outside the segment are never decoded or encoded
+        input_stream = ffmpeg.input(video_path, ss=start, t=duration)
+    # Apply scale and setsar filters
+    scaled_video_stream = input_stream.video.filter('scale', 1920, 1080).filter('setsar', '1/1')
+
+    # Fade out is placed relative to the source clip's own duration (or the segment's)
+    scaled_video_stream = scaled_video_stream.filter('fade', type='in', start_time=0, duration=fade_duration)
+    scaled_video_stream = scaled_video_stream.filter('fade', type='out', start_time=current_video_duration - fade_duration, duration=fade_duration)
+
+    print(f"Attempting to create temporary video file: {output_path}")
+    run_ffmpeg(
+        ffmpeg.output(scaled_video_stream, output_path, format='mp4', t=duration),
+        stage=stage, expected_duration=duration, **(runner_options or {})
+    )
+
+    # Wait a moment for file system operations to complete
+    time.sleep(0.5)
+
+    # Verify file creation and size with retry logic
+    max_retries = 5
+    for retry in range(max_retries):
+        if os.path.exists(output_path):
+            break
+        print(f"Retry {retry + 1}/{max_retries}: Waiting for temp file to appear...")
+        time.sleep(1)
+    else:
+        print(f"File system error during temporary video file creation: Temporary video file was not created: {output_path}")
+        raise FileNotFoundError(f"Temporary video file was not created: {output_path}")
+
+    if os.path.getsize(output_path) == 0:
+        raise ValueError(f"Temporary video file was created but is empty: {output_path}")
+
+    # Verify with ffprobe that it's a valid video file
+    try:
+        ffmpeg.probe(output_path)
+    except ffmpeg.Error as e:
+        raise ValueError(f"Temporary video file {output_path} is not a valid video file (ffprobe failed): {e.stderr.decode('utf8')}")
+
+    print(f"Successfully created and verified temporary video file: {output_path}")
+    return output_path
+
+# Cinematic grade applied to the whole timeline (pre-rendered reels already carry it)
+GRADE = {'brightness': 0.0, 'contrast': 1.1, 'saturation': 1.1, 'gamma': 1.0}
+
+def build_video_timeline(
+    intro_video_path: str,
+    clip_paths: list,
+    mixed_audio_duration: float,
+    require_files: bool = True,
+    clip_durations: list = None,
+    clips_graded: bool = False,
+    fade_duration: float = 1.0,
+):
+    """
+    Concatenates the intro card and prepared clips, applies the grade and trims to the audio.
+    require_files=False builds the graph for clips that haven't been rendered yet (render planning).
+    `clip_durations` cuts each clip short (with a fade at the new end); with
+    `clips_graded` (pre-rendered reels, see reel_cache) only the intro card is graded.
+    """
+    intro_stream = ffmpeg.input(intro_video_path).video # Start with the intro video
+    if clips_graded:
+        intro_stream = intro_stream.filter('eq', **GRADE)
+    final_concat_inputs = [intro_stream]
+    for i, temp_path in enumerate(clip_paths):
+        if require_files and not os.path.exists(temp_path):
+            raise FileNotFoundError(f"Temporary video file not found during concatenation setup: {temp_path}")
+        if clip_durations:
+            clip_stream = ffmpeg.input(temp_path, t=clip_durations[i]).video.filter(
+                'fade', type='out', start_time=clip_durations[i] - fade_duration, duration=fade_duration
+            )
+        else:
+            clip_stream = ffmpeg.input(temp_path).video
+        final_concat_inputs.append(clip_stream) # concat will handle streams
+
+    # Always concatenate, even if only one video (the intro)
+    video_stream = ffmpeg.concat(*final_concat_inputs, v=1, a=0)
+
+    # Apply cinematic grading
+    if not clips_graded:
+        video_stream = video_stream.filter('eq', **GRADE)
+
+    # Trim video to mixed audio duration
+    return video_stream.trim(end=mixed_audio_duration).setpts('PTS-STARTPTS')
+
+def build_output_args(use_gpu: bool = False, gpu_device_id: int = 0) -> dict:
+    """Encoder settings for the final output."""
+    output_args = {
+        'c:v': 'h264_nvenc' if use_gpu else 'libx264',
+        'preset': 'fast',
+        'pix_fmt': 'yuv420p',
+        'c:a': 'aac',
+        'b:a': '192k',
+        'threads': 6,
+    }
+    if use_gpu:
+        output_args['gpu'] = str(gpu_device_id)
+    return output_args
+
+# -------------------------------
+# Renditions
+# -------------------------------
+# One timeline (intro, clips, grade, trim) is decoded and composited once, then
+# split into one branch per rendition: crop/scale to its frame, burn in its own
+# caption layout and encode with its own bitrate, all outputs of a single ffmpeg
+# process. A rendition without a bitrate uses the encoder's default quality.
+TIMELINE_SIZE = (1920, 1080)
+
+RENDITIONS = {
+    "landscape": {"size": (1920, 1080), "caption_scale": 1.0, "alignment": 5, "margin_v": 0},
+    "landscape_720": {"size": (1280, 720), "caption_scale": 1.0, "alignment": 5, "margin_v": 0,
+                      "b:v": "4M", "maxrate": "5M", "bufsize": "8M"},
+    "vertical": {"size": (1080, 1920), "caption_scale": 1.25, "alignment": 2, "margin_v": 560,
+                 "b:v": "6M", "maxrate": "8M", "bufsize": "12M"},
+    "vertical_720": {"size": (720, 1280), "caption_scale": 1.25, "alignment": 2, "margin_v": 560,
+                     "b:v": "3M", "maxrate": "4M", "bufsize": "6M"},
+}
+BITRATE_KEYS = ("b:v", "maxrate", "bufsize")
+
+def caption_layout(name: str, caption_fontsize: int, caption_stroke_width: int = 5) -> dict:
+    """
+    ASS layout for a rendition. RENDITIONS' margin_v is given for the full-size
+    frame; font size, margin and outline scale with the frame's shorter side,
+    so a 720p rendition places its captions like its full-size counterpart.
+    """
+    spec = RENDITIONS[name]
+    scale = min(spec["size"]) / min(TIMELINE_SIZE)
+    return {
+        "play_res": spec["size"],
+        "fontsize": round(caption_fontsize * spec["caption_scale"] * scale),
+        "alignment": spec["alignment"],
+        "margin_v": round(spec["margin_v"] * scale),
+        "stroke_width": max(1, round(caption_stroke_width * scale)),
+    }
+
+def rendition_output_path(output_video_path: str, name: str) -> str:
+    """The 16:9 master keeps the requested path; other renditions get a name suffix."""
+    return output_video_path if name == "landscape" else output_video_path.replace(".mp4", f"_{name}.mp4")
+
+def crop_to_aspect(source_size: tuple, target_size: tuple) -> tuple:
+    """Largest centered (width, height, x, y) crop of source_size with the target's aspect ratio."""
+    source_w, source_h = source_size
+    target_w, target_h = target_size
+    crop_w = min(source_w, round(source_h * target_w / target_h))
+    crop_h = min(source_h, round(source_w * target_h / target_w))
+    crop_w, crop_h = crop_w - crop_w % 2, crop_h - crop_h % 2
+    return crop_w, crop_h, (source_w - crop_w) // 2, (source_h - crop_h) // 2
+
+def frame_rendition(video_stream, target_size: tuple, source_size: tuple = TIMELINE_SIZE):
+    """Center-crops the timeline to the rendition's aspect ratio and scales it to its size."""
+    if tuple(target_size) == tuple(source_size):
+        return video_stream
+    crop_w, crop_h, x, y = crop_to_aspect(source_size, target_size)
+    if (crop_w, crop_h) != tuple(source_size):
+        video_stream = video_stream.filter('crop', crop_w, crop_h, x, y)
+    return video_stream.filter('scale', target_size[0], target_size[1]).filter('setsar', '1/1')
+
+def build_rendition_outputs(
+    video_stream,
+    mixed_audio,
+    rendition_paths: dict,
+    output_args: dict,
+    caption_paths: dict = None,
+):
+    """
+    Splits the (uncaptioned) timeline and the audio mix once per rendition and
+    returns one ffmpeg node that writes every rendition in the same process.
+    `rendition_paths` maps rendition names to output files, `caption_paths`
+    names to ASS files (missing or None means no captions).
+    """
+    caption_paths = caption_paths or {}
+    names = list(rendition_paths)
+    if len(names) > 1:
+        video_split, audio_split = video_stream.split(), mixed_audio.asplit()
+        video_branches = [video_split[i] for i in range(len(names))]
+        audio_branches = [audio_split[i] for i in range(len(names))]
+    else:
+        video_branches, audio_branches = [video_stream], [mixed_audio]
+
+    outputs = []
+    for name, video_branch, audio_branch in zip(names, video_branches, audio_branches):
+        spec = RENDITIONS[name]
+        video_branch = frame_rendition(video_branch, spec["size"])
+        if caption_paths.get(name):
+            video_branch = video_branch.filter('subtitles', filename=caption_paths[name])
+        rendition_args = {**output_args, **{key: spec[key] for key in BITRATE_KEYS if key in spec}}
+        outputs.append(ffmpeg.output(video_branch, audio_branch, rendition_paths[name], **rendition_args))
+    return outputs[0] if len(outputs) == 1 else ffmpeg.merge_outputs(*outputs)
+
+def encode_final(
+    video_stream,
+    mixed_audio,
+    output_video_path,
+    output_args: dict,
+    expected_duration: float = None,
+    runner_options: dict = None,
+    caption_paths: dict = None,
+):
+    """
+    Runs the final encode. If an NVENC encode fails it is retried once with libx264.
+    `output_video_path` is a file path, or a {rendition name: path} dict to encode
+    several renditions from one decode (see build_rendition_outputs).
+    """
+    runner_options = runner_options or {}
+    rendition_paths = output_video_path if isinstance(output_video_path, dict) else {"landscape": output_video_path}
+    final_output = build_rendition_outputs(video_stream, mixed_audio, rendition_paths, output_args, caption_paths)
+    written = ", ".join(rendition_paths.values())
+
+    print(f"FFmpeg command: {ffmpeg.compile(final_output)}")
+
+    try:
+        run_ffmpeg(final_output, stage="final", expected_duration=expected_duration, **runner_options)
+        print(f"Video generated and saved to {written}")
+    except ffmpeg.Error as e:
+        # If GPU encoding failed, try CPU fallback
+        if output_args.get('c:v') == 'h264_nvenc' and ('h264_nvenc' in str(e.stderr) or 'nvenc' in str(e.stderr) or 'libcuda' in str(e.stderr)):
+            print("GPU encoding failed, attempting CPU fallback...")
+            logger.warning(f"GPU encode failed:\n{e.stderr.decode('utf8')}", extra={"stage": "final"})
+
+            # Retry with CPU encoding
+            cpu_output_args = output_args.copy()
+            cpu_output_args['c:v'] = 'libx264'
+            if 'gpu' in cpu_output_args:
+                del cpu_output_args['gpu']
+
+            final_output_cpu = build_rendition_outputs(video_stream, mixed_audio, rendition_paths, cpu_output_args, caption_paths)
+
+            print("Retrying with CPU encoding...")
+            print(f"CPU FFmpeg command: {ffmpeg.compile(final_output_cpu)}")
+
+            try:
+                run_ffmpeg(final_output_cpu, stage="final_cpu", expected_duration=expected_duration, **runner_options)
+                print(f"Video generated and saved to {written} (using CPU fallback)")
+            except ffmpeg.Error as cpu_e:
+                logger.error(f"FFmpeg stderr (CPU, last lines):\n{cpu_e.stderr.decode('utf8')}", extra={"stage": "final_cpu"})
+                raise cpu_e
+        else:
+            logger.error(f"FFmpeg stderr (last lines):\n{e.stderr.decode('utf8')}", extra={"stage": "final"})
+            raise
+
+# Timing shared by create_video and the render planner (render_planner.py)
+VOICE_SPEED_FACTOR = 0.9     # atempo applied to the narration
+INTRO_SILENCE_SECONDS = 1.0  # pause between the intro card and the narration
+
+def plan_background_segments(background_video_paths: list, clips_duration: float, index_path: str = None) -> list:
+    """
+    Exact in/out points on the given clips covering `clips_duration` seconds
+    (the timeline after the intro card). CLIP_RANDOM_SEEK=1 starts each segment
+    at a random point; CLIP_MAX_SECONDS caps a segment's length. Clip durations
+    come from the stock index (`index_path`, default clip_planner.INDEX_PATH).
+    """
+    from clip_planner import INDEX_PATH, get_clip, plan_segments
+    max_segment = float(os.environ.get("CLIP_MAX_SECONDS", "0")) or None
+    return plan_segments(
+        [get_clip(path, index_path or INDEX_PATH) for path in background_video_paths], clips_duration,
+        random_seek=os.environ.get("CLIP_RANDOM_SEEK", "0") == "1", max_segment=max_segment,
+    )
+
+# Pre-rendered b-roll reels (see reel_cache.py) are opt-in (REEL_CACHE=1). The
+# caller takes one before create_video and passes it as `reel_path`; callers
+# estimate the clip time before the intro narration exists, hence the margin.
+REEL_MARGIN_SECONDS = 1.0
+
+def reel_cache_enabled() -> bool:
+    return os.environ.get("REEL_CACHE", "0") == "1"
+
+def find_background_reel(clips_duration: float):
+    """The cached reel take_background_reel would take (its metadata), or None."""
+    if not reel_cache_enabled():
+        return None
+    from reel_cache import ReelCache
+    return ReelCache().find(clips_duration + REEL_MARGIN_SECONDS)
+
+def take_background_reel(clips_duration: float, output_video_path: str) -> str:
+    """
+    Moves a pre-rendered reel covering `clips_duration` seconds out of the reel
+    cache next to the output, for create_video's `reel_path`. Returns its path,
+    or None unless REEL_CACHE=1 and a reel is long enough.
+    """
+    if not reel_cache_enabled():
+        return None
+    from reel_cache import ReelCache
+    reel_path = os.path.abspath(output_video_path.replace(".mp4", "_reel.mp4")).replace('\\', '/')
+    reel = ReelCache().take(clips_duration + REEL_MARGIN_SECONDS, reel_path)
+    return reel["path"] if reel else None
+
+# -------------------------------
+# 3) Main video creation function
 # -------------------------------
 def create_video(
     story_text: str,
@@ -161,6 +608,15 @@ def create_video(
     fade_duration: float = 1.0,
     use_gpu: bool = False,
     gpu_device_id: int = 0,
+    progress_callback=None,
+    ffmpeg_timeout: float = None,
+    cancel_event=None,
+    renditions: list = None,
+    intro_audio_path: str = None,
+    intro_image_path: str = None,
+    word_timestamps: list = None,
+    thumbnail_text: str = None,
+    reel_path: str = None,
 ):
     """
     Generates a cinematic video with:
@@ -170,7 +626,37 @@ def create_video(
       - voice-over
       - dynamic captions with bold/shadow
       - outro card
+
+    Every ffmpeg run reports progress to `progress_callback` (an FFmpegProgress
+    per update, see ffmpeg_runner) and is bounded by `ffmpeg_timeout` seconds.
+    Setting `cancel_event` (a threading.Event) stops the current run.
+
+    `renditions` lists RENDITIONS names (default ["landscape"]); all of them are
+    encoded from one decode of the timeline. Returns {rendition name: output path}.
+
+    Stages that were already run elsewhere (see stage_worker.py) can be passed in:
+    `intro_audio_path` (intro narration WAV), `intro_image_path` (thumbnail) and
+    `word_timestamps` (Vosk words) skip the TTS, Playwright and Vosk steps.
+    `audio_path` and `intro_audio_path` take a path or an AudioArtifact (see
+    artifacts.py), whose duration and format are used without probing the file.
+    `thumbnail_text` is the intro card text; without it the text main.py saved
+    to output/generatedStory/intro_and_thumb_text.txt is read.
+
+    `reel_path` is a pre-rendered b-roll reel (take_background_reel) used
+    instead of cutting `background_video_paths`; it is deleted with the other
+    working files.
     """
+    unknown_renditions = set(renditions or []) - set(RENDITIONS)
+    if unknown_renditions:
+        raise ValueError(f"Unknown renditions {sorted(unknown_renditions)}; choose from {list(RENDITIONS)}")
+
+    if progress_callback is None:
+        progress_callback = log_progress()
+    runner_options = {
+        "progress_callback": progress_callback,
+        "timeout": ffmpeg_timeout,
+        "cancel_event": cancel_event,
+    }
     temp_looped_scaled_video_paths = [] # Initialize here to be accessible in outer finally
     temp_intro_audio_path = ""
     temp_intro_video_path = ""
@@ -181,118 +667,72 @@ def create_video(
         # ---------------------------
         print("Generating intro video...")
         
-        # Generate audio for intro text
-        intro_voice = random.choice(available_voices) # Use a random available voice for intro
-        intro_audio_samples, intro_sample_rate, intro_duration = generate_and_measure_audio(intro_text, intro_voice)
-        
-        temp_intro_audio_path = output_video_path.replace(".mp4", "_intro_audio.wav")
-        sf.write(temp_intro_audio_path, intro_audio_samples, intro_sample_rate)
-        print(f"Intro audio generated and saved to {temp_intro_audio_path} with duration {intro_duration:.2f} seconds.")
-
-        # Create intro video from image with text overlay
-        # Ensure the output directory for thumbnails exists
-        thumbnail_dir = "output/generatedThumbnail"
-        os.makedirs(thumbnail_dir, exist_ok=True)
-        generated_intro_image_path = os.path.join(thumbnail_dir, "thumbnail.png")
-        
-        with open("output/generatedStory/intro_and_thumb_text.txt", "r", encoding="utf-8") as f:
-            intro_image_text = f.read()
-        
-        # Run the async function
-        import asyncio
-        asyncio.run(generate_image_from_text(intro_image_text, generated_intro_image_path))
+        if intro_audio_path:
+            intro_audio = as_audio(intro_audio_path)
+            print(f"Using intro audio {intro_audio.path} with duration {intro_audio.duration:.2f} seconds.")
+        else:
+            # Imported here so the render stages above can be used without loading TTS
+            from voice_generator import generate_and_measure_audio, available_voices
 
-        intro_image_path = generated_intro_image_path
-        temp_intro_video_path = output_video_path.replace(".mp4", "_intro_video.mp4")
+            # Generate audio for intro text
+            intro_voice = random.choice(available_voices) # Use a random available voice for intro
+            intro_audio_samples, intro_sample_rate, _ = generate_and_measure_audio(intro_text, intro_voice)
 
-        # Create a black background
-        black_bg = ffmpeg.input(f'color=black:s=1920x1080:d={intro_duration}', f='lavfi')
+            temp_intro_audio_path = output_video_path.replace(".mp4", "_intro_audio.wav")
+            intro_audio = write_audio(temp_intro_audio_path, intro_audio_samples, intro_sample_rate, voice=intro_voice, speed=1.0)
+            print(f"Intro audio generated and saved to {temp_intro_audio_path} with duration {intro_audio.duration:.2f} seconds.")
+        intro_sample_rate, intro_duration = intro_audio.sample_rate, intro_audio.duration
 
-        # Scale the intro image to be smaller and overlay it on the black background
-        image_input = ffmpeg.input(intro_image_path, loop=1, t=intro_duration)
-        scaled_image = image_input.video.filter('scale', w='if(gte(iw,ih), min(iw, 1280), -1)', h='if(gte(iw,ih), -1, min(ih, 720))')
-        
-        intro_video_stream = ffmpeg.overlay(black_bg, scaled_image, x='(W-w)/2', y='(H-h)/2')
+        generated_intro_image_path = intro_image_path
+        if not generated_intro_image_path:
+            # Imported here so the render stages above can be used without Playwright
+            from thumbnail_generator import generate_image_from_text_sync
+
+            # Create intro video from image with text overlay
+            # Ensure the output directory for thumbnails exists
+            thumbnail_dir = "output/generatedThumbnail"
+            os.makedirs(thumbnail_dir, exist_ok=True)
+            generated_intro_image_path = os.path.join(thumbnail_dir, "thumbnail.png")
 
-        intro_video_stream = intro_video_stream.filter('fade', type='in', start_time=0, duration=fade_duration)
-        intro_video_stream = intro_video_stream.filter('fade', type='out', start_time=intro_duration - fade_duration, duration=fade_duration)
-        ffmpeg.output(intro_video_stream, temp_intro_video_path, t=intro_duration, r=24, pix_fmt='yuv420p').run(overwrite_output=True, quiet=True)
+            if thumbnail_text is None:
+                with open("output/generatedStory/intro_and_thumb_text.txt", "r", encoding="utf-8") as f:
+                    thumbnail_text = f.read()
+
+            # Rendered in the pooled browser, which stays warm for the next video
+            generate_image_from_text_sync(thumbnail_text, generated_intro_image_path)
+
+        temp_intro_video_path = output_video_path.replace(".mp4", "_intro_video.mp4")
+        render_intro_card(generated_intro_image_path, intro_duration, temp_intro_video_path, fade_duration, runner_options)
         print(f"Intro video generated and saved to {temp_intro_video_path}.")
 
         # ---------------------------
         # Prepare audio streams for FFmpeg
         # ---------------------------
-        voice_audio_input = ffmpeg.input(audio_path)
-        bg_music_input = ffmpeg.input(background_music_path)
-
-        # Get duration of voice audio
-        probe = ffmpeg.probe(audio_path)
-        voice_duration = 0.0
-        for stream in probe['streams']:
-            if stream['codec_type'] == 'audio':
-                voice_duration = float(stream['duration'])
-                break
+        # Duration of the voice audio (known by its artifact, no ffprobe)
+        voice_audio = as_audio(audio_path)
+        voice_duration = voice_audio.duration
         if voice_duration == 0.0:
-            raise ValueError("Could not determine audio duration from ffprobe.")
+            raise ValueError(f"Voice audio {voice_audio.path} is empty.")
         
-        # Speed up voice audio by 1.2x
-        speed_factor = 0.9
-        voice_duration /= speed_factor # Adjust duration for speed-up
-
-        # Loop/trim background music
-        bg_music_stream = bg_music_input.audio.filter('aloop', loop=0, size=int(voice_duration * 44100)).filter('atrim', duration=voice_duration)
-        bg_music_stream = (
-            bg_music_stream
-            .filter('volume', f'{music_volume}')
-            .filter('afade', t='in', st=0, d=fade_duration)
-            .filter('afade', t='out', st=voice_duration - fade_duration, d=fade_duration)
+        # Change voice tempo (atempo below 1.0 slows it down)
+        speed_factor = VOICE_SPEED_FACTOR
+        voice_duration /= speed_factor # Adjust duration for the tempo change
+        silence_duration = INTRO_SILENCE_SECONDS
+
+        mixed_audio = build_audio_mix(
+            voice_audio.path, intro_audio.path, background_music_path,
+            voice_duration, intro_duration, intro_sample_rate,
+            music_volume=music_volume, fade_duration=fade_duration,
+            speed_factor=speed_factor, silence_duration=silence_duration,
         )
 
-        # Voice audio with speed-up and fade
-        voice_audio_stream = (
-            voice_audio_input.audio
-            .filter('atempo', speed_factor) # Speed up by 1.4x
-            .filter('volume', '1.0')
-        )
-
-        # Mix audio
-        # Concatenate intro audio with main audio
-        intro_audio_input = ffmpeg.input(temp_intro_audio_path)
-        # Create a 1-second silent audio stream for the pause
-        silence_duration = 1.0
-        silent_audio = ffmpeg.input(f'anullsrc=cl=stereo:r={intro_sample_rate}', f='lavfi').audio.filter('atrim', duration=silence_duration)
-
-        # Loop/trim background music for intro
-        intro_bg_music_stream = bg_music_input.audio.filter('aloop', loop=0, size=int(intro_duration * 44100)).filter('atrim', duration=intro_duration)
-        intro_bg_music_stream = (
-            intro_bg_music_stream
-            .filter('volume', f'{music_volume}')
-            .filter('afade', t='in', st=0, d=fade_duration)
-            .filter('afade', t='out', st=intro_duration - fade_duration, d=fade_duration)
-        )
-
-        # Mix intro audio with intro background music
-        mixed_intro_audio = ffmpeg.filter([intro_audio_input.audio, intro_bg_music_stream], 'amix', inputs=2, duration='longest')
-
-        mixed_main_audio = ffmpeg.filter([voice_audio_stream, bg_music_stream], 'amix', inputs=2, duration='longest')
-        mixed_audio = ffmpeg.concat(mixed_intro_audio, silent_audio, mixed_main_audio, v=0, a=1)
-
         # Get the actual duration of the mixed audio stream by writing to a temporary file
         temp_mixed_audio_path = output_video_path.replace(".mp4", "_mixed_audio.wav")
-        try:
-            ffmpeg.output(mixed_audio, temp_mixed_audio_path, format='wav').run(overwrite_output=True, quiet=True)
-            probe_mixed_audio = ffmpeg.probe(temp_mixed_audio_path)
-            mixed_audio_duration = 0.0
-            for stream in probe_mixed_audio['streams']:
-                if stream['codec_type'] == 'audio':
-                    mixed_audio_duration = float(stream['duration'])
-                    break
-            if mixed_audio_duration == 0.0:
-                raise ValueError("Could not determine mixed audio duration from ffprobe.")
-        finally:
-            if os.path.exists(temp_mixed_audio_path):
-                os.remove(temp_mixed_audio_path)
-                print(f"Cleaned up temporary mixed audio file: {temp_mixed_audio_path}")
+        mixed_audio_duration = measure_audio_mix(
+            mixed_audio, temp_mixed_audio_path,
+            expected_duration=intro_duration + silence_duration + voice_duration,
+            runner_options=runner_options,
+        )
 
         # ---------------------------
         # Prepare background videos
@@ -301,178 +741,61 @@ def create_video(
         temp_dir = os.path.dirname(os.path.abspath(output_video_path))
         os.makedirs(temp_dir, exist_ok=True)
 
-        for i, video_path in enumerate(background_video_paths):
-            probe_video = ffmpeg.probe(video_path)
-            video_stream_info = next((s for s in probe_video['streams'] if s['codec_type'] == 'video'), None)
-            if video_stream_info is None:
-                raise ValueError(f"Could not find video stream in {video_path}")
-            
-            # Use stream_loop=-1 to loop each video indefinitely at the input level
-            input_stream = ffmpeg.input(video_path, stream_loop=-1)
-            # Apply scale and setsar filters
-            scaled_video_stream = input_stream.video.filter('scale', 1920, 1080).filter('setsar', '1/1')
-            
-            # Apply fade-in/fade-out to individual video segments
-            # The 'start_time' for fade out should be relative to the duration of the individual video segment.
-            # We need to get the duration of the input_stream before applying fade.
-            # This requires probing each video individually before the loop, or passing duration.
-            # For now, let's assume a fixed duration for fade out relative to the segment's duration.
-            # The error "Unable to parse option value "duration-1.0" as duration" means 'duration-1.0' is not a valid expression for start_time.
-            # We need to calculate the exact start time for the fade out.
-            # Let's get the duration of the current video segment.
-            video_duration_probe = ffmpeg.probe(video_path)
-            current_video_duration = float(next((s for s in video_duration_probe['streams'] if s['codec_type'] == 'video'), None)['duration'])
-
-            scaled_video_stream = scaled_video_stream.filter('fade', type='in', start_time=0, duration=fade_duration)
-            scaled_video_stream = scaled_video_stream.filter('fade', type='out', start_time=current_video_duration - fade_duration, duration=fade_duration)
-
-            # Output each processed stream to a temporary file
+        # The clips fill exactly what the intro card leaves of the audio
+        clips_duration = mixed_audio_duration - intro_duration
+        if reel_path:
+            # Already scaled, faded and graded: only trimmed in the final pass
+            print(f"Using pre-rendered b-roll reel {reel_path}")
+            temp_looped_scaled_video_paths.append(reel_path)
+            segments = []
+        else:
+            segments = plan_background_segments(background_video_paths, clips_duration)
+        for i, segment in enumerate(segments):
             # Ensure consistent forward slashes for the path
             temp_output_path = os.path.abspath(output_video_path.replace(".mp4", f"_looped_scaled_video_{i}.mp4")).replace('\\', '/')
-            print(f"Attempting to create temporary video file: {temp_output_path}")
             try:
-                # Use a reasonable duration for the temporary file, and capture all output
-                temp_file_duration = min(60, mixed_audio_duration + 5)
-                temp_stdout, temp_stderr = ffmpeg.output(scaled_video_stream, temp_output_path, format='mp4', t=temp_file_duration).run(
-                    overwrite_output=True, quiet=False, capture_stdout=True, capture_stderr=True
+                print(f"Clip {i}: {segment.source_path} [{segment.in_point:.2f}s - {segment.out_point:.2f}s]")
+                prepare_background_clip(
+                    segment.source_path, temp_output_path, segment.duration, fade_duration, f"clip_{i}", runner_options,
+                    start=segment.in_point,
                 )
-                print(f"FFmpeg stdout during temp file creation for {temp_output_path}:\n{temp_stdout.decode('utf8')}")
-                print(f"FFmpeg stderr during temp file creation for {temp_output_path}:\n{temp_stderr.decode('utf8')}")
-                
-                # Wait a moment for file system operations to complete
-                import time
-                time.sleep(0.5)
-                
-                # Verify file creation and size with retry logic
-                max_retries = 5
-                for retry in range(max_retries):
-                    if os.path.exists(temp_output_path):
-                        break
-                    print(f"Retry {retry + 1}/{max_retries}: Waiting for temp file to appear...")
-                    time.sleep(1)
-                else:
-                    print(f"File system error during temporary video file creation: Temporary video file was not created: {temp_output_path}")
-                    raise FileNotFoundError(f"Temporary video file was not created: {temp_output_path}")
-                
-                if os.path.getsize(temp_output_path) == 0:
-                    raise ValueError(f"Temporary video file was created but is empty: {temp_output_path}")
-                
-                # Verify with ffprobe that it's a valid video file
-                try:
-                    ffmpeg.probe(temp_output_path)
-                except ffmpeg.Error as e:
-                    raise ValueError(f"Temporary video file {temp_output_path} is not a valid video file (ffprobe failed): {e.stderr.decode('utf8')}")
-
                 temp_looped_scaled_video_paths.append(temp_output_path)
-                print(f"Successfully created and verified temporary video file: {temp_output_path}")
                 time.sleep(1.0) # Increased delay to ensure file is fully written
             except ffmpeg.Error as e:
                 print(f"FFmpeg Error creating temporary video file {temp_output_path}: {e.stderr.decode('utf8')}")
-                print(f"FFmpeg stdout during temp file creation: {e.stdout.decode('utf8')}")
                 raise # Re-raise to stop execution if a temp file fails
             except (FileNotFoundError, ValueError) as e:
                 print(f"File system error during temporary video file creation: {e}")
                 raise # Re-raise other file system errors
 
         print("All temporary looped/scaled video files prepared. Proceeding to final concatenation.")
-        # Now, create new input streams from these temporary files for concatenation
-        final_concat_inputs = [ffmpeg.input(temp_intro_video_path)] # Start with the intro video
-        for temp_path in temp_looped_scaled_video_paths:
-            # The existence and validity checks are already done above, but keeping it here for robustness
-            if not os.path.exists(temp_path):
-                raise FileNotFoundError(f"Temporary video file not found during concatenation setup: {temp_path}")
-            final_concat_inputs.append(ffmpeg.input(temp_path)) # Use raw input, concat will handle streams
-
-        # Concatenate the temporary video files
-        # Always concatenate, even if only one video (the intro)
-        video_stream = ffmpeg.concat(*final_concat_inputs, v=1, a=0)
-
-        # ---------------------------
-        # Apply cinematic grading
-        # ---------------------------
-        video_stream = video_stream.filter('eq', brightness=0.0, contrast=1.1, saturation=1.1, gamma=1.0)
-
-        # # ---------------------------
-        # # Semi-transparent grey overlay (10% opacity)
-        # # ---------------------------
-        # grey_overlay = (
-        #     ffmpeg.input(f'color=gray@0.1:s=1920x1080:d={voice_duration}', f='lavfi')
-        #     .filter('format', 'yuva420p')  # apply pixel format after input
-        # )
-
-
-        # video_stream = ffmpeg.overlay(
-        #     video_stream,
-        #     grey_overlay,
-        #     format='auto'
-        # )
-
-
-        # Trim video to mixed audio duration
-        video_stream = video_stream.trim(end=mixed_audio_duration).setpts('PTS-STARTPTS')
+        if reel_path:
+            video_stream = build_video_timeline(
+                temp_intro_video_path, [reel_path], mixed_audio_duration,
+                clip_durations=[clips_duration], clips_graded=True, fade_duration=fade_duration,
+            )
+        else:
+            video_stream = build_video_timeline(temp_intro_video_path, temp_looped_scaled_video_paths, mixed_audio_duration)
 
         # ---------------------------
         # Dynamic captions
         # ---------------------------
-        from transcriber import get_word_timestamps
-        word_timestamps = get_word_timestamps(audio_path)
+        if word_timestamps is None:
+            from transcriber import get_word_timestamps
+            word_timestamps = get_word_timestamps(voice_audio.path)
 
-        # Generate ASS file for captions
-        ass_path = output_video_path.replace(".mp4", ".ass")
+        # One ASS file per rendition, laid out for its frame size
+        rendition_paths = {name: rendition_output_path(output_video_path, name) for name in renditions or ["landscape"]}
+        caption_paths = {}
         if word_timestamps:
-            # Read font data to embed
-            try:
-                # No need to embed font if using a system font like Segoe UI Emoji
-                font_base64 = ""
-                font_filename = caption_font
-            except FileNotFoundError:
-                print(f"Warning: Font file not found at {caption_font}. Captions might not display correctly.")
-                font_base64 = ""
-                font_filename = ""
-
-            # ASS header and style definition
-            ass_content = f"""[Script Info]
-; Script generated by FFmpeg
-PlayResX: 1920
-PlayResY: 1080
-Timer: 100.0000
-ScriptType: v4.00+
-WrapStyle: 0
-ScaledBorderAndShadow: yes
-YCbCr Matrix: TV.601
- 
-[V4+ Styles]
-Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
-Style: Default,{caption_font},{caption_fontsize},&H00FFFFFF,&H0000FFFF,&H00000000,&H000000FF,-1,0,0,0,100,100,0,0,1,{caption_stroke_width},0,5,0,0,0,1
- 
-[Events]
-Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
-"""
-            # Append caption events
-            for i, word_info in enumerate(word_timestamps):
-                start_time = (word_info["start"] / speed_factor) + intro_duration + silence_duration
-                end_time = (word_info["end"] / speed_factor) + intro_duration + silence_duration
-                word = word_info["word"]
-
-                # Format time for ASS: H:MM:SS.cc (centiseconds)
-                start_ass = f"{int(start_time // 3600)}:{int((start_time % 3600) // 60):02}:{int(start_time % 60):02}.{int((start_time * 100) % 100):02}"
-                end_ass = f"{int(end_time // 3600)}:{int((end_time % 3600) // 60):02}:{int(end_time % 60):02}.{int((end_time * 100) % 100):02}"
-
-                # For middle-center, Alignment=5 is set in the style.
-                ass_content += f"Dialogue: 0,{start_ass},{end_ass},Default,,0,0,0,,{word}\n"
-
-            # Embed font if data is available
-            if font_base64:
-                ass_content += f"\n[Fonts]\nfontname: {font_filename}\n{font_base64}\n"
-
-            with open(ass_path, "w", encoding="utf-8") as f:
-                f.write(ass_content)
-            
-            # Use subtitles filter with the generated ASS file
-            video_stream = video_stream.filter(
-                'subtitles',
-                filename=ass_path
-            )
+            for name, rendition_path in rendition_paths.items():
+                layout = caption_layout(name, caption_fontsize, caption_stroke_width)
+                caption_paths[name] = rendition_path.replace(".mp4", ".ass")
+                write_ass_captions(
+                    word_timestamps, caption_paths[name], caption_font, layout["fontsize"], layout["stroke_width"],
+                    time_offset=intro_duration + silence_duration, speed_factor=speed_factor,
+                    play_res=layout["play_res"], alignment=layout["alignment"], margin_v=layout["margin_v"],
+                )
         else:
             print("No word timestamps found for captions.")
 
@@ -489,17 +812,8 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         elif not use_gpu and gpu_available:
             print("GPU is available but not requested. Using CPU encoding as requested.")
         
-        output_args = {
-            'c:v': 'h264_nvenc' if use_gpu and gpu_available else 'libx264',
-            'preset': 'fast',
-            'pix_fmt': 'yuv420p',
-            'c:a': 'aac',
-            'b:a': '192k',
-            'threads': 6,
-        }
-
+        output_args = build_output_args(use_gpu and gpu_available, gpu_device_id)
         if use_gpu and gpu_available:
-            output_args['gpu'] = str(gpu_device_id)
             print(f"Using GPU {gpu_device_id} for video encoding with h264_nvenc.")
         else:
             print("Using CPU for video encoding with libx264.")
@@ -507,71 +821,14 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         # ---------------------------
         # Final output with error handling and fallback
         # ---------------------------
-        final_output = ffmpeg.output(
-            video_stream,
-            mixed_audio,
-            output_video_path,
-            **output_args
-        )
-
-        print(f"FFmpeg command: {ffmpeg.compile(final_output)}")
-
         try:
-            stdout, stderr = ffmpeg.run(final_output, overwrite_output=True, capture_stdout=True, capture_stderr=True)
-            print(f"Video generated and saved to {output_video_path}")
-            print("\n--- FFmpeg stdout ---")
-            print(stdout.decode('utf8'))
-            print("--- End FFmpeg stdout ---\n")
-        except ffmpeg.Error as e:
-            # If GPU encoding failed, try CPU fallback
-            if use_gpu and gpu_available and ('h264_nvenc' in str(e.stderr) or 'nvenc' in str(e.stderr) or 'libcuda' in str(e.stderr)):
-                print("GPU encoding failed, attempting CPU fallback...")
-                print(f"GPU Error: {e.stderr.decode('utf8')}")
-                
-                # Retry with CPU encoding
-                cpu_output_args = output_args.copy()
-                cpu_output_args['c:v'] = 'libx264'
-                if 'gpu' in cpu_output_args:
-                    del cpu_output_args['gpu']
-                
-                final_output_cpu = ffmpeg.output(
-                    video_stream,
-                    mixed_audio,
-                    output_video_path,
-                    **cpu_output_args
-                )
-                
-                print("Retrying with CPU encoding...")
-                print(f"CPU FFmpeg command: {ffmpeg.compile(final_output_cpu)}")
-                
-                try:
-                    stdout, stderr = ffmpeg.run(final_output_cpu, overwrite_output=True, capture_stdout=True, capture_stderr=True)
-                    print(f"Video generated and saved to {output_video_path} (using CPU fallback)")
-                    print("\n--- FFmpeg stdout (CPU) ---")
-                    print(stdout.decode('utf8'))
-                    print("--- End FFmpeg stdout (CPU) ---\n")
-                except ffmpeg.Error as cpu_e:
-                    print(f"CPU encoding also failed: {cpu_e.stderr.decode('utf8')}")
-                    print("\n--- FFmpeg stdout (CPU) ---")
-                    print(cpu_e.stdout.decode('utf8'))
-                    print("--- End FFmpeg stdout (CPU) ---\n")
-                    print("\n--- FFmpeg stderr (CPU) ---")
-                    print(cpu_e.stderr.decode('utf8'))
-                    print("--- End FFmpeg stderr (CPU) ---\n")
-                    raise cpu_e
-            else:
-                print(f"FFmpeg Error: {e.stderr.decode('utf8')}")
-                print("\n--- FFmpeg stdout ---")
-                print(e.stdout.decode('utf8'))
-                print("--- End FFmpeg stdout ---\n")
-                print("\n--- FFmpeg stderr ---")
-                print(e.stderr.decode('utf8'))
-                print("--- End FFmpeg stderr ---\n")
-                raise
+            encode_final(video_stream, mixed_audio, rendition_paths, output_args, mixed_audio_duration, runner_options, caption_paths)
         finally:
-            if os.path.exists(ass_path):
-                os.remove(ass_path)
-                print(f"Cleaned up temporary ASS file: {ass_path}")
+            for ass_path in caption_paths.values():
+                if os.path.exists(ass_path):
+                    os.remove(ass_path)
+                    print(f"Cleaned up temporary ASS file: {ass_path}")
+        return rendition_paths
 
     finally: # Outer finally block for cleaning up all temporary video files
         for temp_path in temp_looped_scaled_video_paths:
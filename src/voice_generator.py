@@ -1,16 +1,22 @@
 import soundfile as sf
-from kokoro_onnx import Kokoro
 import random
-import onnxruntime as ort
 import os
 import pysbd
 import numpy as np
-import re
+import queue
+import threading
+import time
+from functools import lru_cache
+from story_text import is_metadata_line, clean_story_line, IncrementalSentenceSplitter
+from model_registry import ensure_asset, compute_sha256
+from artifacts import AudioArtifact, write_audio, text_hash
 
 # -------------------------
 # Helper to get GPU providers (Linux-optimized)
 # -------------------------
 def get_onnx_providers():
+    import onnxruntime as ort
+
     providers = ort.get_available_providers()
     print("Detected ONNX providers:", providers)
     
@@ -31,20 +37,47 @@ def get_onnx_providers():
 # -------------------------
 # Load Kokoro model
 # -------------------------
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.dirname(current_dir)
-print("Current directory:", current_dir)
-print("Project root:", project_root)
-
-kokoro_model_path = os.path.join(project_root, "data", "models", "kokoro-v1.0.onnx")
-voices_file_path = os.path.join(project_root, "data", "models", "voices-v1.0.bin")
-
-print("Loading Kokoro TTS model...")
-kokoro = Kokoro(kokoro_model_path, voices_file_path)
-print("Kokoro model loaded successfully")
-
-print("Available voices:", list(kokoro.voices.keys()))
-print("ONNX Runtime providers detected:", get_onnx_providers())
+# Paths, versions and checksums live in model_registry (data/models/kokoro-v1.0.onnx, voices-v1.0.bin).
+# KOKORO_PROVIDER / KOKORO_THREADS pin the ONNX Runtime provider and intra-op
+# threads (benchmarks/bench_tts.py sizes hosts with them); unset, kokoro-onnx
+# builds its own session.
+_kokoro_lock = threading.Lock()
+
+def _kokoro_session(provider: str, threads: int):
+    import onnxruntime as ort
+
+    session_options = ort.SessionOptions()
+    if threads:
+        session_options.intra_op_num_threads = threads
+        session_options.inter_op_num_threads = 1
+    providers = [provider] if provider == "CPUExecutionProvider" else [provider, "CPUExecutionProvider"]
+    return ort.InferenceSession(ensure_asset("kokoro"), sess_options=session_options, providers=providers)
+
+@lru_cache(maxsize=1)
+def _load_kokoro():
+    from kokoro_onnx import Kokoro
+
+    print("Loading Kokoro TTS model...")
+    provider = os.environ.get("KOKORO_PROVIDER")
+    threads = int(os.environ.get("KOKORO_THREADS", "0"))
+    if provider or threads:
+        session = _kokoro_session(provider or "CPUExecutionProvider", threads)
+        kokoro = Kokoro.from_session(session, ensure_asset("kokoro_voices"))
+    else:
+        kokoro = Kokoro(ensure_asset("kokoro"), ensure_asset("kokoro_voices"))
+    print("Kokoro model loaded successfully")
+
+    print("Available voices:", list(kokoro.voices.keys()))
+    print("ONNX Runtime providers detected:", get_onnx_providers())
+    return kokoro
+
+def get_kokoro():
+    """
+    Loads the Kokoro TTS model and voices on first use; later calls reuse it.
+    Thread-safe, so a background warm-up and the pipeline never load it twice.
+    """
+    with _kokoro_lock:
+        return _load_kokoro()
 
 # -------------------------
 # Allowed voices
@@ -71,19 +104,12 @@ def extract_story_text(text: str) -> str:
             continue
 
         # Skip metadata lines like Image:, Text:, or section titles in bold
-        if re.match(r"^Image:|^Text:|\*\*.*?\*\*|^#+\s.*|\[.*?\]:", line):
+        if is_metadata_line(line):
             print(f"Skipping metadata line: {line[:50]}...")
             continue
 
-        # For lines containing narration, remove the bracketed sounds
-        # e.g., "[sound of rain] It started..." -> "It started..."
-        clean_line = re.sub(r"\[.*?\]", "", line)
-        
-        # Remove emojis
-        clean_line = re.sub(r"[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF]", "", clean_line)
-        
-        # Remove leading/trailing whitespace
-        clean_line = clean_line.strip()
+        # For lines containing narration, remove the bracketed sounds and emojis
+        clean_line = clean_story_line(line)
 
         # Add the cleaned line if it's not empty
         if clean_line:
@@ -100,15 +126,17 @@ def generate_voice(
     output_path: str = "output.wav",
     voice: str = None,
     output_text_path: str = None
-) -> None:
+) -> AudioArtifact:
     """
-    Generates a .wav file from text using Kokoro TTS.
+    Generates a .wav file from text using Kokoro TTS. Returns its AudioArtifact
+    (duration and format included, so callers don't probe the file).
     """
     print("Starting voice generation...")
     if voice is None:
         voice = random.choice(available_voices)
         print(f"No voice specified, randomly selected: {voice}")
 
+    kokoro = get_kokoro()
     if voice not in kokoro.voices:
         raise ValueError(f"Voice '{voice}' not found. Available voices: {list(kokoro.voices.keys())}")
 
@@ -155,8 +183,116 @@ def generate_voice(
     samples = np.concatenate(all_samples)
 
     print(f"Saving generated audio to {output_path}...")
-    sf.write(output_path, samples, sample_rate)
+    audio = write_audio(output_path, samples, sample_rate, voice=voice, speed=1.0, text_sha256=text_hash(clean_text))
     print(f"Voice '{voice}' successfully generated and saved.")
+    return audio
+
+def generate_voice_from_stream(
+    text_chunks,
+    output_path: str = "output.wav",
+    voice: str = None,
+    output_text_path: str = None,
+) -> tuple[str, AudioArtifact]:
+    """
+    Generates a .wav file from streamed story text (e.g. story_generator.stream_story).
+    Each sentence is queued for synthesis as soon as the incremental segmenter
+    completes it, so audio starts while the LLM is still writing. Samples are
+    appended to the WAV as they are produced. Returns the full raw story text
+    and the audio's handle (its duration comes from the samples written).
+    """
+    print("Starting streaming voice generation...")
+    if voice is None:
+        voice = random.choice(available_voices)
+        print(f"No voice specified, randomly selected: {voice}")
+
+    kokoro = get_kokoro()
+    if voice not in kokoro.voices:
+        raise ValueError(f"Voice '{voice}' not found. Available voices: {list(kokoro.voices.keys())}")
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    sentence_queue = queue.Queue()
+    started = time.perf_counter()
+    state = {"wav": None, "sentences": 0, "frames": 0, "sample_rate": None, "first_audio": None, "error": None}
+
+    def synthesize():
+        try:
+            while True:
+                sentence = sentence_queue.get()
+                if sentence is None:
+                    break
+                try:
+                    samples, sample_rate = kokoro.create(text=sentence, voice=voice, speed=1.0, lang="en-us")
+                except Exception as e:
+                    print(f"Warning: Skipping sentence '{sentence[:50]}...'. Error: {e}")
+                    continue
+                if state["wav"] is None:
+                    state["wav"] = sf.SoundFile(output_path, mode="w", samplerate=sample_rate, channels=1)
+                    state["sample_rate"] = sample_rate
+                    state["first_audio"] = time.perf_counter() - started
+                    print(f"First audio after {state['first_audio']:.2f}s")
+                state["wav"].write(samples)
+                state["frames"] += len(samples)
+                state["sentences"] += 1
+        except Exception as e:
+            state["error"] = e
+
+    worker = threading.Thread(target=synthesize, name="tts-stream", daemon=True)
+    worker.start()
+
+    splitter = IncrementalSentenceSplitter()
+    raw_parts = []
+    clean_sentences = []
+    stream_failed = False
+    try:
+        for chunk in text_chunks:
+            raw_parts.append(chunk)
+            for sentence in splitter.feed(chunk):
+                print(f"Queueing sentence {len(clean_sentences) + 1}: '{sentence[:50]}...'")
+                clean_sentences.append(sentence)
+                sentence_queue.put(sentence)
+        for sentence in splitter.flush():
+            clean_sentences.append(sentence)
+            sentence_queue.put(sentence)
+    except BaseException:
+        # The story stream failed: don't synthesize the sentences still queued
+        while True:
+            try:
+                sentence_queue.get_nowait()
+            except queue.Empty:
+                break
+        stream_failed = True
+        raise
+    finally:
+        sentence_queue.put(None)
+        worker.join()
+        if state["wav"] is not None:
+            state["wav"].close()
+        if stream_failed and os.path.exists(output_path):
+            os.remove(output_path)  # a partial narration must not be mistaken for a finished one
+
+    if state["error"] is not None:
+        raise state["error"]
+    if state["sentences"] == 0:
+        raise RuntimeError("No audio samples were generated.")
+
+    clean_text = " ".join(clean_sentences)
+    if output_text_path:
+        os.makedirs(os.path.dirname(output_text_path), exist_ok=True)
+        with open(output_text_path, "w", encoding="utf-8") as f:
+            f.write(clean_text)
+        print(f"Cleaned story text saved to {output_text_path}")
+
+    print(f"Voice '{voice}' streamed {state['sentences']} sentences to {output_path} in {time.perf_counter() - started:.2f}s.")
+    audio = AudioArtifact(
+        path=output_path,
+        duration=state["frames"] / state["sample_rate"],
+        sample_rate=state["sample_rate"],
+        channels=1,
+        content_hash=compute_sha256(output_path),
+        params={"voice": voice, "speed": 1.0, "text_sha256": text_hash(clean_text)},
+    )
+    return "".join(raw_parts), audio
 
 def generate_and_measure_audio(text: str, voice: str) -> tuple[np.ndarray, int, float]:
     """
@@ -166,6 +302,7 @@ def generate_and_measure_audio(text: str, voice: str) -> tuple[np.ndarray, int,
         voice = random.choice(available_voices)
         print(f"No voice specified for intro, randomly selected: {voice}")
 
+    kokoro = get_kokoro()
     segmenter = pysbd.Segmenter(language="en", clean=False)
     sentences = segmenter.segment(text)
     